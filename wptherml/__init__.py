@@ -8,6 +8,9 @@ from .spectrum_driver import SpectrumDriver
 from .em import TmmDriver
 from .mie import MieDriver
 from .therml import Therml
+from .fom_plan import FomPlan
+from .optimizer import Optimizer, NeedleOptimizer, EvolutionaryOptimizer
+from .tolerance import ToleranceAnalysis
 from .factory import SpectrumFactory
 from .materials import Materials
 
@@ -1,7 +1,10 @@
 from .spectrum_driver import SpectrumDriver
 from .materials import Materials
 from .therml import Therml
+from .fom_plan import FomPlan
 import numpy as np
+import os
+import warnings
 from matplotlib import pyplot as plt
 from matplotlib.patches import Circle
 import matplotlib.colors as colors
@@ -22,6 +25,11 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         the thickness of each layer
     material_array : 1 x number_of_layers numpy array of str
         the materia of each layer
+    coherence_array : list of str
+        "c" for coherent and "i" for incoherent layers
+    dispersion_materials : dict
+        (model, parameters) of each analytic dispersion material, keyed by the lower case
+        material name it can be used by in material_list
     wavelength_array : numpy array of floats
         the array of wavelengths in meters over which you will compute the spectra
     incident_angle : float
@@ -157,16 +165,9 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         else:
             self.polarization = "p"
 
-        if "wavelength_list" in args:
-            lamlist = args["wavelength_list"]
-            self.wavelength_array = np.linspace(lamlist[0], lamlist[1], int(lamlist[2]))
-            self.number_of_wavelengths = int(lamlist[2])
-            self.wavenumber_array = 1 / self.wavelength_array
-        # default wavelength array
-        else:
-            self.wavelength_array = np.linspace(400e-9, 800e-9, 10)
-            self.number_of_wavelengths = 10
-            self.wavenumber_array = 1 / self.wavelength_array
+        # wavelength grid from wavelength_list, an explicit array or segments in
+        # wavelength, wavenumber or energy
+        self._parse_wavelength_input(args)
 
         # need to throw some exceptions if len(self.thickness_array)!=len(self.material_array)
         if "thickness_list" in args:
@@ -185,6 +186,28 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
             print("  Proceeding with default structure - Air / SiO2 / Air ")
             self.material_array = ["Air", "SiO2", "Air"]
             self.number_of_layers = 3
+
+        # "c" (coherent, default) or "i" (incoherent) for each layer; incoherent layers, e.g.
+        # mm-thick substrates, are combined with the coherent sub-stacks around them in terms of
+        # powers, so their fringes never need to be resolved by the wavelength grid
+        if "coherence_list" in args:
+            self.coherence_array = [_c.lower() for _c in args["coherence_list"]]
+            if len(self.coherence_array) != self.number_of_layers:
+                raise ValueError("coherence_list must have one entry per layer")
+            if not set(self.coherence_array) <= {"c", "i"}:
+                raise ValueError("coherence_list entries must be 'c' or 'i'")
+        else:
+            self.coherence_array = ["c"] * self.number_of_layers
+
+        # graded-index layers are added with set_graded_layer
+        self.graded_layers = {}
+
+        # named analytic dispersion materials, {name: (model, parameters)}, that can be used
+        # in material_list like the tabulated materials
+        self.dispersion_materials = {}
+        if "dispersion_materials" in args:
+            for _name, (_model, _parameters) in args["dispersion_materials"].items():
+                self.dispersion_materials[_name.lower()] = (_model, _parameters)
             
         # see if we want to specify certain layers to randomize the thickness of
         if "random_thickness_layers" in args:
@@ -199,7 +222,7 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
 
         # do we want to put bounds on the random thicknesses (specified in nanometers)
         if "random_thickness_bounds_nm" in args:
-            bounds = args["random_thickness_bounds"]
+            bounds = args["random_thickness_bounds_nm"]
             self.minimum_thickness_nm = bounds[0]
             self.maximum_thickness_nm = bounds[1]
         else:
@@ -266,7 +289,74 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
             # this is a good default empirically if
             # Gauss-Legendre quadrature is used for angular spectra
             self.number_of_angles = 7
-            
+
+        # precision of the batched spectra (_compute_batched_spectrum, used by the population and
+        # Monte-Carlo figures of merit, the adaptive grids, the time series and the sweeps):
+        # "double" (default) or "single"; single precision results are checked against double
+        # precision on a sample of designs and recomputed in double precision if R or T differ by
+        # more than single_precision_tolerance.  compute_spectrum, all gradients and the figure of
+        # merit integrals, which are single dot products per design, always run in double precision
+        if "dtype" in args and str(args["dtype"]).lower() in (
+            "single",
+            "float32",
+            "complex64",
+        ):
+            self.dtype = np.complex64
+        else:
+            self.dtype = np.complex128
+
+        if "single_precision_tolerance" in args:
+            self.single_precision_tolerance = args["single_precision_tolerance"]
+        else:
+            self.single_precision_tolerance = 1e-4
+
+        # "jacobian" (default) builds the spectral Jacobians (emissivity_gradient_array, ...) and
+        # integrates them; "adjoint" pushes the figure of merit weights back through the transfer
+        # matrices in chunks of gradient_chunk_size wavelengths without storing the Jacobians
+        if "gradient_method" in args:
+            self.gradient_method = args["gradient_method"].lower()
+        else:
+            self.gradient_method = "jacobian"
+
+        # the gradients are taken with respect to the thickness (default), the real ("n") or
+        # imaginary ("k") part of the refractive index, or the fill fraction ("fill_fraction") of
+        # the effective medium layers in gradient_list
+        if "gradient_type" in args:
+            self.gradient_type = args["gradient_type"].lower()
+        else:
+            self.gradient_type = "thickness"
+
+        if "gradient_chunk_size" in args:
+            self.gradient_chunk_size = int(args["gradient_chunk_size"])
+        else:
+            self.gradient_chunk_size = 1024
+
+        # "tmm" uses the transfer matrices, "smatrix" the scattering matrices (stable for thick
+        # absorbing layers and many layers) and "auto" (default) switches to the scattering
+        # matrices when the attenuation sum |Im(kz) d| over the layers exceeds
+        # scattering_matrix_threshold, i.e. when the transfer matrix elements grow like
+        # exp(scattering_matrix_threshold).  The index gradients, the layer fields and the needle
+        # derivatives are only implemented with transfer matrices and raise a ValueError for
+        # stacks beyond the threshold
+        if "backend" in args:
+            self.backend = args["backend"].lower()
+        else:
+            self.backend = "auto"
+        if self.backend not in ("tmm", "smatrix", "auto"):
+            raise ValueError("backend must be 'tmm', 'smatrix' or 'auto'")
+
+        if "scattering_matrix_threshold" in args:
+            self.scattering_matrix_threshold = args["scattering_matrix_threshold"]
+        else:
+            self.scattering_matrix_threshold = 30.0
+
+        # optional relative tolerance on P_rad / P_atm; if specified, the cooling figures of merit
+        # refine a nested Clenshaw-Curtis angular grid instead of using number_of_angles
+        if "angle_tolerance" in args:
+            self.angle_tolerance = args["angle_tolerance"]
+        else:
+            self.angle_tolerance = None
+
         # some keywords for the visible transmissive and IR reflective Stacks for Blake and Michael
         #
         if "transmissive_window_nm" in args:
@@ -282,14 +372,6 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
             self.transmissive_window_start = 350e-9
             self.transmissive_window_stop = 700e-9
 
-        self.transmissive_envelope = np.zeros_like(self.wavelength_array)
-        for i in range(self.number_of_wavelengths):
-            if (
-                self.wavelength_array[i] >= self.transmissive_window_start
-                and self.wavelength_array[i] <= self.transmissive_window_stop
-            ):
-                self.transmissive_envelope[i] = 1.0
-
         if "reflective_window_wn" in args:
             lamlist = args["reflective_window_wn"]
             # in inverse cm
@@ -306,13 +388,7 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
             self.reflective_window_start = 10000000 / 2400 * 1e-9
             self.reflective_window_stop = 10000000 / 2000 * 1e-9
 
-        self.reflective_envelope = np.zeros_like(self.wavelength_array)
-        for i in range(self.number_of_wavelengths):
-            if (
-                self.wavelength_array[i] >= self.reflective_window_start
-                and self.wavelength_array[i] <= self.reflective_window_stop
-            ):
-                self.reflective_envelope[i] = 1.0
+        self._compute_window_envelopes()
 
         # Retrieve psc thickness for _EQE_spectral_response
         if "psc_thickness_option" in args:
@@ -332,7 +408,52 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         # for now always get atmospheric transmissivity spectru
         self._atmospheric_transmissivity = self._read_Atmospheric_Transmissivity()
 
-        
+        # always define the thermal attributes (temperature, bandgap, ...) so that
+        # the figure of merit plan can be built for any structure
+        self._parse_therml_input(args)
+
+
+    def _compute_window_envelopes(self):
+        """defines the transmissive_envelope and reflective_envelope on the current wavelength_array
+        from the transmissive and reflective windows"""
+        self.transmissive_envelope = np.zeros_like(self.wavelength_array)
+        for i in range(self.number_of_wavelengths):
+            if (
+                self.wavelength_array[i] >= self.transmissive_window_start
+                and self.wavelength_array[i] <= self.transmissive_window_stop
+            ):
+                self.transmissive_envelope[i] = 1.0
+
+        self.reflective_envelope = np.zeros_like(self.wavelength_array)
+        for i in range(self.number_of_wavelengths):
+            if (
+                self.wavelength_array[i] >= self.reflective_window_start
+                and self.wavelength_array[i] <= self.reflective_window_stop
+            ):
+                self.reflective_envelope[i] = 1.0
+
+    def set_wavelength_array(self, wavelength_array):
+        """replaces the wavelength grid and redefines everything that is sampled on it:
+        the refractive index array, the window envelopes, the solar spectrum and the
+        atmospheric transmissivity (cached quadrature weights are keyed on the grid
+        and are rebuilt on their next use)
+
+        Arguments
+        ---------
+        wavelength_array : numpy array of floats
+            the new (possibly non-uniform) increasing wavelengths in meters
+
+        Returns
+        -------
+        None
+        """
+        self.wavelength_array = np.asarray(wavelength_array, dtype=float)
+        self.number_of_wavelengths = len(self.wavelength_array)
+        self.wavenumber_array = 1 / self.wavelength_array
+        self.set_refractive_index_array()
+        self._compute_window_envelopes()
+        self._solar_spectrum = self._read_AM()
+        self._atmospheric_transmissivity = self._read_Atmospheric_Transmissivity()
 
     def set_refractive_index_array(self):
         """once materials are specified, define the refractive_index_array values"""
@@ -350,69 +471,345 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         self.material_Air(0)
         self.material_Air(self.number_of_layers - 1)
         for i in range(1, self.number_of_layers - 1):
-            # get lower clase version of the material string
-            # to avoid any conflicts with variation in cases
-            # given by the user
-            _lm = self.material_array[i].lower()
-            # keep the original string too in case it is a file name
-            _original_string = self.material_array[i]
-
-            # check all possible values of the material string
-            # and set material as appropriate.
-            # in future probably good to create a single wrapper
-            # function in materials.py that will do this so
-            # that MieDriver and TmmDriver can just use it rather
-            # than duplicating this kind of code in both classes
-            if _lm == "air":
-                self.material_Air(i)
-            elif _lm == "ag":
-                self.material_Ag(i)
-            elif _lm == "al":
-                self.material_Al(i)
-            elif _lm == "al2o3":
-                self.material_Al2O3(i)
-            elif _lm == "al2o3_udm":
-                self.material_Al2O3_UDM(i)
-            elif _lm == "aln":
-                self.material_AlN(i)
-            elif _lm == "au":
-                self.material_Au(i)
-            elif _lm == "hfo2":
-                self.material_HfO2(i)
-            elif _lm == "pb":
-                self.material_Pb(i)
-            elif _lm == "polystyrene":
-                self.material_polystyrene(i)
-            elif _lm == "pt":
-                self.material_Pt(i)
-            elif _lm == "re":
-                self.material_Re(i)
-            elif _lm == "rh":
-                self.material_Rh(i)
-            elif _lm == "ru":
-                self.material_Ru(i)
-            elif _lm == "si":
-                self.material_Si(i)
-            elif _lm == "sio2":
-                self.material_SiO2(i)
-            elif _lm == "sio2_udm":
-                self.material_SiO2_UDM(i)
-            elif _lm == "ta2o5":
-              self.material_Ta2O5(i)
-            elif _lm == "tin":
-                self.material_TiN(i)
-            elif _lm == "tio2":
-                self.material_TiO2(i)
-            elif _lm == "w":
-                self.material_W(i)
-            elif _lm == "zro2":
-                self.material_ZrO2(i)
-            elif _lm == "si3n4":
-                self.material_Si3N4(i)
-            # if we don't match one of these strings, then we assume the user has passed
-            # a filename
-            else:
-                self.material_from_file(i, _original_string)
+            self._set_layer_material(i, self.material_array[i])
+        for i in self.graded_layers:
+            self._set_graded_layer_index(i)
+
+    def add_dispersion_material(self, name, model, parameters):
+        """registers an analytic dispersion material under name, so that it can be used in
+        material_list, possible_materials, graded layers and effective media like the
+        tabulated materials; it is evaluated in closed form on any wavelength grid
+
+        Arguments
+        ---------
+        name : str
+            the material name (case insensitive)
+        model : str
+            "drude", "lorentz", "sellmeier" or "cauchy", see Materials._compute_dispersion_index
+        parameters : dict
+            the parameters of the model, e.g. as returned by fit_dispersion_model
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        >>> parameters, error = test.fit_dispersion_model("W_Rakic.txt", 4)
+        >>> test.add_dispersion_material("W_lorentz", "lorentz", parameters)
+        >>> test.material_array[1] = "W_lorentz"
+        >>> test.set_refractive_index_array()
+        """
+        # check the model before it is used by any layer
+        self._compute_dispersion_index(self.wavelength_array[:1], model, parameters)
+        self.dispersion_materials[name.lower()] = (model, parameters)
+        # the cached index bank may hold an earlier material of the same name
+        self.__dict__.pop("_material_index_bank_cache", None)
+
+    def set_graded_layer(
+        self, layer_number, profile, materials=None, number_of_slices=100
+    ):
+        """makes layer layer_number a graded-index (e.g. rugate) layer whose refractive index
+        varies with depth according to profile; the layer keeps a single entry in
+        material_array and thickness_array, and the engines multiply its number_of_slices
+        slices internally, so thickness gradients are taken with respect to the whole layer
+
+        Arguments
+        ---------
+        layer_number : int
+            the layer to grade
+        profile : function
+            of the fractional depth z / d between 0 (top) and 1 (bottom); returns the refractive
+            index (a scalar or a number_of_wavelengths numpy array) if materials is None, or the
+            volume fraction of materials[1] in materials[0] otherwise, in which case the refractive
+            index is interpolated linearly between the two materials
+        materials : list of two str
+            optional pair of materials to mix, as in material_list
+        number_of_slices : int
+            the number of slices the profile is sampled on (at their midpoints)
+
+        Attributes
+        ----------
+        graded_layers : dict
+            the profile, materials, number of slices and the number_of_wavelengths x
+            number_of_slices numpy array of complex floats of the slice refractive indices
+            ("index") of each graded layer; the column layer_number of _refractive_index_array
+            holds the average of the slices.  The needle derivatives, layer absorption, field
+            intensity and pv-stpv current and gradient are not available with graded layers
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        >>> # linear SiO2 -> TiO2 ramp
+        >>> test.set_graded_layer(1, lambda z: z, materials=["SiO2", "TiO2"])
+        """
+        self.graded_layers[layer_number] = {
+            "profile": profile,
+            "materials": materials,
+            "number_of_slices": int(number_of_slices),
+            "reversed": False,
+        }
+        self._set_graded_layer_index(layer_number)
+
+    def _set_graded_layer_index(self, layer_number):
+        """samples the refractive index profile of graded layer layer_number on its slices"""
+        _layer = self.graded_layers[layer_number]
+        _ns = _layer["number_of_slices"]
+        _z = (np.arange(_ns) + 0.5) / _ns
+        if _layer["reversed"]:
+            _z = 1 - _z
+        if _layer["materials"] is None:
+            _index = np.zeros((_ns, self.number_of_wavelengths), dtype=complex)
+            for _k in range(_ns):
+                _index[_k] = _layer["profile"](_z[_k])
+        else:
+            _bank = self._get_material_index_bank(_layer["materials"])
+            _f = np.array([_layer["profile"](_zk) for _zk in _z], dtype=float)
+            _index = (1 - _f[:, np.newaxis]) * _bank[0] + _f[:, np.newaxis] * _bank[1]
+        _layer["index"] = _index.T
+        self._refractive_index_array[:, layer_number] = np.mean(_index, axis=0)
+
+    def _get_graded_layer_index(self, layer_number, wavelength_array):
+        """returns the slice refractive indices of graded layer layer_number at wavelength_array,
+        which must be a subset of the wavelength grid (e.g. a chunk or a support)"""
+        _index = self.graded_layers[layer_number]["index"]
+        return _index[self._get_wavelength_indices(wavelength_array)]
+
+    def _get_wavelength_indices(self, wavelength_array):
+        """returns the indices of wavelength_array, a subset of the wavelength grid; raises a
+        ValueError for wavelengths that are not on the grid"""
+        wavelength_array = np.asarray(wavelength_array)
+        if len(wavelength_array) == self.number_of_wavelengths and np.allclose(
+            wavelength_array, self.wavelength_array, rtol=1e-12, atol=0
+        ):
+            return slice(None)
+        _order = np.argsort(self.wavelength_array)
+        _idx = np.searchsorted(self.wavelength_array[_order], wavelength_array)
+        _idx = _order[np.minimum(_idx, self.number_of_wavelengths - 1)]
+        if not np.allclose(self.wavelength_array[_idx], wavelength_array, rtol=1e-12, atol=0):
+            raise ValueError("wavelength_array is not a subset of the wavelength grid")
+        return _idx
+
+    def _check_effective_medium_layers(self, layer_indices):
+        """raises a ValueError if any of layer_indices is not an effective medium layer"""
+        for _l in layer_indices:
+            if str(self.material_array[_l]).lower().split(":")[0] not in (
+                "bruggeman",
+                "maxwell_garnett",
+            ):
+                raise ValueError(
+                    "layer "
+                    + str(_l)
+                    + " is not an effective medium layer, see set_fill_fraction"
+                )
+
+    def _compute_effective_medium_layer(
+        self, material, fill_fraction=None, wavelength_array=None
+    ):
+        """returns the refractive index of an effective medium material string
+        "model:host:inclusion:fill_fraction" (e.g. "bruggeman:SiO2:Air:0.3" for porous SiO2
+        with 30% voids, or "maxwell_garnett:polystyrene:Au:0.05") and its derivative with
+        respect to the fill fraction, see Materials._compute_effective_medium_index; host and
+        inclusion can be any material of material_list and are looked up in the material index
+        bank, so no data file is read again
+
+        Arguments
+        ---------
+        material : str
+            the effective medium material string
+        fill_fraction : float or F numpy array of floats
+            optional fill fraction(s) overriding the one in the string
+        wavelength_array : numpy array of floats
+            optional subset of the wavelength grid, default is all wavelengths
+
+        Returns
+        -------
+        _index, _index_gradient : (F x) number_of_wavelengths numpy arrays of complex floats
+        """
+        _model, _host, _inclusion, _f = material.split(":")
+        if fill_fraction is None:
+            fill_fraction = float(_f)
+        _bank = self._get_material_index_bank([_host, _inclusion])
+        if wavelength_array is not None:
+            _bank = _bank[:, self._get_wavelength_indices(wavelength_array)]
+        return self._compute_effective_medium_index(
+            _bank[0], _bank[1], fill_fraction, _model.lower()
+        )
+
+    def set_fill_fraction(self, layer_number, fill_fraction):
+        """changes the fill fraction of effective medium layer layer_number, whose entry in
+        material_array is "model:host:inclusion:fill_fraction"
+
+        Arguments
+        ---------
+        layer_number : int
+            an effective medium layer
+        fill_fraction : float
+            the new volume fraction of the inclusions
+
+        Returns
+        -------
+        None
+        """
+        self._check_effective_medium_layers([layer_number])
+        _model, _host, _inclusion, _ = self.material_array[layer_number].split(":")
+        self.material_array = list(self.material_array)
+        self.material_array[layer_number] = ":".join(
+            (_model, _host, _inclusion, repr(float(fill_fraction)))
+        )
+        self._set_layer_material(layer_number, self.material_array[layer_number])
+
+    def get_fill_fraction(self, layer_number):
+        """returns the fill fraction of effective medium layer layer_number"""
+        self._check_effective_medium_layers([layer_number])
+        return float(self.material_array[layer_number].split(":")[3])
+
+    def compute_fill_fraction_sweep(self, layer_number, fill_fraction_array):
+        """computes the spectra for an array of fill fractions of effective medium layer
+        layer_number in one batched pass
+
+        Arguments
+        ---------
+        layer_number : int
+            an effective medium layer
+        fill_fraction_array : numpy array of floats
+            the nF fill fractions
+
+        Attributes
+        ----------
+        fill_fraction_sweep_array : nF numpy array of floats
+            the fill fractions of the sweep
+        reflectivity_sweep_array, transmissivity_sweep_array, emissivity_sweep_array : nF x number_of_wavelengths numpy arrays of floats
+            the spectra at each fill fraction
+
+        Returns
+        -------
+        None
+        """
+        self.fill_fraction_sweep_array = np.asarray(fill_fraction_array, dtype=float)
+        _index, _ = self._compute_effective_medium_layer(
+            self.material_array[layer_number], self.fill_fraction_sweep_array
+        )
+        _nf = len(self.fill_fraction_sweep_array)
+        _ri = np.repeat(self._refractive_index_array[np.newaxis], _nf, axis=0)
+        _ri[:, :, layer_number] = _index
+        _thickness = np.repeat(self.thickness_array[np.newaxis], _nf, axis=0)
+        (
+            self.reflectivity_sweep_array,
+            self.transmissivity_sweep_array,
+            self.emissivity_sweep_array,
+        ) = self._compute_batched_spectrum(
+            self.incident_angle,
+            self.polarization,
+            refractive_index_array=_ri,
+            thickness_array=_thickness,
+        )
+
+    def _set_layer_material(self, layer_number, material):
+        """defines the refractive index of layer layer_number from the material string"""
+        i = layer_number
+        # get lower clase version of the material string
+        # to avoid any conflicts with variation in cases
+        # given by the user
+        _lm = material.lower()
+        # keep the original string too in case it is a file name
+        _original_string = material
+
+        # check all possible values of the material string
+        # and set material as appropriate.
+        # in future probably good to create a single wrapper
+        # function in materials.py that will do this so
+        # that MieDriver and TmmDriver can just use it rather
+        # than duplicating this kind of code in both classes
+        if _lm == "air":
+            self.material_Air(i)
+        elif _lm == "ag":
+            self.material_Ag(i)
+        elif _lm == "al":
+            self.material_Al(i)
+        elif _lm == "al2o3":
+            self.material_Al2O3(i)
+        elif _lm == "al2o3_udm":
+            self.material_Al2O3_UDM(i)
+        elif _lm == "aln":
+            self.material_AlN(i)
+        elif _lm == "au":
+            self.material_Au(i)
+        elif _lm == "hfo2":
+            self.material_HfO2(i)
+        elif _lm == "pb":
+            self.material_Pb(i)
+        elif _lm == "polystyrene":
+            self.material_polystyrene(i)
+        elif _lm == "pt":
+            self.material_Pt(i)
+        elif _lm == "re":
+            self.material_Re(i)
+        elif _lm == "rh":
+            self.material_Rh(i)
+        elif _lm == "ru":
+            self.material_Ru(i)
+        elif _lm == "si":
+            self.material_Si(i)
+        elif _lm == "sio2":
+            self.material_SiO2(i)
+        elif _lm == "sio2_udm":
+            self.material_SiO2_UDM(i)
+        elif _lm == "ta2o5":
+            self.material_Ta2O5(i)
+        elif _lm == "tin":
+            self.material_TiN(i)
+        elif _lm == "tio2":
+            self.material_TiO2(i)
+        elif _lm == "w":
+            self.material_W(i)
+        elif _lm == "zro2":
+            self.material_ZrO2(i)
+        elif _lm == "si3n4":
+            self.material_Si3N4(i)
+        elif _lm == "2d_hoip":
+            self.material_2D_HOIP(i)
+        # named analytic dispersion model
+        elif _lm in self.dispersion_materials:
+            self.material_dispersion(i, *self.dispersion_materials[_lm])
+        # "model:host:inclusion:fill_fraction" effective medium
+        elif _lm.split(":")[0] in ("bruggeman", "maxwell_garnett"):
+            self._refractive_index_array[:, i] = self._compute_effective_medium_layer(
+                material
+            )[0]
+        # if we don't match one of these strings, then we assume the user has passed
+        # a filename
+        else:
+            self.material_from_file(i, _original_string)
+
+    def _get_material_index_bank(self, materials):
+        """returns the refractive index of each material in materials on the wavelength grid,
+        e.g. of possible_materials, so that layers can be swapped without reloading the data
+
+        Arguments
+        ---------
+        materials : list of str
+            the material strings, as in material_list
+
+        Returns
+        -------
+        len(materials) x number_of_wavelengths numpy array of complex floats
+        """
+        _cache = self.__dict__.setdefault("_material_index_bank_cache", {})
+        _key = (tuple(materials), self.wavelength_array.tobytes())
+        if _key not in _cache:
+            # fill layer 1 with each material in turn and restore it afterwards
+            _saved = np.copy(self._refractive_index_array[:, 1])
+            _bank = np.zeros((len(materials), self.number_of_wavelengths), dtype=complex)
+            for _n, _material in enumerate(materials):
+                self._set_layer_material(1, _material)
+                _bank[_n] = self._refractive_index_array[:, 1]
+            self._refractive_index_array[:, 1] = _saved
+            _cache[_key] = _bank
+        return _cache[_key]
 
     def reverse_stack(self):
         """reverse the order of the stack
@@ -427,6 +824,14 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         # use np.flip to reverse the arrays
         self._refractive_index_array = np.flip(_ri, axis=1)
         self.thickness_array = np.flip(_ta)
+        self.coherence_array = self.coherence_array[::-1]
+        # graded layers are also traversed from the other side
+        _graded_layers = {}
+        for _l, _layer in self.graded_layers.items():
+            _layer["reversed"] = not _layer["reversed"]
+            _layer["index"] = _layer["index"][:, ::-1]
+            _graded_layers[self.number_of_layers - 1 - _l] = _layer
+        self.graded_layers = _graded_layers
 
     def remove_layer(self, layer_number):
         """remove layer number layer_number from your stack.
@@ -434,66 +839,113 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         and you issue remove_layer(2), the new structrure will be
         Air/SiO2/Ag/Air
         """
-        self.number_of_layers -= 1
-        _nwl = len(self._refractive_index_array[:, 0])
-        _nl = len(self._refractive_index_array[0, :])
-        _temp_ri_array = np.copy(self._refractive_index_array)
-        _temp_thickness_array = np.copy(self.thickness_array)
-
-        _new_ri_array = np.zeros((_nwl, _nl - 1), dtype=complex)
-        _new_thickness_array = np.zeros(_nl - 1)
-
-        _new_ri_array[:, :layer_number] = _temp_ri_array[:, :layer_number]
-        _new_thickness_array[:layer_number] = _temp_thickness_array[:layer_number]
+        _nl = self.number_of_layers
+        self._ensure_layer_capacity(_nl)
 
-        _new_ri_array[:, layer_number:] = _temp_ri_array[:, layer_number + 1 :]
-        _new_thickness_array[layer_number:] = _temp_thickness_array[layer_number + 1 :]
-
-        self._refractive_index_array = np.copy(_new_ri_array)
-        self.thickness_array = np.copy(_new_thickness_array)
-
-    def insert_layer(self, layer_number, layer_thickness):
-        """insert an air layer between layer_number-1 and layer_number
+        # shift the layers below layer_number up by one within the buffers
+        self._refractive_index_buffer[:, layer_number : _nl - 1] = (
+            self._refractive_index_buffer[:, layer_number + 1 : _nl]
+        )
+        self._thickness_buffer[layer_number : _nl - 1] = self._thickness_buffer[
+            layer_number + 1 : _nl
+        ]
+        self._set_layer_views(_nl - 1)
+
+        self.material_array = list(self.material_array)
+        del self.material_array[layer_number]
+        del self.coherence_array[layer_number]
+        self.graded_layers = {
+            (_l - 1 if _l > layer_number else _l): _layer
+            for _l, _layer in self.graded_layers.items()
+            if _l != layer_number
+        }
+
+    def insert_layer(self, layer_number, layer_thickness, material="Air"):
+        """insert a layer of material (default air) between layer_number-1 and layer_number
         e.g. if you have a structure that is Air/SiO2/HfO2/Ag/Air
         and you issue insert_layer(1), the new structure will be
         Air/Air/SiO2/HfO2/Ag/Air
         if you issue insert_layer(2), the new structure will be
         Air/SiO2/Air/HfO2/Ag/Air
 
-        """
-        self.number_of_layers += 1
-        _nwl = len(self._refractive_index_array[:, 0])
-        _nl = len(self._refractive_index_array[0, :])
-        _temp_ri_array = np.copy(self._refractive_index_array)
-        _temp_thickness_array = np.copy(self.thickness_array)
+        Arguments
+        ---------
+        layer_number : int
+            position of the new layer
 
-        _new_ri_array = np.zeros((_nwl, _nl + 1), dtype=complex)
-        _new_thickness_array = np.zeros(_nl + 1)
-        _new_air_layer = np.ones(_nwl, dtype=complex) * 1.0
+        layer_thickness : float
+            thickness of the new layer in meters
 
-        _new_ri_array[:, :layer_number] = _temp_ri_array[:, :layer_number]
-        _new_thickness_array[:layer_number] = _temp_thickness_array[:layer_number]
+        material : str
+            material of the new layer, as in material_list
 
-        _new_ri_array[:, layer_number] = _new_air_layer
-        _new_thickness_array[layer_number] = layer_thickness
+        """
+        self._insert_layer(layer_number, layer_thickness, material)
+        if material.lower() != "air":
+            self._set_layer_material(layer_number, material)
+
+    def _insert_layer(self, layer_number, layer_thickness, material, refractive_index=1.0):
+        """inserts a layer with the given refractive_index (scalar or number_of_wavelengths array)
+        at layer_number without reloading any material data"""
+        _nl = self.number_of_layers
+        self._ensure_layer_capacity(_nl + 1)
+
+        # shift layer_number and the layers below it down by one within the buffers
+        self._refractive_index_buffer[:, layer_number + 1 : _nl + 1] = (
+            self._refractive_index_buffer[:, layer_number:_nl]
+        )
+        self._thickness_buffer[layer_number + 1 : _nl + 1] = self._thickness_buffer[
+            layer_number:_nl
+        ]
+        self._refractive_index_buffer[:, layer_number] = refractive_index
+        self._thickness_buffer[layer_number] = layer_thickness
+        self._set_layer_views(_nl + 1)
+
+        self.material_array = list(self.material_array)
+        self.material_array.insert(layer_number, material)
+        self.coherence_array.insert(layer_number, "c")
+        self.graded_layers = {
+            (_l + 1 if _l >= layer_number else _l): _layer
+            for _l, _layer in self.graded_layers.items()
+        }
+
+    def _ensure_layer_capacity(self, number_of_layers):
+        """makes sure _refractive_index_array and thickness_array live in preallocated buffers
+        with room for number_of_layers layers, so that inserting and removing layers only
+        shifts columns; the buffers grow geometrically and are rebuilt if either array has been
+        reassigned (e.g. by set_refractive_index_array or reverse_stack)
 
-        _new_ri_array[:, layer_number + 1 :] = _temp_ri_array[:, layer_number:]
-        _new_thickness_array[layer_number + 1 :] = _temp_thickness_array[layer_number:]
+        Attributes
+        ----------
+        _refractive_index_buffer : number_of_wavelengths x capacity numpy array of complex floats
 
-        self._refractive_index_array = np.copy(_new_ri_array)
-        self.thickness_array = np.copy(_new_thickness_array)
-        print(
-            " A ",
-            layer_thickness,
-            " m air layer has been inserted into layer numbe ",
-            layer_number,
-        )
-        print(
-            " Use the `material_X(",
-            layer_number,
-            ") command to define the material of this new layer!",
+        _thickness_buffer : capacity numpy array of floats
+        """
+        _in_buffers = (
+            getattr(self, "_refractive_index_view", None) is self._refractive_index_array
+            and getattr(self, "_thickness_view", None) is self.thickness_array
         )
-
+        if _in_buffers and number_of_layers <= len(self._thickness_buffer):
+            return
+
+        _nl = self.number_of_layers
+        _capacity = max(2 * number_of_layers, 8)
+        _ri_buffer = np.ones((self.number_of_wavelengths, _capacity), dtype=complex)
+        _ri_buffer[:, :_nl] = self._refractive_index_array
+        _thickness_buffer = np.zeros(_capacity)
+        _thickness_buffer[:_nl] = self.thickness_array
+        self._refractive_index_buffer = _ri_buffer
+        self._thickness_buffer = _thickness_buffer
+        self._set_layer_views(_nl)
+
+    def _set_layer_views(self, number_of_layers):
+        """points _refractive_index_array and thickness_array at the first number_of_layers
+        columns of the layer buffers"""
+        self.number_of_layers = number_of_layers
+        self._refractive_index_view = self._refractive_index_buffer[:, :number_of_layers]
+        self._thickness_view = self._thickness_buffer[:number_of_layers]
+        self._refractive_index_array = self._refractive_index_view
+        self.thickness_array = self._thickness_view
 
     def randomize_thickness_array(self):
         """Function to randomize the thickness array"""
@@ -521,8 +973,19 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         # reset the refractive index array
         self.set_refractive_index_array()
 
-    def compute_spectrum(self):
+    def compute_spectrum(self, wavelength_indices=None, both_sides=False):
         """computes the following attributes:
+        Arguments
+        ---------
+        wavelength_indices : numpy array of ints
+            optional indices of the wavelengths to compute, e.g. the support of the figures
+            of merit from _get_fom_support; the spectra are left at zero elsewhere.
+            Default is all wavelengths
+        both_sides : bool
+            also compute the spectra for light incident from the terminal medium (the back side)
+            from the same transfer matrix, r_back = -M01 / M00 and t_back = det(M) / M00, instead
+            of reversing the stack. The back side angle of incidence is the refraction angle in
+            the terminal medium, i.e. incident_angle if the incident and terminal media are the same
         Attributes
         ----------
         reflectivity_array : 1 x number_of_wavelengths numpy array of floats
@@ -531,6 +994,8 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
             the transmissivity spectrum
         emissivity_array : 1 x number_of_wavelengths numpy array of floats
             the absorptivity / emissivity spectrum
+        reflectivity_back_array, transmissivity_back_array, emissivity_back_array : 1 x number_of_wavelengths numpy arrays of floats
+            the same spectra for incidence from the back side, if both_sides is True
         Returns
         -------
         None
@@ -545,8 +1010,20 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         self.reflectivity_array = np.zeros_like(self.wavelength_array)
         self.transmissivity_array = np.zeros_like(self.wavelength_array)
         self.emissivity_array = np.zeros_like(self.wavelength_array)
+        if both_sides:
+            self.reflectivity_back_array = np.zeros_like(self.wavelength_array)
+            self.transmissivity_back_array = np.zeros_like(self.wavelength_array)
+            self.emissivity_back_array = np.zeros_like(self.wavelength_array)
+
+        if wavelength_indices is None:
+            wavelength_indices = range(0, self.number_of_wavelengths)
 
-        for i in range(0, self.number_of_wavelengths):
+        if self.graded_layers or self._use_scattering_matrix(self.incident_angle):
+            # graded layers are only implemented in the batched engines
+            self._compute_scattering_matrix_spectrum(wavelength_indices, both_sides)
+            return
+
+        for i in wavelength_indices:
             _k0 = self._k0_array[i]
             _ri = self._refractive_index_array[i, :]
             _kz = self._kz_array[i, :]
@@ -582,8 +1059,193 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
             self.emissivity_array[i] = (
                 1 - self.reflectivity_array[i] - self.transmissivity_array[i]
             )
+
+            if both_sides:
+                # incidence from the terminal medium: (0, t_back) = M (r_back, 1)
+                _r_back = -_tm[0, 1] / _tm[0, 0]
+                _t_back = (_tm[0, 0] * _tm[1, 1] - _tm[0, 1] * _tm[1, 0]) / _tm[0, 0]
+                self.reflectivity_back_array[i] = np.real(_r_back * np.conj(_r_back))
+                self.transmissivity_back_array[i] = np.real(
+                    _t_back * np.conj(_t_back) / _factor
+                )
+                self.emissivity_back_array[i] = (
+                    1
+                    - self.reflectivity_back_array[i]
+                    - self.transmissivity_back_array[i]
+                )
         # self.render_color("ambient color")
 
+    def _compute_scattering_matrix_spectrum(self, wavelength_indices, both_sides=False):
+        """computes the attributes of compute_spectrum at wavelength_indices with the
+        scattering matrices, see _compute_batched_power_rt"""
+        _idx = np.asarray(wavelength_indices, dtype=int)
+        (
+            self.reflectivity_array[_idx],
+            self.transmissivity_array[_idx],
+            _R_back,
+            _T_back,
+        ) = self._compute_batched_power_rt(
+            self._refractive_index_array[_idx],
+            self.thickness_array,
+            self.incident_angle,
+            self.polarization,
+            self.wavelength_array[_idx],
+        )
+        self.emissivity_array[_idx] = (
+            1 - self.reflectivity_array[_idx] - self.transmissivity_array[_idx]
+        )
+        if both_sides:
+            self.reflectivity_back_array[_idx] = _R_back
+            self.transmissivity_back_array[_idx] = _T_back
+            self.emissivity_back_array[_idx] = (
+                1
+                - self.reflectivity_back_array[_idx]
+                - self.transmissivity_back_array[_idx]
+            )
+
+    def compute_adaptive_spectrum(
+        self,
+        tolerance=1e-3,
+        initial_number_of_wavelengths=33,
+        max_number_of_wavelengths=4097,
+    ):
+        """computes the spectra on a non-uniform wavelength grid between the first and last
+        entries of wavelength_array that is refined where the spectra change fastest.
+
+        Starting from a uniform coarse grid, the midpoint of every unconverged interval is
+        evaluated; the interval is converged once the difference between the one- and two-panel
+        trapezoid rules for R, T, epsilon (relative to the width of the grid) and for
+        epsilon times the blackbody spectrum at temperature (relative to the blackbody power)
+        is below its share tolerance * h / (lambda_max - lambda_min) of the target accuracy.
+
+        Arguments
+        ---------
+        tolerance : float
+            target relative integration accuracy
+
+        initial_number_of_wavelengths : int
+            number of points of the uniform starting grid
+
+        max_number_of_wavelengths : int
+            the refinement stops before the grid exceeds this number of points
+
+        Attributes
+        ----------
+        wavelength_array : numpy array of floats
+            the refined non-uniform grid; the refractive indices are only evaluated at the new
+            points of each round and all grid-dependent attributes are redefined once through
+            set_wavelength_array on the final grid
+
+        reflectivity_array, transmissivity_array, emissivity_array : numpy arrays of floats
+            the spectra on the refined grid
+
+        adaptive_spectrum_error : float
+            estimated relative integration error of the refined grid
+
+        Returns
+        -------
+        None
+        """
+        _wl = np.linspace(
+            self.wavelength_array[0],
+            self.wavelength_array[-1],
+            initial_number_of_wavelengths,
+        )
+        _span = _wl[-1] - _wl[0]
+        _spectra = self._compute_spectrum_on_grid(_wl)
+
+        # normalization of R, T, epsilon and of the thermal emission
+        _bb_power = np.trapz(
+            self._compute_blackbody_spectrum(_wl, self.temperature), _wl
+        )
+
+        # error estimate of each interval, infinite until it has been tested
+        _interval_error = np.full(len(_wl) - 1, np.inf)
+
+        while True:
+            _active = _interval_error > tolerance * np.diff(_wl) / _span
+            _number_of_new = np.count_nonzero(_active)
+            if _number_of_new == 0 or len(_wl) + _number_of_new > max_number_of_wavelengths:
+                break
+
+            # evaluate the midpoints of the active intervals
+            _mid = 0.5 * (_wl[:-1] + _wl[1:])[_active]
+            _new_wl = np.sort(np.concatenate((_wl, _mid)))
+            _is_new = np.isin(_new_wl, _mid)
+            _new_spectra = np.zeros((3, len(_new_wl)))
+            _new_spectra[:, ~_is_new] = _spectra
+            _new_spectra[:, _is_new] = self._compute_spectrum_on_grid(_mid)
+
+            # difference between one- and two-panel trapezoid rules on the tested intervals
+            _a = np.flatnonzero(~_is_new)[:-1][_active]
+            _f = np.concatenate(
+                (
+                    _new_spectra / _span,
+                    _new_spectra[2:3]
+                    * self._compute_blackbody_spectrum(_new_wl, self.temperature)
+                    / _bb_power,
+                )
+            )
+            _h = _new_wl[_a + 2] - _new_wl[_a]
+            _error = np.max(
+                0.25 * _h * np.abs(_f[:, _a] - 2 * _f[:, _a + 1] + _f[:, _a + 2]), axis=0
+            )
+
+            # each tested interval is split in two halves sharing its error estimate
+            _new_interval_error = np.repeat(_interval_error, np.where(_active, 2, 1))
+            _new_interval_error[_a] = 0.5 * _error
+            _new_interval_error[_a + 1] = 0.5 * _error
+
+            _wl = _new_wl
+            _spectra = _new_spectra
+            _interval_error = _new_interval_error
+
+        self.set_wavelength_array(_wl)
+        self.reflectivity_array, self.transmissivity_array, self.emissivity_array = (
+            _spectra
+        )
+        self.adaptive_spectrum_error = np.sum(_interval_error)
+
+    def _compute_spectrum_on_grid(self, wavelength_array):
+        """returns R, T and epsilon at incident_angle and polarization on wavelength_array,
+        evaluating the refractive indices (including graded slices) on those wavelengths only;
+        the wavelength grid and everything sampled on it are restored afterwards
+
+        Arguments
+        ---------
+        wavelength_array : numpy array of floats
+            the wavelengths in meters, need not be on the wavelength grid
+
+        Returns
+        -------
+        3 x len(wavelength_array) numpy array of floats
+        """
+        _saved = (
+            self.wavelength_array,
+            self.number_of_wavelengths,
+            self.wavenumber_array,
+            self._refractive_index_array,
+            {_l: _layer["index"] for _l, _layer in self.graded_layers.items()},
+        )
+        try:
+            self.wavelength_array = np.asarray(wavelength_array, dtype=float)
+            self.number_of_wavelengths = len(self.wavelength_array)
+            self.wavenumber_array = 1 / self.wavelength_array
+            self.set_refractive_index_array()
+            return np.array(
+                self._compute_batched_spectrum(self.incident_angle, self.polarization)
+            )
+        finally:
+            (
+                self.wavelength_array,
+                self.number_of_wavelengths,
+                self.wavenumber_array,
+                self._refractive_index_array,
+                _graded_index,
+            ) = _saved
+            for _l, _index in _graded_index.items():
+                self.graded_layers[_l]["index"] = _index
+
     def compute_explicit_angle_spectrum(self):
         """computes the following attributes:
         Attributes
@@ -629,13 +1291,24 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         )
 
         # now set up the angular Gauss-Legendre grid
-        a = 0
-        b = np.pi / 2.0
-        self.x, self.theta_weights = np.polynomial.legendre.leggauss(
+        self.theta_vals, self.theta_weights = self._get_angular_quadrature(
             self.number_of_angles
         )
-        self.theta_vals = 0.5 * (self.x + 1) * (b - a) + a
-        self.theta_weights = self.theta_weights * 0.5 * (b - a)
+
+        if self.graded_layers or self._use_scattering_matrix(self.theta_vals):
+            for _pol in ["s", "p"]:
+                _R, _T, _E = self._compute_batched_rt(
+                    self._refractive_index_array,
+                    self.thickness_array,
+                    self.theta_vals,
+                    _pol,
+                    self.wavelength_array,
+                    np.complex128,
+                )
+                setattr(self, "reflectivity_array_" + _pol, _R)
+                setattr(self, "transmissivity_array_" + _pol, _T)
+                setattr(self, "emissivity_array_" + _pol, _E)
+            return
 
         # compute k0 which does not care about angle
         self._compute_k0()
@@ -708,46 +1381,270 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
                     - self.transmissivity_array_p[i, j]
                 )
 
-    def compute_spectrum_gradient(self):
-        """computes the following attributes:
+    def compute_adaptive_angle_spectrum(self, tolerance=None, max_number_of_angles=63):
+        """computes the angle-dependent spectra on a nested Clenshaw-Curtis grid that is refined
+        (3, 7, 15, ... angles) until the radiative cooling power P_rad and the atmospheric
+        warming power P_atm change by less than tolerance * |P_rad| between levels;
+        the spectra at the nodes of the previous level are reused
+
+        Arguments
+        ---------
+        tolerance : float
+            relative tolerance on P_rad and P_atm, default is self.angle_tolerance or 1e-3
+
+        max_number_of_angles : int
+            the refinement stops at this number of angles even if not converged
+
         Attributes
         ----------
-        reflectivity_gradient_array : number_of_wavelengths x len(gradient_list) numpy array of floats
-            the reflectivity spectrum
-        transmissivity_gradient_array : number_of_wavelengths x len(gradient_list) numpy array of floats
-            the transmissivity spectrum
-        emissivity_gradient_array : number_of_wavelengths x len(gradient_list) numpy array of floats
-            the absorptivity / emissivity spectrum
+        reflectivity_array_s, reflectivity_array_p : number_of_angles x number_of_wavelengths numpy arrays of floats
+        transmissivity_array_s, transmissivity_array_p : number_of_angles x number_of_wavelengths numpy arrays of floats
+        emissivity_array_s, emissivity_array_p : number_of_angles x number_of_wavelengths numpy arrays of floats
+            the spectra vs angle and wavelength on the converged angular grid
+
+        theta_vals, theta_weights : numpy arrays of floats
+            the converged angular nodes and weights, i.e. the grid of the spectra above
+
+        adaptive_number_of_angles : int
+            the number of angles of the converged grid; number_of_angles, which sets the grid
+            of compute_explicit_angle_spectrum, is left unchanged
+
+        angular_quadrature_error : float
+            estimated absolute error of P_rad and P_atm (difference to the previous level)
+
         Returns
         -------
         None
         """
+        if tolerance is None:
+            tolerance = self.angle_tolerance
+        if tolerance is None:
+            tolerance = 1e-3
+
+        _w = self._compute_trapz_weights(self.wavelength_array)
+        _w_rad = _w * self._compute_blackbody_spectrum(
+            self.wavelength_array, self.temperature
+        )
+        _w_atm = _w * self._compute_blackbody_spectrum(
+            self.wavelength_array, self.atmospheric_temperature
+        )
 
-        # initialize gradient arrays
-        # _nwl -> number of wavelengths
-        _nwl = len(self.wavelength_array)
-        # _ngr -> number of gradient dimensions
-        _ngr = len(self.gradient_list)
-
-        self.reflectivity_gradient_array = np.zeros((_nwl, _ngr))
-        self.transmissivity_gradient_array = np.zeros((_nwl, _ngr))
-        self.emissivity_gradient_array = np.zeros((_nwl, _ngr))
-
-        for i in range(0, _ngr):
-            for j in range(0, _nwl):
-                _k0 = self._k0_array[j]
-                _ri = self._refractive_index_array[j, :]
-                _kz = self._kz_array[j, :]
+        def _compute_powers(theta_vals, theta_weights, emissivity):
+            _emissivity_atm, _w_theta = self._get_atmospheric_emissivity_table(
+                self._atmospheric_transmissivity, theta_vals, theta_weights
+            )
+            _P_rad = 0.5 * np.dot(_w_theta, np.dot(emissivity, _w_rad))
+            _P_atm = 0.5 * np.dot(_w_theta, np.dot(_emissivity_atm * emissivity, _w_atm))
+            return _P_rad, _P_atm
+
+        # spectra at the coarsest level
+        _n = 3
+        _theta_vals, _theta_weights = self._get_angular_quadrature(
+            _n, rule="clenshaw-curtis"
+        )
+        _spectra = [
+            np.array(self._compute_batched_spectrum(_theta_vals, _pol))
+            for _pol in ("s", "p")
+        ]
+        _P_rad, _P_atm = _compute_powers(
+            _theta_vals, _theta_weights, _spectra[0][2] + _spectra[1][2]
+        )
+        _error = np.inf
 
-                # get transfer matrix, theta_array, and co_theta_array for current k0 value
-                _tm, _theta_array, _cos_theta_array = self._compute_tm(
-                    _ri, _k0, _kz, self.thickness_array
+        while 2 * _n + 1 <= max_number_of_angles:
+            _n = 2 * _n + 1
+            _theta_vals, _theta_weights = self._get_angular_quadrature(
+                _n, rule="clenshaw-curtis"
+            )
+            # the nodes of the previous level are the odd entries of the new level
+            for _i, _pol in enumerate(("s", "p")):
+                _refined = np.zeros((3, _n, self.number_of_wavelengths))
+                _refined[:, 1::2, :] = _spectra[_i]
+                _refined[:, 0::2, :] = self._compute_batched_spectrum(
+                    _theta_vals[0::2], _pol
                 )
+                _spectra[_i] = _refined
 
-                # get gradient of transfer matrix with respect to layer i
-                _tm_grad, _theta_array, _cos_theta_array = self._compute_tm_gradient(
-                    _ri, _k0, _kz, self.thickness_array, i + 1
-                )
+            _P_rad_new, _P_atm_new = _compute_powers(
+                _theta_vals, _theta_weights, _spectra[0][2] + _spectra[1][2]
+            )
+            _error = max(abs(_P_rad_new - _P_rad), abs(_P_atm_new - _P_atm))
+            _P_rad, _P_atm = _P_rad_new, _P_atm_new
+            if _error <= tolerance * abs(_P_rad):
+                break
+
+        self.adaptive_number_of_angles = _n
+        self.theta_vals = _theta_vals
+        self.theta_weights = _theta_weights
+        self.angular_quadrature_error = _error
+        (
+            self.reflectivity_array_s,
+            self.transmissivity_array_s,
+            self.emissivity_array_s,
+        ) = _spectra[0]
+        (
+            self.reflectivity_array_p,
+            self.transmissivity_array_p,
+            self.emissivity_array_p,
+        ) = _spectra[1]
+
+    def compute_layer_absorption(self, wavelength_indices=None):
+        """computes the fraction of the incident power absorbed in each layer from the Poynting
+        flux at every interface, for all wavelengths in one pass, at the current incident_angle
+        and polarization
+
+        Arguments
+        ---------
+        wavelength_indices : numpy array of ints
+            optional indices of the wavelengths to compute, the absorption is left at zero
+            elsewhere. Default is all wavelengths
+
+        Attributes
+        ----------
+        layer_absorption_array : number_of_layers x number_of_wavelengths numpy array of floats
+            the absorbed fraction in each layer; the entry of the incident medium is zero and the
+            entry of the terminal medium is the transmissivity, so each column sums to 1 - R
+
+        Returns
+        -------
+        None
+        """
+        if wavelength_indices is None:
+            wavelength_indices = slice(None)
+        self.layer_absorption_array = np.zeros(
+            (self.number_of_layers, self.number_of_wavelengths)
+        )
+        self.layer_absorption_array[:, wavelength_indices] = (
+            self._compute_batched_layer_absorption(
+                self.incident_angle,
+                self.polarization,
+                self._refractive_index_array[wavelength_indices],
+                wavelength_array=self.wavelength_array[wavelength_indices],
+            )
+        )
+
+    def compute_field_intensity(self, depth_array):
+        """computes the electric field intensity |E|^2, relative to the incident field, at depths
+        in the stack for all wavelengths at the current incident_angle and polarization
+
+        Arguments
+        ---------
+        depth_array : numpy array of floats
+            depths in meters measured from the top of layer 1; negative depths are in the
+            incident medium and depths beyond the last layer are in the terminal medium
+
+        Attributes
+        ----------
+        field_depth_array : numpy array of floats
+            the depths in meters
+
+        field_intensity_array : len(depth_array) x number_of_wavelengths numpy array of floats
+            |E|^2 / |E_incident|^2 at each depth and wavelength
+
+        Returns
+        -------
+        None
+        """
+        self.field_depth_array = np.asarray(depth_array, dtype=float)
+        _amplitudes, _kz, _sin_theta = self._compute_batched_layer_fields(
+            self._refractive_index_array,
+            self.thickness_array,
+            self.incident_angle,
+            self.polarization,
+            self.wavelength_array,
+        )[-3:]
+
+        # layer of each depth and distance to the bottom of that layer
+        _d = np.array(self.thickness_array, dtype=float)
+        _d[0] = _d[-1] = 0.0
+        _top = np.concatenate(([0.0, 0.0], np.cumsum(_d[1:-1])))
+        _layer = np.searchsorted(_top[1:], self.field_depth_array, side="right")
+        _distance = _d[_layer] + _top[_layer] - self.field_depth_array
+
+        # nwl x len(depth_array)
+        _phase = np.exp(-1j * _kz[:, _layer] * _distance)
+        _forward = _amplitudes[:, _layer, 0] * _phase
+        _backward = _amplitudes[:, _layer, 1] / _phase
+        if self.polarization == "s":
+            _intensity = np.abs(_forward + _backward) ** 2
+        else:
+            _cos_theta = np.sqrt(1 - _sin_theta[:, _layer] ** 2 + 0j)
+            _intensity = (
+                np.abs(_cos_theta * (_forward + _backward)) ** 2
+                + np.abs(_sin_theta[:, _layer] * (_forward - _backward)) ** 2
+            )
+        self.field_intensity_array = np.transpose(_intensity)
+
+    def compute_spectrum_gradient(self, wavelength_indices=None):
+        """computes the following attributes:
+        Arguments
+        ---------
+        wavelength_indices : numpy array of ints
+            optional indices of the wavelengths to compute, the gradients are left at zero
+            elsewhere. Default is all wavelengths
+        Attributes
+        ----------
+        reflectivity_gradient_array : number_of_wavelengths x len(gradient_list) numpy array of floats
+            the reflectivity spectrum
+        transmissivity_gradient_array : number_of_wavelengths x len(gradient_list) numpy array of floats
+            the transmissivity spectrum
+        emissivity_gradient_array : number_of_wavelengths x len(gradient_list) numpy array of floats
+            the absorptivity / emissivity spectrum
+        Returns
+        -------
+        None
+        """
+
+        # initialize gradient arrays
+        # _nwl -> number of wavelengths
+        _nwl = len(self.wavelength_array)
+        # _ngr -> number of gradient dimensions
+        _ngr = len(self.gradient_list)
+
+        self.reflectivity_gradient_array = np.zeros((_nwl, _ngr))
+        self.transmissivity_gradient_array = np.zeros((_nwl, _ngr))
+        self.emissivity_gradient_array = np.zeros((_nwl, _ngr))
+
+        if (
+            self.gradient_type != "thickness"
+            or self.graded_layers
+            or self._use_scattering_matrix(self.incident_angle)
+        ):
+            # index gradients are only available from the batched transfer matrices, and the
+            # scattering matrices and graded layers are only implemented in the batched engines
+            if wavelength_indices is None:
+                wavelength_indices = slice(None)
+            (
+                _,
+                _,
+                self.reflectivity_gradient_array[wavelength_indices],
+                self.transmissivity_gradient_array[wavelength_indices],
+            ) = self._compute_batched_spectrum_gradient(
+                self.incident_angle, self.polarization, wavelength_indices
+            )
+            self.emissivity_gradient_array = (
+                -self.reflectivity_gradient_array - self.transmissivity_gradient_array
+            )
+            return
+
+        if wavelength_indices is None:
+            wavelength_indices = range(0, _nwl)
+
+        for i in range(0, _ngr):
+            for j in wavelength_indices:
+                _k0 = self._k0_array[j]
+                _ri = self._refractive_index_array[j, :]
+                _kz = self._kz_array[j, :]
+
+                # get transfer matrix, theta_array, and co_theta_array for current k0 value
+                _tm, _theta_array, _cos_theta_array = self._compute_tm(
+                    _ri, _k0, _kz, self.thickness_array
+                )
+
+                # get gradient of transfer matrix with respect to layer i
+                _tm_grad, _theta_array, _cos_theta_array = self._compute_tm_gradient(
+                    _ri, _k0, _kz, self.thickness_array, i + 1
+                )
 
                 # Using equation (14) from https://journals.aps.org/prresearch/abstract/10.1103/PhysRevResearch.2.013018
                 # for the derivative of the reflection amplitude for wavelength j with respect to layer i
@@ -816,8 +1713,8 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         _nwl = len(self.wavelength_array)
         # _ngr -> number of gradient dimensions
         _ngr = len(self.gradient_list)
-        # _nth -> number of angles
-        _nth = self.number_of_angles
+        # _nth -> number of angles of the current angle-resolved spectra
+        _nth = len(self.theta_vals)
 
         # jjf note - _nwl is going to be the longest axis in most cases
         # should it be either the inner-most or outter-most dimension instead for
@@ -831,6 +1728,25 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         self.emissivity_gradient_array_s = np.zeros((_nth, _nwl, _ngr))
         self.emissivity_gradient_array_p = np.zeros((_nth, _nwl, _ngr))
 
+        _angles = np.asarray(self.theta_vals[:_nth])
+        if (
+            self.gradient_type != "thickness"
+            or self.graded_layers
+            or self._use_scattering_matrix(_angles)
+        ):
+            # index gradients are only available from the batched transfer matrices, and the
+            # scattering matrices and graded layers are only implemented in the batched engines
+            for _pol in ["s", "p"]:
+                _, _, _R_gradient, _T_gradient = self._compute_batched_spectrum_gradient(
+                    _angles, _pol
+                )
+                setattr(self, "reflectivity_gradient_array_" + _pol, _R_gradient)
+                setattr(self, "transmissivity_gradient_array_" + _pol, _T_gradient)
+                setattr(
+                    self, "emissivity_gradient_array_" + _pol, -_R_gradient - _T_gradient
+                )
+            return
+
         # compute k0 which does not care about angle
         self._compute_k0()
 
@@ -951,23 +1867,296 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
                         - self.reflectivity_gradient_array_p[k, j, i]
                     )
 
+    def _get_fom_plan(self):
+        """returns the FomPlan holding the quadrature weights of all figures of merit,
+        rebuilding it only when the wavelength grid, the temperatures, the ancillary
+        spectra or the angular quadrature have changed
+
+        Attributes
+        ----------
+        fom_plan : FomPlan
+            the cached quadrature weights of all figures of merit
+
+        Returns
+        -------
+        fom_plan
+        """
+        # the sampled arrays are only ever replaced, never modified in place, so they are
+        # compared by identity (and shape), which costs nothing per call; the few scalar
+        # parameters are compared by value
+        _arrays = (
+            self.wavelength_array,
+            self._solar_spectrum,
+            self._atmospheric_transmissivity,
+            self.transmissive_envelope,
+            self.reflective_envelope,
+            getattr(self, "theta_vals", None),
+            getattr(self, "theta_weights", None),
+        )
+        _values = (
+            self.temperature,
+            self.atmospheric_temperature,
+            self.lambda_bandgap,
+            self.pv_lambda_bandgap,
+        )
+        _key = getattr(self, "_fom_plan_key", None)
+        if (
+            _key is None
+            or any(
+                _x is not _y or np.shape(_x) != _shape
+                for _x, (_y, _shape) in zip(_arrays, _key[0])
+            )
+            or any(
+                not np.array_equal(_x, _y) for _x, _y in zip(_values, _key[1])
+            )
+        ):
+            self.fom_plan = self._build_fom_plan(self.temperature)
+            self._fom_plan_key = (
+                tuple((_x, np.shape(_x)) for _x in _arrays),
+                tuple(np.array(_x, dtype=float) for _x in _values),
+            )
+
+        return self.fom_plan
+
+    def _get_fom_support(self, *names):
+        """returns the indices of the wavelengths that figures of merit names depend on,
+        so that the optics only need to be computed there
+
+        Arguments
+        ---------
+        names : str
+            keys of the figures of merit in the FomPlan
+
+        Returns
+        -------
+        numpy array of ints
+        """
+        return np.flatnonzero(self._get_fom_plan().compute_support(*names))
+
+    def _compute_batched_fom(
+        self, figure_of_merit, refractive_index_array, thickness_array, spectra=None
+    ):
+        """evaluates a figure of merit for a batch of structures in one batched pass
+
+        Arguments
+        ---------
+        figure_of_merit : str
+            one of Optimizer.figures_of_merit
+        refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+        thickness_array : S x number_of_layers numpy array of floats
+        spectra : tuple of numpy arrays of floats
+            optional (R, T, epsilon) of the batch at incident_angle and polarization from
+            _compute_batched_spectrum, reused by the figures of merit defined there
+
+        Returns
+        -------
+        S numpy array of floats
+        """
+
+        def _spectra(incident_angles, polarization):
+            return self._compute_batched_spectrum(
+                incident_angles,
+                polarization,
+                refractive_index_array=refractive_index_array,
+                thickness_array=thickness_array,
+            )
+
+        _name = figure_of_merit
+        if _name in ("radiative_cooling_power", "net_cooling_power"):
+            if getattr(self, "theta_vals", None) is None:
+                self.theta_vals, self.theta_weights = self._get_angular_quadrature(
+                    self.number_of_angles
+                )
+            _plan = self._get_fom_plan()
+            _fom = 0.0
+            for _pol in ("s", "p"):
+                _, _, _E = _spectra(self.theta_vals, _pol)
+                _fom = _fom + _plan.evaluate("radiative_cooling_power", _E)
+                if _name == "net_cooling_power":
+                    _fom = _fom - _plan.evaluate("atmospheric_warming_power", _E)
+                    _, _, _E = _spectra(self.solar_angle, _pol)
+                    _fom = _fom - _plan.evaluate("solar_warming_power", _E)
+            return _fom
+
+        _plan = self._get_fom_plan()
+        if spectra is None:
+            spectra = _spectra(self.incident_angle, self.polarization)
+        _R, _T, _E = spectra
+        if _name in ("power_density", "stpv_power_density"):
+            return _plan.evaluate(_name, _E)
+        if _name == "stpv_spectral_efficiency":
+            return _plan.evaluate("stpv_power_density", _E) / _plan.evaluate(
+                "power_density", _E
+            )
+
+        _eta_T = _plan.evaluate("transmission_efficiency", _T)
+        _f = _plan.evaluate("useful_reflected_power", _R)
+        _g = _plan.evaluate("total_reflected_power", _R)
+        # reflection efficiency is zero if the reflectivity is zero everywhere
+        _eta_R = np.where(_g == 0.0, 0.0, _f / np.where(_g == 0.0, 1.0, _g))
+        if _name == "transmission_efficiency":
+            return _eta_T
+        if _name == "reflection_efficiency":
+            return _eta_R
+        return (
+            self.transmission_efficiency_weight * _eta_T
+            + self.reflection_efficiency_weight * _eta_R
+        )
+
+    def _build_fom_plan(self, temperature, atmospheric_temperature=None):
+        """builds a FomPlan for the current structure at temperature
+
+        Arguments
+        ---------
+        temperature : float or numpy array of floats
+            the temperature(s) of the structure in Kelvin
+
+        atmospheric_temperature : float or numpy array of floats
+            the temperature(s) of the atmosphere in Kelvin, default is self.atmospheric_temperature
+
+        Returns
+        -------
+        FomPlan
+        """
+        if atmospheric_temperature is None:
+            atmospheric_temperature = self.atmospheric_temperature
+        _theta_vals = getattr(self, "theta_vals", None)
+        _theta_weights = getattr(self, "theta_weights", None)
+        _atmospheric_emissivity_table = None
+        if _theta_vals is not None and _theta_weights is not None:
+            _atmospheric_emissivity_table, _ = self._get_atmospheric_emissivity_table(
+                self._atmospheric_transmissivity, _theta_vals, _theta_weights
+            )
+        return FomPlan(
+            self.wavelength_array,
+            temperature=temperature,
+            lambda_bandgap=self.lambda_bandgap,
+            atmospheric_temperature=atmospheric_temperature,
+            pv_lambda_bandgap=self.pv_lambda_bandgap,
+            solar_spectrum=self._solar_spectrum,
+            atmospheric_transmissivity=self._atmospheric_transmissivity,
+            transmissive_envelope=self.transmissive_envelope,
+            reflective_envelope=self.reflective_envelope,
+            theta_vals=_theta_vals,
+            theta_weights=_theta_weights,
+            atmospheric_emissivity_table=_atmospheric_emissivity_table,
+        )
+
     def compute_stpv(self):
-        """compute the figures of merit for STPV applications, including"""
+        """compute the figures of merit for STPV applications, including
+        the power_density, stpv_power_density and stpv_spectral_efficiency,
+        each as a single dot product with the weights of the FomPlan
+        """
         self.compute_spectrum()
-        self._compute_therml_spectrum(self.wavelength_array, self.emissivity_array)
-        self._compute_power_density(self.wavelength_array)
-        self._compute_stpv_power_density(self.wavelength_array)
-        self._compute_stpv_spectral_efficiency(self.wavelength_array)
+        _plan = self._get_fom_plan()
+
+        self.blackbody_spectrum = _plan.blackbody_spectrum
+        self.thermal_emission_array = self.blackbody_spectrum * self.emissivity_array
+        self.blackbody_power_density = _plan.blackbody_power_density
+        # Stefan-Boltzmann constant
+        sig = 5.670374419e-8
+        self.stefan_boltzmann_law = sig * self.temperature ** 4
+
+        self.power_density = _plan.evaluate("power_density", self.emissivity_array)
+        self.stpv_power_density = _plan.evaluate(
+            "stpv_power_density", self.emissivity_array
+        )
+        self.stpv_spectral_efficiency = self.stpv_power_density / self.power_density
 
-    def compute_stpv_gradient(self):
+    def compute_stpv_temperature_sweep(self, temperature_array):
+        """compute the STPV and incandescent figures of merit for an array of temperatures
+        from a single optical calculation, since the emissivity does not depend on temperature
+
+        Arguments
+        ---------
+        temperature_array : numpy array of floats
+            the nT temperatures in Kelvin
+
+        Attributes
+        ----------
+        temperature_sweep_array : nT numpy array of floats
+            the temperatures of the sweep
+
+        blackbody_power_density_sweep : nT numpy array of floats
+            blackbody power density at each temperature
+
+        power_density_sweep : nT numpy array of floats
+            power density radiated by the structure at each temperature
+
+        stpv_power_density_sweep : nT numpy array of floats
+            useful (sub-bandgap) power density at each temperature
+
+        stpv_spectral_efficiency_sweep : nT numpy array of floats
+            spectral efficiency at each temperature
+
+        luminous_efficiency_sweep : nT numpy array of floats
+            luminous efficiency at each temperature
+
+        Returns
+        -------
+        None
+        """
+        self.temperature_sweep_array = np.asarray(temperature_array, dtype=float)
         self.compute_spectrum()
+
+        # all Planck spectra are built as one nT x number_of_wavelengths broadcast
+        _plan = self._build_fom_plan(self.temperature_sweep_array)
+
+        self.blackbody_power_density_sweep = _plan.blackbody_power_density
+        self.power_density_sweep = _plan.evaluate(
+            "power_density", self.emissivity_array
+        )
+        self.stpv_power_density_sweep = _plan.evaluate(
+            "stpv_power_density", self.emissivity_array
+        )
+        self.stpv_spectral_efficiency_sweep = (
+            self.stpv_power_density_sweep / self.power_density_sweep
+        )
+        self.luminous_efficiency_sweep = (
+            _plan.evaluate("luminous_power_density", self.emissivity_array)
+            / self.power_density_sweep
+        )
+
+    def compute_stpv_gradient(self):
+        """compute the gradients of the STPV figures of merit as matrix-vector
+        products of the emissivity_gradient_array with the weights of the FomPlan
+        """
+        self.compute_stpv()
+        _plan = self._get_fom_plan()
+
+        if self.gradient_method == "adjoint":
+            # d epsilon = - dR - dT
+            _w = -np.array(
+                [_plan.weights["power_density"], _plan.weights["stpv_power_density"]]
+            )
+            (
+                self.power_density_gradient,
+                self.stpv_power_density_gradient,
+            ) = self._compute_fom_gradient_vjp(
+                self.incident_angle, self.polarization, _w, _w
+            )
+        else:
+            self._compute_stpv_power_density_gradients(_plan)
+
+        # quotient rule, see Eq. (4) of https://journals.aps.org/prresearch/abstract/10.1103/PhysRevResearch.2.013018
+        _P = self.power_density
+        _rho = self.stpv_power_density
+        self.stpv_spectral_efficiency_gradient = (
+            self.stpv_power_density_gradient * _P - self.power_density_gradient * _rho
+        ) / (_P * _P)
+
+    def _compute_stpv_power_density_gradients(self, _plan):
+        """integrates the emissivity_gradient_array against the STPV weights of _plan"""
         self.compute_spectrum_gradient()
-        self._compute_therml_spectrum_gradient(
-            self.wavelength_array, self.emissivity_gradient_array
+        self.thermal_emission_gradient_array = (
+            self.blackbody_spectrum[:, np.newaxis] * self.emissivity_gradient_array
+        )
+        self.power_density_gradient = _plan.evaluate_gradient(
+            "power_density", self.emissivity_gradient_array
+        )
+        self.stpv_power_density_gradient = _plan.evaluate_gradient(
+            "stpv_power_density", self.emissivity_gradient_array
         )
-        self._compute_power_density_gradient(self.wavelength_array)
-        self._compute_stpv_power_density_gradient(self.wavelength_array)
-        self._compute_stpv_spectral_efficiency_gradient(self.wavelength_array)
 
     def compute_pv_stpv(self):
         """
@@ -993,38 +2182,47 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         """
         Function to compute the f_C figure of merit for pv-stpv, Eq. (45) here: https://www.overleaf.com/project/648a0cfeae29e31e10afc075
         We will assume the base layer is the AR + Polystyrene stack so we
-        will add the PSC layer here too
-        """
-        # First make sure we have full stack including the PSC layer
-        # get terminal layer number
-        _ln = len(self.thickness_array) - 1
-        # insert thick active layer as the bottom-most layer
-        self.insert_layer(_ln, 1000e-9)
-        # make sure the active layer has RI of 2D perovskite
-        self.material_2D_HOIP(_ln)
-        self.compute_spectrum()
-        absorptivity_full_stack = self.emissivity_array
+        will add the PSC layer here too; the current is generated by the light absorbed
+        in the PSC layer, which is computed from the Poynting flux without editing the structure
 
-        # get envelope function that behaves like ideal spectral response function
-        bg_idx = np.abs(self.wavelength_array - self.pv_lambda_bandgap).argmin()
-        env = np.zeros_like(self.wavelength_array)
-        # scale AM by \lambda / \lambda_bg
-        env[:bg_idx] = self.wavelength_array[:bg_idx] / self.pv_lambda_bandgap
-        # compute the useful power density spectrum
-        power_density_array = (
-            self._solar_spectrum * absorptivity_full_stack * env
-        )
+        Attributes
+        ----------
+        pv_stpv_active_layer_absorption_array : 1 x number_of_wavelengths numpy array of floats
+            the fraction of the incident power absorbed in the PSC layer
 
-        self.pv_stpv_short_circuit_current = np.trapz(
-            power_density_array, self.wavelength_array
+        pv_stpv_short_circuit_current : float
+            the short circuit current
+        """
+        _ri, _d, _ln = self._get_pv_stpv_active_stack()
+        # only the sub-bandgap wavelengths contribute
+        _support = self._get_fom_support("pv_stpv_short_circuit_current")
+        self.pv_stpv_active_layer_absorption_array = np.zeros(self.number_of_wavelengths)
+        self.pv_stpv_active_layer_absorption_array[
+            _support
+        ] = self._compute_batched_layer_absorption(
+            self.incident_angle,
+            self.polarization,
+            _ri[_support],
+            _d,
+            self.wavelength_array[_support],
+        )[
+            _ln
+        ]
+
+        # the weights hold AM1.5 scaled by the ideal spectral response \lambda / \lambda_bg
+        self.pv_stpv_short_circuit_current = self._get_fom_plan().evaluate(
+            "pv_stpv_short_circuit_current", self.pv_stpv_active_layer_absorption_array
         )
 
-        # go back to original spectrum
-        self.remove_layer(_ln)
-        self.compute_spectrum()
-
-        
-
+    def _get_pv_stpv_active_stack(self):
+        """returns the refractive index and thickness arrays of the structure with a 1000 nm
+        2D-HOIP active (PSC) layer as the bottom-most layer, and the index of that layer,
+        without editing the structure"""
+        _ln = self.number_of_layers - 1
+        _hoip = self._get_material_index_bank(["2D_HOIP"])[0]
+        _ri = np.insert(self._refractive_index_array, _ln, _hoip, axis=1)
+        _d = np.insert(np.asarray(self.thickness_array, dtype=float), _ln, 1000e-9)
+        return _ri, _d, _ln
 
     def compute_pv_stpv_short_circuit_current_gradient_gradient(self):
         """
@@ -1032,58 +2230,53 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
 
         Attributes
         ----------
+        pv_stpv_active_layer_absorption_gradient_array : number_of_wavelengths x len(gradient_list) numpy array of floats
+            the gradient of the absorption in the PSC layer
 
-        e_gradient_index : Integer
-                        Length of the emissivity gradient array.
-
-        emissivity_gradient_array_prime : Array
-                                        (Emissivity gradient array x Wavelength array) / Lambda bandgap.
-
-        pv_stpv_short_circuit_current : Float
-                                    Short circuit current as defined in Equation (23) of https://journals.aps.org/prresearch/abstract/10.1103/PhysRevResearch.2.013018
-                                     the integration of Emissivity x Spectral Response x Solar Spectrum over wavelength.
+        pv_stpv_short_circuit_current_gradient : numpy array of floats
+            gradient of the short circuit current as defined in Equation (23) of https://journals.aps.org/prresearch/abstract/10.1103/PhysRevResearch.2.013018
+            the integration of absorption x Spectral Response x Solar Spectrum over wavelength.
 
         Returns:
         --------
         None
         """
+        self.compute_pv_stpv_short_circuit_current()
+        _ri, _d, _ln = self._get_pv_stpv_active_stack()
+        _support = self._get_fom_support("pv_stpv_short_circuit_current")
+        self._check_transfer_matrix_stack(
+            "pv-stpv short circuit current gradients",
+            self.incident_angle,
+            _ri[_support],
+            _d,
+            self.wavelength_array[_support],
+        )
+        _tm, _, _tm_gradient = self._compute_batched_tm_gradient(
+            _ri[_support],
+            _d,
+            self.incident_angle,
+            self.polarization,
+            self.wavelength_array[_support],
+            self.gradient_list,
+            gradient_type=self.gradient_type,
+        )
 
-        # Looking at the short circuit current (Jsc)
-        # Need to iterate over emissivity_gradient_array for every value at a given wavelength.
-        # Need to take the integral of this multiplied by _solar_spectrum and spectral_response (both precalculated), between 0 and lambda bandgap.
-
-        _ln = len(self.thickness_array) - 1
-        # insert thick active layer as the bottom-most layer
-        self.insert_layer(_ln, 1000e-9)
-        # make sure the active layer has RI of 2D perovskite
-        self.material_2D_HOIP(_ln)
-        # Acquire necessary variables
-        self._solar_spectrum = self._read_AM()
-        self.compute_spectrum()
-        self.compute_spectrum_gradient()
-
-        # Initialize short circuit current array
-        e_gradient_index = len(self.emissivity_gradient_array[0, :])
-        self.pv_stpv_short_circuit_current_gradient = np.zeros(e_gradient_index)
-
-        bg_idx = np.abs(self.wavelength_array - self.pv_lambda_bandgap).argmin()
-        _spectral_response = np.zeros_like(self.wavelength_array)
-
-        _spectral_response[:bg_idx] = self.wavelength_array[:bg_idx] / self.pv_lambda_bandgap
+        # the PSC layer is adjacent to the terminal medium, so its absorption is |t|^2 times a
+        # factor that does not depend on the layers above it: dA = 2 A Re(t' / t) = -2 A Re(dM00 / M00)
+        _A = self.pv_stpv_active_layer_absorption_array[_support]
+        self.pv_stpv_active_layer_absorption_gradient_array = np.zeros(
+            (self.number_of_wavelengths, len(self.gradient_list))
+        )
+        self.pv_stpv_active_layer_absorption_gradient_array[_support] = np.transpose(
+            -2 * _A * np.real(_tm_gradient[..., 0] / _tm[..., 0, 0])
+        )
 
-        # Iterate over material thicknesses
-        for i in range(0, e_gradient_index):
-            self.pv_stpv_short_circuit_current_gradient[i] = np.trapz(
-                self.emissivity_gradient_array[:,i]
-                * _spectral_response
-                * self._solar_spectrum,
-                self.wavelength_array,
-            )  # Integrate for short circuit current
+        # Integrate for short circuit current gradient in one matrix-vector product
+        self.pv_stpv_short_circuit_current_gradient = self._get_fom_plan().evaluate_gradient(
+            "pv_stpv_short_circuit_current",
+            self.pv_stpv_active_layer_absorption_gradient_array,
+        )
 
-        # go back to original spectrum
-        self.remove_layer(_ln)
-        self.compute_spectrum()
-        self.compute_spectrum_gradient()
     # Other figure of merit calculations here to be called in compute_pv_stpv
 
     def compute_pv_stpv_total_incident_power(self):
@@ -1100,219 +2293,2166 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         total_incident_power = pv_stpv_short_circuit_current_gradient * Voc * Fill factor
         
         """
-        pass 
-    
-    def compute_pv_stpv_splitting_power_spectrum(self):
-        """  
-        Docstring
+        pass 
+    
+    def compute_pv_stpv_splitting_power_spectrum(self, wavelength_indices=None):
+        """  
+        Docstring
+
+        Method to compute the pv_stpv splitting power spectrum as defined by 
+         the integrand of Eq. (46) of https://www.overleaf.com/project/648a0cfeae29e31e10afc075 
+
+        Arguments
+        ---------
+        wavelength_indices : numpy array of ints
+            optional indices of the wavelengths at which the spectrum is computed (zero elsewhere)
+
+        The back side emissivity is computed into _pv_stpv_back_emissivity_array without the
+        stack being reversed, and the public front and back spectra are left untouched
+        """
+        if wavelength_indices is None:
+            wavelength_indices = np.arange(self.number_of_wavelengths)
+        _idx = np.asarray(wavelength_indices, dtype=int)
+
+        # the back side powers from the scattering matrices of the stack, on _idx only
+        _, _, _R_back, _T_back = self._compute_batched_power_rt(
+            self._refractive_index_array[_idx],
+            self.thickness_array,
+            self.incident_angle,
+            self.polarization,
+            self.wavelength_array[_idx],
+        )
+        self._pv_stpv_back_emissivity_array = np.zeros(self.number_of_wavelengths)
+        self._pv_stpv_back_emissivity_array[_idx] = 1 - _R_back - _T_back
+
+        # Store thermal emission spectra into the active layer
+        self.blackbody_spectrum = self._get_fom_plan().blackbody_spectrum
+        self.pv_stpv_splitting_power_spectrum = (
+            self.blackbody_spectrum * self._pv_stpv_back_emissivity_array
+        )
+
+
+    def compute_pv_stpv_splitting_power(self):
+        
+        """  
+        Docstring
+
+        Method to compute the pv_stpv splitting power as defined in Eq. (46) of https://www.overleaf.com/project/648a0cfeae29e31e10afc075 
+        Attributes
+        -----------
+        emissivity_AR_polystyrene : array
+                                    Storage of emissivity array.
+        sliced_wavelength_array : array
+                                    Slice of the wavelength array over the upper and lower limits determined by the minimum and maximum
+                                    differences of array values and the integral's bounds.
+        sliced_emissivity_array : array
+                                    Slice of the emissivity array over the upper and lower limits determined by the minimum and maximum
+                                    differences of array values and the integral's bounds.
+        pv_stpv_splitting_power : array
+                                    Emissivity array integrated over 3.0 to 3.5 microns.
+        
+        Returns
+        -------
+        None
+
+        Notes:  The emissivity needs to be computed for the back side of the original stack (meaning the stack *without the active layer*) before updating the 
+                thermal emission spectrum.
+                Steps:
+                1. Compute the front and back side optical spectra in one pass
+                2. Take the back side emissivity
+                3. Compute the thermal emission spectra
+                4. Define the integrand in Eq. (46)
+                5. Integrate the integrand and store to the attribute self.pv_stpv_splitting_power
+        
+        """
+               
+        # Back side of the stack, active layer was removed in the last function
+        # Compute the optical and thermal spectra between 3 um and 3.5 um only
+        self.compute_pv_stpv_splitting_power_spectrum(
+            self._get_fom_support("pv_stpv_splitting_power")
+        )
+
+        # the weights hold pi * blackbody spectrum restricted to 3 um - 3.5 um
+        self.pv_stpv_splitting_power = self._get_fom_plan().evaluate(
+            "pv_stpv_splitting_power", self._pv_stpv_back_emissivity_array
+        )
+
+
+    def compute_self_consistent_temperature(self, tolerance=1e-6, max_iterations=50):
+        """
+        Method to compute the self-consistent temperature that balances emitted with absorbed power
+        for pv-stpv applications
+
+            pi / 2 * int B(lambda, T) (epsilon_front + epsilon_back) d lambda = int AM1.5 epsilon_front d lambda
+
+        The front and back emissivities do not depend on temperature, so they are computed once and
+        only the Planck-weighted integral is iterated with a bracketed Newton iteration that uses the
+        analytic dB/dT (see Therml._compute_balance_temperature).  The search starts at 300 K, and
+        a structure that already emits more than it absorbs at 300 K is assigned 300 K with a
+        warning; a structure that does not emit at all raises a RuntimeError.
+
+        Arguments
+        ---------
+        tolerance : float
+            convergence threshold on the temperature in Kelvin
+
+        max_iterations : int
+            maximum number of iterations
+
+        Attributes
+        ----------
+        temperature : float
+            the self-consistent temperature in Kelvin
+
+        pv_stpv_absorbed_power : float
+            the solar power absorbed by the structure
+
+        self_consistent_temperature_iterations : int
+            number of iterations used by the solver
+
+        Returns
+        -------
+        None
+        """
+        # emissivity of the front and back sides
+        self.compute_spectrum(both_sides=True)
+        self._pv_stpv_front_emissivity_array = np.copy(self.emissivity_array)
+        self._pv_stpv_back_emissivity_array = np.copy(self.emissivity_back_array)
+
+        _w = self._compute_trapz_weights(self.wavelength_array)
+
+        self.pv_stpv_absorbed_power = np.dot(
+            _w, self._solar_spectrum * self._pv_stpv_front_emissivity_array
+        )
+        _emission_weight_array = (
+            np.pi
+            / 2
+            * _w
+            * (self._pv_stpv_front_emissivity_array + self._pv_stpv_back_emissivity_array)
+        )
+
+        (
+            self.temperature,
+            self.self_consistent_temperature_iterations,
+        ) = self._compute_balance_temperature(
+            self.wavelength_array,
+            _emission_weight_array,
+            self.pv_stpv_absorbed_power,
+            lower_temperature=300.0,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+        )
+
+    def compute_cooling(self):
+        """Method to compute the radiative cooling figures of merit
+
+        Attributes
+        ----------
+        self.radiative_cooling_power : float
+            the thermal power radiated by a structure into the universe (P_rad)
+
+        self.atmospheric_warming_power : float
+            the thermal power radiated by the atmosphere and absorbed by a structure (P_atm)
+
+        self.solar_warming_power : float
+            the thermal power radiated by the sun and absorbed by a structure (P_sun)
+
+        self.net_cooling_power : float
+            P_rad - P_atm - P_sum ... if positive, the structure is net cooling if negative, it is net heating
+
+        Returns
+        -------
+        None
+        """
+
+        # get \epsilon_s(\lambda, \theta) and \epsilon_s(\lambda, \theta) for thermal radiation
+        if self.angle_tolerance is None:
+            self.compute_explicit_angle_spectrum()
+        else:
+            self.compute_adaptive_angle_spectrum()
+        _plan = self._get_fom_plan()
+
+        # P_rad, see Eq. (2) of https://www.nature.com/articles/nature13883
+        self.radiative_cooling_power = _plan.evaluate(
+            "radiative_cooling_power", self.emissivity_array_s, self.emissivity_array_p
+        )
+
+        # P_atm, see Eq. (3) of https://www.nature.com/articles/nature13883
+        self.atmospheric_warming_power = _plan.evaluate(
+            "atmospheric_warming_power",
+            self.emissivity_array_s,
+            self.emissivity_array_p,
+        )
+
+        # need to get one more set of \epsilon_s(\lambda, solar_angle) and \epsilon_p(\lamnda, solar_angle)
+        self.incident_angle = self.solar_angle
+        self.polarization = "s"
+        self.compute_spectrum()
+        solar_absorptivity_s = self.emissivity_array
+        self.polarization = "p"
+        self.compute_spectrum()
+        solar_absorptivity_p = self.emissivity_array
+        self.solar_warming_power = _plan.evaluate(
+            "solar_warming_power", solar_absorptivity_s, solar_absorptivity_p
+        )
+        self.net_cooling_power = (
+            self.radiative_cooling_power
+            - self.solar_warming_power
+            - self.atmospheric_warming_power
+        )
+
+    def compute_cooling_temperature_sweep(self, temperature_array):
+        """Method to compute the radiative cooling figures of merit for an array of structure
+        temperatures, reusing the angle-dependent and solar spectra for all temperatures
+
+        Arguments
+        ---------
+        temperature_array : numpy array of floats
+            the nT structure temperatures in Kelvin
+
+        Attributes
+        ----------
+        temperature_sweep_array : nT numpy array of floats
+            the temperatures of the sweep
+
+        radiative_cooling_power_sweep : nT numpy array of floats
+            P_rad at each structure temperature
+
+        atmospheric_warming_power : float
+            P_atm, which depends only on the atmospheric temperature
+
+        solar_warming_power : float
+            P_sun, which does not depend on temperature
+
+        net_cooling_power_sweep : nT numpy array of floats
+            P_rad - P_atm - P_sun at each structure temperature
+
+        Returns
+        -------
+        None
+        """
+        self.temperature_sweep_array = np.asarray(temperature_array, dtype=float)
+
+        # optics and the temperature-independent powers at the current temperature
+        self.compute_cooling()
+
+        _plan = self._build_fom_plan(self.temperature_sweep_array)
+        self.radiative_cooling_power_sweep = _plan.evaluate(
+            "radiative_cooling_power", self.emissivity_array_s, self.emissivity_array_p
+        )
+        self.net_cooling_power_sweep = (
+            self.radiative_cooling_power_sweep
+            - self.solar_warming_power
+            - self.atmospheric_warming_power
+        )
+
+    def compute_equilibrium_temperature(
+        self,
+        ambient_temperature=None,
+        solar_angle=None,
+        nonradiative_coefficient=None,
+        emissivity_array_s=None,
+        emissivity_array_p=None,
+        solar_absorptivity_s=None,
+        solar_absorptivity_p=None,
+        tolerance=1e-6,
+        max_iterations=50,
+    ):
+        """Method to compute the steady-state temperature of a radiative cooler, which satisfies
+
+            P_rad(T) - P_atm(T_amb) - P_sun + h (T - T_amb) = 0
+
+        The angle-resolved emissivities do not depend on T, so they are reduced once to a
+        single spectral weight vector and only the Planck-weighted integral of P_rad is iterated
+        with the bracketed Newton solver of Therml._compute_balance_temperature.
+
+        Arguments
+        ---------
+        ambient_temperature : float or numpy array of floats
+            ambient (atmospheric) temperature(s) in Kelvin, default is self.atmospheric_temperature;
+            an array solves one balance per ambient temperature
+
+        solar_angle : float
+            angle of the incident solar spectrum in degrees for this calculation only,
+            default is self.solar_angle
+
+        nonradiative_coefficient : float or numpy array of floats
+            non-radiative heat loss coefficient h in W / m^2 / K, default is self.nonradiative_coefficient;
+            an array must broadcast against ambient_temperature
+
+        emissivity_array_s, emissivity_array_p : numpy arrays of floats
+            optional ... x number_of_angles x number_of_wavelengths emissivities on the current
+            angular quadrature (theta_vals); leading axes solve a batch of designs at once.
+            Default is to call compute_explicit_angle_spectrum for the current structure
+
+        solar_absorptivity_s, solar_absorptivity_p : numpy arrays of floats
+            optional ... x number_of_wavelengths absorptivities at the solar angle matching the batch
+            of emissivities; default is to compute them for the current structure
+
+        tolerance : float
+            convergence threshold on the temperature in Kelvin
+
+        max_iterations : int
+            maximum number of iterations
+
+        Attributes
+        ----------
+        equilibrium_temperature : float or numpy array of floats
+            the steady-state temperature(s) with shape design batch axes + ambient axes
+
+        equilibrium_temperature_iterations : int
+            number of iterations used by the solver
+
+        Returns
+        -------
+        None
+        """
+        if ambient_temperature is None:
+            ambient_temperature = self.atmospheric_temperature
+        if nonradiative_coefficient is None:
+            nonradiative_coefficient = self.nonradiative_coefficient
+        # the solar angle of this call only; self.solar_angle is left unchanged
+        if solar_angle is None:
+            _theta_sun = self.solar_angle
+        else:
+            _theta_sun = solar_angle * np.pi / 180
+
+        # angle-resolved emissivities for thermal emission and atmospheric absorption
+        if emissivity_array_s is None or emissivity_array_p is None:
+            self.compute_explicit_angle_spectrum()
+            emissivity_array_s = self.emissivity_array_s
+            emissivity_array_p = self.emissivity_array_p
+
+        # absorptivity at the solar angle
+        if solar_absorptivity_s is None or solar_absorptivity_p is None:
+            _, _, solar_absorptivity_s = self._compute_batched_spectrum(_theta_sun, "s")
+            _, _, solar_absorptivity_p = self._compute_batched_spectrum(_theta_sun, "p")
+
+        _ambient = np.asarray(ambient_temperature, dtype=float)
+        _plan = self._build_fom_plan(self.temperature, atmospheric_temperature=_ambient)
+
+        # absorbed powers have shape design batch + ambient axes
+        _P_atm = _plan.evaluate(
+            "atmospheric_warming_power", emissivity_array_s, emissivity_array_p
+        )
+        _P_sun = _plan.evaluate(
+            "solar_warming_power", solar_absorptivity_s, solar_absorptivity_p
+        )
+        _P_sun = np.reshape(_P_sun, np.shape(_P_sun) + (1,) * _ambient.ndim)
+
+        # reduce the angular integral of P_rad to one spectral weight vector per design
+        _w = self._compute_trapz_weights(self.wavelength_array)
+        _w_theta = 0.5 * self._compute_angle_weights(self.theta_vals, self.theta_weights)
+        _emission_weight_array = _w * np.tensordot(
+            emissivity_array_s + emissivity_array_p, _w_theta, axes=([-2], [0])
+        )
+        _emission_weight_array = np.reshape(
+            _emission_weight_array,
+            _emission_weight_array.shape[:-1] + (1,) * _ambient.ndim + (-1,),
+        )
+
+        (
+            self.equilibrium_temperature,
+            self.equilibrium_temperature_iterations,
+        ) = self._compute_balance_temperature(
+            self.wavelength_array,
+            _emission_weight_array,
+            _P_atm + _P_sun,
+            loss_coefficient=nonradiative_coefficient,
+            ambient_temperature=_ambient,
+            lower_temperature=1.0,
+            upper_temperature=2 * np.max(_ambient),
+            initial_temperature=_ambient,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+        )
+
+    def compute_cooling_time_series(
+        self,
+        solar_angles,
+        atmospheric_temperatures,
+        atmospheric_transmissivity_profiles=None,
+        profile_indices=None,
+        temperatures=None,
+    ):
+        """Method to compute the radiative cooling figures of merit over a time series of
+        sun positions and atmospheric conditions (e.g. hourly over a day)
+
+        The angle-resolved thermal emissivities are computed once and reduced to one spectral
+        weight vector for P_rad and one per atmospheric transmissivity profile for P_atm;
+        the solar absorptivities at all sun positions are computed in a single batched
+        transfer matrix pass, so each time step costs a few dot products.
+
+        Arguments
+        ---------
+        solar_angles : numpy array of floats
+            the nt solar zenith angles in degrees; P_sun is zero for angles >= 90 degrees
+
+        atmospheric_temperatures : float or numpy array of floats
+            the atmospheric temperature(s) in Kelvin at each time step
+
+        atmospheric_transmissivity_profiles : numpy array of floats
+            optional nP x number_of_wavelengths atmospheric transmissivity spectra,
+            default is the single profile self._atmospheric_transmissivity
+
+        profile_indices : numpy array of ints
+            optional index of the transmissivity profile used at each time step, default is 0
+
+        temperatures : float or numpy array of floats
+            structure temperature(s) in Kelvin at each time step, default is self.temperature
+
+        Attributes
+        ----------
+        radiative_cooling_power_time_series : nt numpy array of floats
+            P_rad at each time step
+
+        atmospheric_warming_power_time_series : nt numpy array of floats
+            P_atm at each time step
+
+        solar_warming_power_time_series : nt numpy array of floats
+            P_sun at each time step
+
+        net_cooling_power_time_series : nt numpy array of floats
+            P_rad - P_atm - P_sun at each time step
+
+        Returns
+        -------
+        None
+        """
+        _theta_sun = np.atleast_1d(np.asarray(solar_angles, dtype=float)) * np.pi / 180
+        _nt = len(_theta_sun)
+        _T_atm = np.broadcast_to(
+            np.asarray(atmospheric_temperatures, dtype=float), (_nt,)
+        )
+        if temperatures is None:
+            temperatures = self.temperature
+        _T = np.broadcast_to(np.asarray(temperatures, dtype=float), (_nt,))
+
+        if profile_indices is None:
+            profile_indices = np.zeros(_nt, dtype=int)
+        profile_indices = np.broadcast_to(np.asarray(profile_indices, dtype=int), (_nt,))
+
+        # get \epsilon_s(\lambda, \theta) and \epsilon_s(\lambda, \theta) once for all time steps
+        self.compute_explicit_angle_spectrum()
+        _emissivity = self.emissivity_array_s + self.emissivity_array_p
+
+        _wl = self.wavelength_array
+        _w = self._compute_trapz_weights(_wl)
+        _w_theta = 0.5 * self._compute_angle_weights(self.theta_vals, self.theta_weights)
+
+        # P_rad, see Eq. (2) of https://www.nature.com/articles/nature13883
+        _rad_weight = _w * np.dot(_w_theta, _emissivity)
+        self.radiative_cooling_power_time_series = np.dot(
+            self._compute_blackbody_spectrum(_wl, _T), _rad_weight
+        )
+
+        # P_atm, see Eq. (3) of https://www.nature.com/articles/nature13883
+        if atmospheric_transmissivity_profiles is None:
+            _emissivity_atm, _ = self._get_atmospheric_emissivity_table(
+                self._atmospheric_transmissivity, self.theta_vals, self.theta_weights
+            )
+            _emissivity_atm = _emissivity_atm[np.newaxis, :, :]
+        else:
+            _tau = np.atleast_2d(atmospheric_transmissivity_profiles)
+            _emissivity_atm = 1.0 - _tau[:, np.newaxis, :] ** (
+                1 / np.cos(self.theta_vals)[np.newaxis, :, np.newaxis]
+            )
+        _atm_weight = _w * np.einsum("j,pjk,jk->pk", _w_theta, _emissivity_atm, _emissivity)
+        self.atmospheric_warming_power_time_series = np.einsum(
+            "tk,tk->t",
+            self._compute_blackbody_spectrum(_wl, _T_atm),
+            _atm_weight[profile_indices],
+        )
+
+        # P_sun, see Eq. (4) of https://www.nature.com/articles/nature13883,
+        # with \epsilon_s and \epsilon_p at all daytime sun positions in one batch
+        self.solar_warming_power_time_series = np.zeros(_nt)
+        _day = _theta_sun < np.pi / 2
+        if np.any(_day):
+            _, _, _absorptivity_s = self._compute_batched_spectrum(_theta_sun[_day], "s")
+            _, _, _absorptivity_p = self._compute_batched_spectrum(_theta_sun[_day], "p")
+            self.solar_warming_power_time_series[_day] = np.dot(
+                _absorptivity_s + _absorptivity_p, 0.5 * _w * self._solar_spectrum
+            )
+
+        self.net_cooling_power_time_series = (
+            self.radiative_cooling_power_time_series
+            - self.solar_warming_power_time_series
+            - self.atmospheric_warming_power_time_series
+        )
+
+    def compute_cooling_gradient(
+        self, chunk_size=None, store_gradient_arrays=False, memmap_directory=None
+    ):
+        """Method to compute the gradients of the radiative cooling figures of merit
+        as matrix-vector products of the emissivity gradients with the weights of the FomPlan
+
+        Arguments
+        ---------
+        chunk_size : int
+            optional number of wavelengths processed at a time; the gradients of P_rad, P_atm and
+            P_sun are accumulated chunk by chunk so peak memory is bounded by the chunk size.
+            Default is to process all wavelengths at once
+
+        store_gradient_arrays : bool
+            with chunk_size, whether the number_of_angles x number_of_wavelengths x len(gradient_list)
+            reflectivity / transmissivity / emissivity gradient arrays are also stored; default is
+            False so that only the gradients of the figures of merit are kept. Without chunk_size
+            the arrays are always stored; the adjoint method never forms them and raises a
+            ValueError if they are requested
+
+        memmap_directory : str
+            with chunk_size and store_gradient_arrays, the stored arrays are numpy.memmap files
+            in this directory instead of arrays in memory
+        """
+        if memmap_directory is not None and (chunk_size is None or not store_gradient_arrays):
+            raise ValueError(
+                "memmap_directory requires chunk_size and store_gradient_arrays=True"
+            )
+        if self.gradient_method == "adjoint":
+            if store_gradient_arrays:
+                raise ValueError(
+                    "the adjoint gradient_method does not form the gradient arrays, "
+                    "use store_gradient_arrays=False or gradient_method='jacobian'"
+                )
+            self._compute_cooling_gradient_adjoint(chunk_size)
+            return
+
+        if chunk_size is not None:
+            self._compute_cooling_gradient_chunked(
+                chunk_size, store_gradient_arrays, memmap_directory
+            )
+            return
+
+        # get the gradient of the emissivity vs angle and wavelength
+        self.compute_explicit_angle_spectrum_gradient()
+        _plan = self._get_fom_plan()
+
+        self.radiative_cooling_power_gradient = _plan.evaluate_gradient(
+            "radiative_cooling_power",
+            self.emissivity_gradient_array_s,
+            self.emissivity_gradient_array_p,
+        )
+
+        self.atmospheric_warming_power_gradient = _plan.evaluate_gradient(
+            "atmospheric_warming_power",
+            self.emissivity_gradient_array_s,
+            self.emissivity_gradient_array_p,
+        )
+
+        # need to get one more set of \epsilon_s(\lambda, solar_angle) and \epsilon_p(\lamnda, solar_angle)
+        self.incident_angle = self.solar_angle
+        self.polarization = "s"
+        self.compute_spectrum()
+        self.compute_spectrum_gradient()
+        solar_absorptivity_s = self.emissivity_gradient_array
+        self.polarization = "p"
+        self.compute_spectrum()
+        self.compute_spectrum_gradient()
+        solar_absorptivity_p = self.emissivity_gradient_array
+
+        self.solar_warming_power_gradient = _plan.evaluate_gradient(
+            "solar_warming_power", solar_absorptivity_s, solar_absorptivity_p
+        )
+        self.net_cooling_power_gradient = (
+            self.radiative_cooling_power_gradient
+            - self.solar_warming_power_gradient
+            - self.atmospheric_warming_power_gradient
+        )
+
+    def _compute_cooling_gradient_adjoint(self, chunk_size=None):
+        """computes the gradients of the radiative cooling figures of merit with
+        vector-Jacobian products, see _compute_fom_gradient_vjp"""
+        if getattr(self, "theta_vals", None) is None:
+            self.theta_vals, self.theta_weights = self._get_angular_quadrature(
+                self.number_of_angles
+            )
+        _plan = self._get_fom_plan()
+        _w_thermal = -np.array(
+            [
+                _plan.weights["radiative_cooling_power"],
+                _plan.weights["atmospheric_warming_power"],
+            ]
+        )
+        _w_sun = -_plan.weights["solar_warming_power"][np.newaxis, :]
+
+        _thermal_gradient = 0.0
+        _solar_gradient = 0.0
+        for _pol in ("s", "p"):
+            _thermal_gradient = _thermal_gradient + self._compute_fom_gradient_vjp(
+                self.theta_vals, _pol, _w_thermal, _w_thermal, chunk_size
+            )
+            _solar_gradient = _solar_gradient + self._compute_fom_gradient_vjp(
+                self.solar_angle, _pol, _w_sun, _w_sun, chunk_size
+            )
+
+        (
+            self.radiative_cooling_power_gradient,
+            self.atmospheric_warming_power_gradient,
+        ) = _thermal_gradient
+        self.solar_warming_power_gradient = _solar_gradient[0]
+        self.net_cooling_power_gradient = (
+            self.radiative_cooling_power_gradient
+            - self.solar_warming_power_gradient
+            - self.atmospheric_warming_power_gradient
+        )
+
+    def _compute_cooling_gradient_chunked(
+        self, chunk_size, store_gradient_arrays=False, memmap_directory=None
+    ):
+        """accumulates the gradients of the radiative cooling figures of merit over chunks of
+        chunk_size wavelengths, see compute_cooling_gradient"""
+        if getattr(self, "theta_vals", None) is None:
+            self.theta_vals, self.theta_weights = self._get_angular_quadrature(
+                self.number_of_angles
+            )
+        _plan = self._get_fom_plan()
+        _w_rad = _plan.weights["radiative_cooling_power"]
+        _w_atm = _plan.weights["atmospheric_warming_power"]
+        _w_sun = _plan.weights["solar_warming_power"]
+
+        _nth = len(self.theta_vals)
+        _nwl = self.number_of_wavelengths
+        _ngr = len(self.gradient_list)
+
+        if store_gradient_arrays:
+            for _name in (
+                "reflectivity_gradient_array",
+                "transmissivity_gradient_array",
+                "emissivity_gradient_array",
+            ):
+                for _pol in ("s", "p"):
+                    if memmap_directory is None:
+                        _array = np.zeros((_nth, _nwl, _ngr))
+                    else:
+                        _array = np.memmap(
+                            os.path.join(memmap_directory, _name + "_" + _pol + ".dat"),
+                            dtype=float,
+                            mode="w+",
+                            shape=(_nth, _nwl, _ngr),
+                        )
+                    setattr(self, _name + "_" + _pol, _array)
+
+        self.radiative_cooling_power_gradient = np.zeros(_ngr)
+        self.atmospheric_warming_power_gradient = np.zeros(_ngr)
+        self.solar_warming_power_gradient = np.zeros(_ngr)
+
+        for _start in range(0, _nwl, chunk_size):
+            _chunk = slice(_start, min(_start + chunk_size, _nwl))
+            for _pol in ("s", "p"):
+                # \epsilon gradients vs angle for thermal radiation
+                _, _, _R_gradient, _T_gradient = self._compute_batched_spectrum_gradient(
+                    self.theta_vals, _pol, _chunk
+                )
+                _E_gradient = -_R_gradient - _T_gradient
+                self.radiative_cooling_power_gradient += np.tensordot(
+                    _w_rad[:, _chunk], _E_gradient, axes=([0, 1], [0, 1])
+                )
+                self.atmospheric_warming_power_gradient += np.tensordot(
+                    _w_atm[:, _chunk], _E_gradient, axes=([0, 1], [0, 1])
+                )
+                if store_gradient_arrays:
+                    getattr(self, "reflectivity_gradient_array_" + _pol)[
+                        :, _chunk
+                    ] = _R_gradient
+                    getattr(self, "transmissivity_gradient_array_" + _pol)[
+                        :, _chunk
+                    ] = _T_gradient
+                    getattr(self, "emissivity_gradient_array_" + _pol)[
+                        :, _chunk
+                    ] = _E_gradient
+
+                # \epsilon gradient at the solar angle
+                _, _, _R_gradient, _T_gradient = self._compute_batched_spectrum_gradient(
+                    self.solar_angle, _pol, _chunk
+                )
+                self.solar_warming_power_gradient += np.dot(
+                    _w_sun[_chunk], -_R_gradient - _T_gradient
+                )
+
+        self.net_cooling_power_gradient = (
+            self.radiative_cooling_power_gradient
+            - self.solar_warming_power_gradient
+            - self.atmospheric_warming_power_gradient
+        )
+
+    def _compute_batched_dm(self, refractive_index, cosine_theta, polarization):
+        """compute the D and D_inv matrices for all layers, wavelengths and batch entries at once
+
+        Arguments
+        ---------
+            refractive_index : ... numpy array of complex floats
+                refractive index of each layer (broadcastable against cosine_theta)
+            cosine_theta : ... numpy array of complex floats
+                cosine of the complex refraction angle within each layer
+            polarization : str
+                's' or 'p'
+        Returns
+        -------
+        _dm, _dim : ... x 2 x 2 numpy arrays of complex floats
+        """
+        _shape = np.broadcast(refractive_index, cosine_theta).shape
+        _dtype = np.result_type(refractive_index, cosine_theta, np.complex64)
+        _dm = np.zeros(_shape + (2, 2), dtype=_dtype)
+        _dim = np.zeros(_shape + (2, 2), dtype=_dtype)
+
+        if polarization == "s":
+            _dm[..., 0, 0] = 1 + 0j
+            _dm[..., 0, 1] = 1 + 0j
+            _dm[..., 1, 0] = refractive_index * cosine_theta
+            _dm[..., 1, 1] = -1 * refractive_index * cosine_theta
+
+        elif polarization == "p":
+            _dm[..., 0, 0] = cosine_theta + 0j
+            _dm[..., 0, 1] = cosine_theta + 0j
+            _dm[..., 1, 0] = refractive_index
+            _dm[..., 1, 1] = -1 * refractive_index
+
+        # invert the 2x2 matrices by hand as in _compute_dm
+        _det = 1 / (_dm[..., 0, 0] * _dm[..., 1, 1] - _dm[..., 0, 1] * _dm[..., 1, 0])
+        _dim[..., 0, 0] = _det * _dm[..., 1, 1]
+        _dim[..., 0, 1] = -1 * _det * _dm[..., 0, 1]
+        _dim[..., 1, 0] = -1 * _det * _dm[..., 1, 0]
+        _dim[..., 1, 1] = _det * _dm[..., 0, 0]
+
+        return _dm, _dim
+
+    def _compute_batched_kz(
+        self,
+        refractive_index_array,
+        incident_angles,
+        wavelength_array=None,
+        dtype=complex,
+    ):
+        """computes kz and the cosine of the refraction angle in every layer for a batch of
+        structures and incident angles
+
+        Arguments
+        ---------
+            refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+                refractive index of a batch (S may be empty) of structures
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            wavelength_array : numpy array of floats
+                the wavelengths the refractive index is sampled on, default is self.wavelength_array
+            dtype : numpy dtype
+                complex precision of the calculation, complex128 or complex64
+        Returns
+        -------
+            _ri : S x (1,)*len(A) x number_of_wavelengths x number_of_layers numpy array of complex floats
+                the refractive index reshaped to broadcast against the angle axes
+            _kz : S x A x number_of_wavelengths x number_of_layers numpy array of complex floats
+                the z-component of the wavevector in each layer
+            _cos_theta : S x A x number_of_wavelengths x number_of_layers numpy array of complex floats
+                the cosine of the refraction angle in each layer
+        """
+        _real = np.finfo(dtype).dtype
+        _angles = np.asarray(incident_angles, dtype=_real)
+        _ri = np.asarray(refractive_index_array, dtype=dtype)
+        # structure batch axes first, then angle axes
+        _ri = np.reshape(_ri, _ri.shape[:-2] + (1,) * _angles.ndim + _ri.shape[-2:])
+
+        if wavelength_array is None:
+            wavelength_array = self.wavelength_array
+        _k0 = (2 * np.pi / np.asarray(wavelength_array)).astype(_real)
+        _kx = _ri[..., 0] * np.sin(_angles)[..., np.newaxis] * _k0
+        _nk0 = _ri * _k0[:, np.newaxis]
+        _kz = np.sqrt(_nk0 ** 2 - _kx[..., np.newaxis] ** 2)
+        _cos_theta = _kz / _nk0
+        # incident layer uses the (real) angle of incidence as in _compute_tm
+        _cos_theta[..., 0] = np.cos(_angles)[..., np.newaxis]
+        return _ri, _kz, _cos_theta
+
+    def _compute_batched_graded_blocks(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array=None,
+        dtype=complex,
+        gradient=False,
+        scattering=False,
+    ):
+        """compute the product C_l = B_1 ... B_K of the matrices B_k = D_k P_k Dinv_k of the
+        slices of each graded layer l (see set_graded_layer), which replaces D_l P_l Dinv_l in the
+        transfer matrix, for all wavelengths, incident angles and a batch of structures at once.
+
+        The slices have thickness d_l / K, so (C_l, dC_l / dd_l) are accumulated as dual numbers,
+        (C, dC) <- (C B_k, dC B_k + C dB_k / dd_l), with dB_k / dd_l = D_k P_k diag(-i kz_k, i kz_k) Dinv_k / K.
+        The products are written into preallocated buffers, so the loop over slices allocates nothing.
+
+        For the scattering matrices the slices between the layers l - 1 and l + 1 are instead
+        combined with the star products of _compute_batched_star_product, which only contain the
+        bounded propagators exp(i kz_k d_l / K), so thick absorbing graded layers do not overflow.
+
+        Arguments
+        ---------
+            refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+                only the incident medium is used, for the parallel component of the wavevector
+            thickness_array : S x number_of_layers numpy array of floats
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            wavelength_array : numpy array of floats
+                a subset of the wavelength grid, default is self.wavelength_array
+            dtype : numpy dtype
+                complex precision of the calculation, complex128 or complex64
+            gradient : bool
+                also compute dC_l / dd_l
+            scattering : bool
+                return the reflection and transmission amplitudes of the slices instead of C_l
+        Returns
+        -------
+            _blocks : dict
+                (C_l,) or (C_l, dC_l / dd_l), S x A x number_of_wavelengths x 2 x 2 numpy arrays of
+                complex floats, for each graded layer l; with scattering, (r, t, r', t') of the
+                slices between the layers l - 1 and l + 1, S x A x number_of_wavelengths numpy
+                arrays of complex floats
+        """
+        _blocks = {}
+        if len(self.graded_layers) == 0:
+            return _blocks
+        if wavelength_array is None:
+            wavelength_array = self.wavelength_array
+        _n0 = np.asarray(refractive_index_array)[..., :1]
+        _d = np.asarray(thickness_array, dtype=np.finfo(dtype).dtype)
+        for _l in self.graded_layers:
+            _index = self._get_graded_layer_index(_l, wavelength_array)
+            _ns = _index.shape[-1]
+            if scattering:
+                _ri_stack = np.asarray(refractive_index_array)
+                # the slices between the neighbouring layers, with the parallel wavevector of
+                # the incident medium
+                _ri, _kz, _cos_theta = self._compute_batched_kz(
+                    np.concatenate(
+                        (
+                            _n0,
+                            _ri_stack[..., _l - 1 : _l],
+                            np.broadcast_to(_index, _n0.shape[:-1] + (_ns,)),
+                            _ri_stack[..., _l + 1 : _l + 2],
+                        ),
+                        axis=-1,
+                    ),
+                    incident_angles,
+                    wavelength_array,
+                    dtype,
+                )
+                _dl = np.reshape(
+                    _d[..., _l], _d.shape[:-1] + (1,) * (np.ndim(incident_angles) + 2)
+                )
+                _thickness = np.concatenate(
+                    (0 * _dl, np.repeat(_dl / _ns, _ns, axis=-1), 0 * _dl), axis=-1
+                )
+                _blocks[_l] = self._compute_batched_star_product(
+                    _ri[..., 1:], _kz[..., 1:], _cos_theta[..., 1:], _thickness, polarization
+                )[:4]
+                continue
+            # the slices share the parallel wavevector of the incident medium
+            _ri, _kz, _cos_theta = self._compute_batched_kz(
+                np.concatenate(
+                    (_n0, np.broadcast_to(_index, _n0.shape[:-1] + (_ns,))), axis=-1
+                ),
+                incident_angles,
+                wavelength_array,
+                dtype,
+            )
+            _dm, _dim = self._compute_batched_dm(
+                _ri[..., 1:], _cos_theta[..., 1:], polarization
+            )
+            _kz = _kz[..., 1:] / _ns
+            _dl = np.reshape(
+                _d[..., _l], _d.shape[:-1] + (1,) * (np.ndim(incident_angles) + 2)
+            )
+            _p = np.exp(np.stack((-1j * _kz * _dl, 1j * _kz * _dl), axis=-1))
+            _dlogp = np.stack((-1j * _kz, 1j * _kz), axis=-1)
+
+            _c = np.zeros(_dm.shape[:-3] + (2, 2), dtype=_dm.dtype)
+            _c[..., 0, 0] = 1
+            _c[..., 1, 1] = 1
+            _b = np.empty_like(_c)
+            _work = np.empty_like(_c)
+            _tmp = np.empty_like(_c)
+            if gradient:
+                _dc = np.zeros_like(_c)
+                _db = np.empty_like(_c)
+            for _k in range(_ns):
+                # D_k P_k scales the columns of D_k
+                np.multiply(_dm[..., _k, :, :], _p[..., _k, np.newaxis, :], out=_work)
+                np.matmul(_work, _dim[..., _k, :, :], out=_b)
+                if gradient:
+                    _work *= _dlogp[..., _k, np.newaxis, :]
+                    np.matmul(_work, _dim[..., _k, :, :], out=_db)
+                    np.matmul(_dc, _b, out=_tmp)
+                    np.matmul(_c, _db, out=_dc)
+                    _dc += _tmp
+                np.matmul(_c, _b, out=_tmp)
+                _c, _tmp = _tmp, _c
+            _blocks[_l] = (_c, _dc) if gradient else (_c,)
+        return _blocks
+
+    def _compute_batched_tm(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array=None,
+        dtype=complex,
+    ):
+        """compute the transfer matrix for all wavelengths, incident angles and a batch of
+        structures at once; the only python loop is over layers
+
+        Arguments
+        ---------
+            refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+                refractive index of a batch (S may be empty) of structures
+            thickness_array : S x number_of_layers numpy array of floats
+                thickness of each layer of each structure
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            wavelength_array : numpy array of floats
+                the wavelengths the refractive index is sampled on, default is self.wavelength_array
+            dtype : numpy dtype
+                complex precision of the calculation, complex128 or complex64
+        Returns
+        -------
+            _tm : S x A x number_of_wavelengths x 2 x 2 numpy array of complex floats
+                the transfer matrices
+            _ri : S x (1,)*len(A) x number_of_wavelengths x number_of_layers numpy array of complex floats
+                the refractive index reshaped to broadcast against the angle axes
+            _cos_theta : S x A x number_of_wavelengths x number_of_layers numpy array of complex floats
+                cosine of the refraction angles in each layer
+        """
+        _ri, _kz, _cos_theta = self._compute_batched_kz(
+            refractive_index_array, incident_angles, wavelength_array, dtype
+        )
+        _na = np.ndim(incident_angles)
+        _d = np.asarray(thickness_array, dtype=np.finfo(dtype).dtype)
+        _d = np.reshape(_d, _d.shape[:-1] + (1,) * _na + (1, _d.shape[-1]))
+        _nl = _ri.shape[-1]
+
+        _dm, _dim = self._compute_batched_dm(_ri, _cos_theta, polarization)
+        _phil = _kz * _d
+        _blocks = self._compute_batched_graded_blocks(
+            refractive_index_array,
+            thickness_array,
+            incident_angles,
+            polarization,
+            wavelength_array,
+            dtype,
+        )
 
-        Method to compute the pv_stpv splitting power spectrum as defined by 
-         the integrand of Eq. (46) of https://www.overleaf.com/project/648a0cfeae29e31e10afc075 
+        _tm = _dim[..., 0, :, :]
+        for i in range(1, _nl - 1):
+            if i in _blocks:
+                _tm = np.matmul(_tm, _blocks[i][0])
+                continue
+            _tm = np.matmul(_tm, _dm[..., i, :, :])
+            # multiplying by the diagonal P matrix scales the columns
+            _tm[..., :, 0] *= np.exp(-1j * _phil[..., i, np.newaxis])
+            _tm[..., :, 1] *= np.exp(1j * _phil[..., i, np.newaxis])
+            _tm = np.matmul(_tm, _dim[..., i, :, :])
+        _tm = np.matmul(_tm, _dm[..., _nl - 1, :, :])
+
+        return _tm, _ri, _cos_theta
+
+    def _compute_batched_spectrum(
+        self,
+        incident_angles,
+        polarization,
+        refractive_index_array=None,
+        thickness_array=None,
+        wavelength_array=None,
+        dtype=None,
+    ):
+        """compute the reflectivity, transmissivity and emissivity for all wavelengths,
+        a batch of incident angles and (optionally) a batch of structures in one vectorized pass
+
+        In single precision a sample of the structures of the batch (evenly strided through the
+        batch, plus the structure with the largest growth sum |Im kz| d, where exp(-i kz d) overflows
+        first) is recomputed in double precision on a sample of wavelengths; if R or T of any of them
+        differ by more than single_precision_tolerance (or the single precision result is not finite)
+        the whole batch is recomputed in double precision.  This is the only calculation the
+        single precision dtype applies to.
+
+        Arguments
+        ---------
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+                default is the _refractive_index_array of the current structure
+            thickness_array : S x number_of_layers numpy array of floats
+                default is the thickness_array of the current structure
+            wavelength_array : numpy array of floats
+                the wavelengths refractive_index_array is sampled on, default is self.wavelength_array
+            dtype : numpy dtype
+                complex128 or complex64, default is self.dtype
+        Attributes
+        ----------
+            single_precision_fallback : bool
+                True if a single precision calculation failed the accuracy check and was
+                recomputed in double precision
+        Returns
+        -------
+            _R, _T, _E : S x A x number_of_wavelengths numpy arrays of floats
+                reflectivity, transmissivity and emissivity spectra
         """
+        if refractive_index_array is None:
+            refractive_index_array = self._refractive_index_array
+        if thickness_array is None:
+            thickness_array = self.thickness_array
+        if wavelength_array is None:
+            wavelength_array = self.wavelength_array
+        if dtype is None:
+            dtype = self.dtype
+
+        # overflow in single precision is caught by the guardrail below
+        _single = np.dtype(dtype) == np.complex64
+        with np.errstate(**({"all": "ignore"} if _single else {})):
+            _R, _T, _E = self._compute_batched_rt(
+                refractive_index_array,
+                thickness_array,
+                incident_angles,
+                polarization,
+                wavelength_array,
+                dtype,
+            )
+        self.single_precision_fallback = False
+        if not _single:
+            return _R, _T, _E
+
+        # accuracy guardrail: compare a sample of designs against double precision
+        _ri = np.asarray(refractive_index_array)
+        _d = np.asarray(thickness_array, dtype=float)
+        _batch = np.broadcast(
+            np.empty(_ri.shape[:-2]), np.empty(_d.shape[:-1])
+        ).shape
+        _ri = np.reshape(
+            np.broadcast_to(_ri, _batch + _ri.shape[-2:]), (-1,) + _ri.shape[-2:]
+        )
+        _d = np.reshape(np.broadcast_to(_d, _batch + _d.shape[-1:]), (-1, _d.shape[-1]))
+        _nwl = len(wavelength_array)
+        _idx = np.unique(np.linspace(0, _nwl - 1, min(_nwl, 16)).astype(int))
+        _wl = np.asarray(wavelength_array)[_idx]
+        _growth = self._compute_batched_growth(
+            _ri[:, _idx], _d, incident_angles, _wl
+        )
+        _growth = np.max(np.reshape(_growth, (len(_d), -1)), axis=-1)
+        _ns = len(_d)
+        _sample = np.unique(
+            np.append(
+                np.linspace(0, _ns - 1, min(_ns, 8)).astype(int), np.argmax(_growth)
+            )
+        )
+        _R_ref, _T_ref, _ = self._compute_batched_rt(
+            _ri[_sample][:, _idx],
+            _d[_sample],
+            incident_angles,
+            polarization,
+            _wl,
+            np.complex128,
+        )
+        _shape = (_ns,) + np.shape(_R)[len(_batch):]
+        _error = max(
+            np.max(np.abs(np.reshape(_R, _shape)[_sample][..., _idx] - _R_ref)),
+            np.max(np.abs(np.reshape(_T, _shape)[_sample][..., _idx] - _T_ref)),
+        )
+        if not (
+            _error <= self.single_precision_tolerance
+            and np.all(np.isfinite(_R))
+            and np.all(np.isfinite(_T))
+        ):
+            self.single_precision_fallback = True
+            return self._compute_batched_rt(
+                refractive_index_array,
+                thickness_array,
+                incident_angles,
+                polarization,
+                wavelength_array,
+                np.complex128,
+            )
+        return _R, _T, _E
+
+    def _compute_batched_rt(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array,
+        dtype,
+    ):
+        """computes R, T and epsilon from the batched transfer matrices in precision dtype,
+        see _compute_batched_spectrum"""
+        if self._use_scattering_matrix(
+            incident_angles, refractive_index_array, thickness_array, wavelength_array
+        ):
+            _R, _T, _, _ = self._compute_batched_power_rt(
+                refractive_index_array,
+                thickness_array,
+                incident_angles,
+                polarization,
+                wavelength_array,
+                dtype,
+            )
+            return _R, _T, 1 - _R - _T
+
+        _tm, _ri, _cos_theta = self._compute_batched_tm(
+            refractive_index_array,
+            thickness_array,
+            incident_angles,
+            polarization,
+            wavelength_array,
+            dtype,
+        )
 
-        # reverse the stack
-        self.reverse_stack()
-        # update emissivity
-        self.compute_spectrum()
-               
-    
-        # Store thermal emission spectra into the active layer
-        self.pv_stpv_splitting_power_spectrum = self.blackbody_spectrum * self.emissivity_array
+        # reflection and transmission amplitudes
+        _r = _tm[..., 1, 0] / _tm[..., 0, 0]
+        _t = 1 / _tm[..., 0, 0]
+
+        # refraction angle and RI prefractor for computing transmission
+        _factor = _ri[..., -1] * _cos_theta[..., -1] / (_ri[..., 0] * _cos_theta[..., 0])
+
+        _R = np.real(_r * np.conj(_r))
+        _T = np.real(_t * np.conj(_t) * _factor)
+        _E = 1 - _R - _T
+        return _R, _T, _E
+
+    def _use_scattering_matrix(
+        self,
+        incident_angles,
+        refractive_index_array=None,
+        thickness_array=None,
+        wavelength_array=None,
+    ):
+        """returns True if the spectra should be computed with the scattering matrices,
+        see backend and scattering_matrix_threshold in parse_input; incoherent layers are only
+        supported by the scattering matrices"""
+        if self.backend == "smatrix" or "i" in self.coherence_array:
+            return True
+        if self.backend == "tmm":
+            return False
+        if refractive_index_array is None:
+            refractive_index_array = self._refractive_index_array
+        if thickness_array is None:
+            thickness_array = self.thickness_array
+        if wavelength_array is None:
+            wavelength_array = self.wavelength_array
+        _growth = self._compute_batched_growth(
+            refractive_index_array, thickness_array, incident_angles, wavelength_array
+        )
+        return bool(np.max(_growth) > self.scattering_matrix_threshold)
+
+    def _check_transfer_matrix_stack(
+        self,
+        description,
+        incident_angles,
+        refractive_index_array=None,
+        thickness_array=None,
+        wavelength_array=None,
+    ):
+        """guards the calculations that are only implemented with transfer matrices: raises a
+        ValueError if the growth exponent of the stack exceeds scattering_matrix_threshold (the
+        transfer matrices would overflow) and warns if backend is "smatrix"
 
-        # reverse the stack back
-        self.reverse_stack()
-        # update the spectra for the normal direction
-        self.compute_spectrum()
+        Arguments
+        ---------
+            description : str
+                the calculation, used in the message
+            incident_angles, refractive_index_array, thickness_array, wavelength_array
+                see _use_scattering_matrix
+        """
+        if self.backend == "tmm":
+            return
+        if refractive_index_array is None:
+            refractive_index_array = self._refractive_index_array
+        if thickness_array is None:
+            thickness_array = self.thickness_array
+        if wavelength_array is None:
+            wavelength_array = self.wavelength_array
+        _growth = np.max(
+            self._compute_batched_growth(
+                refractive_index_array, thickness_array, incident_angles, wavelength_array
+            )
+        )
+        if _growth > self.scattering_matrix_threshold:
+            raise ValueError(
+                description
+                + " are only implemented with transfer matrices, which overflow for this stack"
+                + " (sum |Im kz| d = "
+                + str(_growth)
+                + " > scattering_matrix_threshold)"
+            )
+        if self.backend == "smatrix":
+            warnings.warn(
+                description
+                + " are computed with transfer matrices, not with the scattering matrices of"
+                + " backend 'smatrix'"
+            )
 
+    def _compute_batched_growth(
+        self, refractive_index_array, thickness_array, incident_angles, wavelength_array
+    ):
+        """returns the S x A x number_of_wavelengths growth exponents sum_l |Im kz_l| d_l of the
+        finite layers, which measure how far exp(-i kz d) in the transfer matrices grows"""
+        _, _kz, _ = self._compute_batched_kz(
+            refractive_index_array, incident_angles, wavelength_array, np.complex128
+        )
+        _d = np.asarray(thickness_array, dtype=float)
+        _d = np.reshape(
+            _d, _d.shape[:-1] + (1,) * np.ndim(incident_angles) + (1, _d.shape[-1])
+        )
+        return np.sum(np.abs(np.imag(_kz[..., 1:-1])) * _d[..., 1:-1], axis=-1)
+
+    def _compute_batched_smatrix(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array,
+        layer_indices=None,
+        dtype=complex,
+    ):
+        """compute the reflection and transmission amplitudes from both sides with the scattering
+        matrix (Redheffer star product) recursion, for all wavelengths, incident angles and a batch
+        of structures at once, and optionally their derivatives with respect to the thickness of
+        the layers in layer_indices.
+
+        Unlike the transfer matrix, the S-matrix only contains the bounded propagators
+        exp(i kz d) (Im kz >= 0), so thick absorbing layers and stacks of many layers neither
+        overflow nor lose precision. For polarized light the blocks are scalars: the interface
+        between layers j and j + 1 with I = Dinv_j D_{j+1} has r = I10 / I00, t = 1 / I00,
+        r' = -I01 / I00 and t' = det(I) / I00.
+
+        Writing the stack as L_l * P_l * R_l with the prefix block L_l up to layer l and the suffix
+        block R_l after it, rho = exp(2 i kz_l d_l) r_R and g = 1 / (1 - r'_L rho) give
+        dr / ds_l = t'_L t_L g^2 d rho / ds_l and dt / ds_l = t (i kz_l + g r'_L d rho / ds_l).
 
+        Arguments
+        ---------
+            refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+            thickness_array : S x number_of_layers numpy array of floats
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            wavelength_array : numpy array of floats
+                the wavelengths refractive_index_array is sampled on
+            layer_indices : list of ints
+                optional layers to differentiate with respect to
+            dtype : numpy dtype
+                complex precision of the calculation, complex128 or complex64
+        Returns
+        -------
+            _r, _t, _r_back, _t_back : S x A x number_of_wavelengths numpy arrays of complex floats
+                reflection and transmission amplitudes for incidence from the front and the back
+            _factor : S x A x number_of_wavelengths numpy array of complex floats
+                RI prefactor for computing transmission
+            _r_gradient, _t_gradient : len(layer_indices) x S x A x number_of_wavelengths numpy arrays of complex floats
+                derivatives of _r and _t, only if layer_indices is given
+        """
+        _ri, _kz, _cos_theta = self._compute_batched_kz(
+            refractive_index_array, incident_angles, wavelength_array, dtype
+        )
+        _nl = _ri.shape[-1]
+        _d = np.asarray(thickness_array, dtype=np.finfo(dtype).dtype)
+        _d = np.reshape(_d, _d.shape[:-1] + (1,) * np.ndim(incident_angles) + (1, _nl))
+        _blocks = self._compute_batched_graded_blocks(
+            refractive_index_array,
+            thickness_array,
+            incident_angles,
+            polarization,
+            wavelength_array,
+            dtype,
+            scattering=True,
+        )
+        return self._compute_batched_star_product(
+            _ri, _kz, _cos_theta, _d, polarization, layer_indices, _blocks
+        )
 
-    def compute_pv_stpv_splitting_power(self):
-        
-        """  
-        Docstring
+    def _compute_batched_power_rt(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array,
+        dtype=complex,
+    ):
+        """compute the reflectivity and transmissivity from both sides with the scattering
+        matrices, treating the layers flagged "i" in coherence_array incoherently
+
+        The stack is split at the incoherent layers into coherent sub-stacks whose reflection
+        and transmission amplitudes from both sides come from _compute_batched_star_product.
+        The sub-stacks are then combined with the same star product applied to the powers
+        R = |r|^2, T = Re(|t|^2 factor), R' = |r'|^2 and T' = Re(|t'|^2 / factor), with the
+        single-pass power transmission p = exp(-2 Im(kz) d) of the incoherent layer in place of
+        the propagator, which averages the fringes of the incoherent layers exactly.
 
-        Method to compute the pv_stpv splitting power as defined in Eq. (46) of https://www.overleaf.com/project/648a0cfeae29e31e10afc075 
-        Attributes
-        -----------
-        emissivity_AR_polystyrene : array
-                                    Storage of emissivity array.
-        sliced_wavelength_array : array
-                                    Slice of the wavelength array over the upper and lower limits determined by the minimum and maximum
-                                    differences of array values and the integral's bounds.
-        sliced_emissivity_array : array
-                                    Slice of the emissivity array over the upper and lower limits determined by the minimum and maximum
-                                    differences of array values and the integral's bounds.
-        pv_stpv_splitting_power : array
-                                    Emissivity array integrated over 3.0 to 3.5 microns.
-        
+        Arguments
+        ---------
+            see _compute_batched_smatrix
         Returns
         -------
-        None
+            _R, _T, _R_back, _T_back : S x A x number_of_wavelengths numpy arrays of floats
+                reflectivity and transmissivity for incidence from the front and the back
 
-        Notes:  The emissivity needs to be computed for the reversed original stack (meaning the stack *without the active layer*) before updating the 
-                thermal emission spectrum.
-                Steps:
-                1. Reverse the stack
-                2. Compute the optical spectra
-                3. Compute the thermal emission spectra
-                4. Define the integrand in Eq. (46)
-                5. Integrate the integrand and store to the attribute self.pv_stpv_splitting_power
-        
+        References
+        ----------
+            C. C. Katsidis and D. I. Siapkas, Appl. Opt. 41, 3978 (2002)
         """
-               
-        # Reverse stack, active layer was removed in the last function
-        # Compute the optical and thermal spectra
-        self.compute_pv_stpv_splitting_power_spectrum()
+        _ri, _kz, _cos_theta = self._compute_batched_kz(
+            refractive_index_array, incident_angles, wavelength_array, dtype
+        )
+        _nl = _ri.shape[-1]
+        _d = np.asarray(thickness_array, dtype=np.finfo(dtype).dtype)
+        _d = np.reshape(_d, _d.shape[:-1] + (1,) * np.ndim(incident_angles) + (1, _nl))
+
+        _blocks = self._compute_batched_graded_blocks(
+            refractive_index_array,
+            thickness_array,
+            incident_angles,
+            polarization,
+            wavelength_array,
+            dtype,
+            scattering=True,
+        )
+        _incoherent = [j for j in range(1, _nl - 1) if self.coherence_array[j] == "i"]
+        _boundaries = [0] + _incoherent + [_nl - 1]
+        for _a, _b in zip(_boundaries[:-1], _boundaries[1:]):
+            _layers = slice(_a, _b + 1)
+            _r, _t, _r_back, _t_back, _factor = self._compute_batched_star_product(
+                _ri[..., _layers],
+                _kz[..., _layers],
+                _cos_theta[..., _layers],
+                _d[..., _layers],
+                polarization,
+                blocks={_l - _a: _blocks[_l] for _l in _blocks if _a < _l < _b},
+            )
+            _R_b = np.real(_r * np.conj(_r))
+            _T_b = np.real(_t * np.conj(_t) * _factor)
+            _R_back_b = np.real(_r_back * np.conj(_r_back))
+            _T_back_b = np.real(_t_back * np.conj(_t_back) / _factor)
+            if _a == 0:
+                _R, _T, _R_back, _T_back = _R_b, _T_b, _R_back_b, _T_back_b
+                continue
+
+            # star product of the powers across incoherent layer _a
+            _p = np.exp(-2 * np.imag(_kz[..., _a]) * _d[..., _a])
+            _g = 1 / (1 - _R_back * _p ** 2 * _R_b)
+            _R, _T, _R_back, _T_back = (
+                _R + _T * _p ** 2 * _R_b * _g * _T_back,
+                _T * _p * _g * _T_b,
+                _R_back_b + _T_back_b * _p ** 2 * _R_back * _g * _T_b,
+                _T_back_b * _p * _g * _T_back,
+            )
+        return _R, _T, _R_back, _T_back
+
+    def _compute_batched_star_product(
+        self,
+        ri,
+        kz,
+        cos_theta,
+        thickness,
+        polarization,
+        layer_indices=None,
+        blocks=None,
+    ):
+        """the scattering matrix recursion of _compute_batched_smatrix for a stack whose first
+        and last layers are the semi-infinite media, given kz and the cosine of the refraction
+        angle in every layer (so that sub-stacks between incoherent layers can be computed
+        from the kz of the full stack)
 
-        # Set integration limits to lambda 1 to lambda 2 (3 um and 3.5 um) and store
-        x_lower_limit = 3e-6
-        x_upper_limit = 3.5e-6
+        Arguments
+        ---------
+            ri, kz, cos_theta : ... x number_of_layers numpy arrays of complex floats
+                as returned by _compute_batched_kz
+            thickness : ... x number_of_layers numpy array of floats
+                broadcastable against kz
+            polarization : str
+                's' or 'p'
+            layer_indices : list of ints
+                optional layers to differentiate with respect to
+            blocks : dict
+                optional (r, t, r', t') of the slices of graded layers from
+                _compute_batched_graded_blocks with scattering, keyed by their index in this stack;
+                a graded layer and its two interfaces form a single interface
+        Returns
+        -------
+            see _compute_batched_smatrix
+        """
+        _ri, _kz, _cos_theta = ri, kz, cos_theta
+        _nl = _ri.shape[-1]
+        _dm, _dim = self._compute_batched_dm(_ri, _cos_theta, polarization)
+        _e = np.exp(1j * _kz * thickness)
+
+        # interface S-matrices between layers j and j + 1
+        _i = np.matmul(_dim[..., :-1, :, :], _dm[..., 1:, :, :])
+        _ti = 1 / _i[..., 0, 0]
+        _ri_i = _i[..., 1, 0] * _ti
+        _rpi = -_i[..., 0, 1] * _ti
+        _tpi = (_i[..., 0, 0] * _i[..., 1, 1] - _i[..., 0, 1] * _i[..., 1, 0]) * _ti
+        if blocks is not None:
+            for _l, _block in blocks.items():
+                # the graded slices replace the interface before layer l, and the interface
+                # after it and the propagation through it are the identity
+                _ri_i[..., _l - 1], _ti[..., _l - 1], _rpi[..., _l - 1], _tpi[..., _l - 1] = _block
+                _ri_i[..., _l], _ti[..., _l], _rpi[..., _l], _tpi[..., _l] = 0, 1, 0, 1
+                _e[..., _l] = 1
+
+        if layer_indices is None:
+            layer_indices = []
+        _position = {_l: _n for _n, _l in enumerate(layer_indices)}
+
+        # backward sweep: r and t of the suffix blocks R_l after each layer in layer_indices
+        _suffix = {}
+        if len(_position) > 0:
+            _r, _t = _ri_i[..., _nl - 2], _ti[..., _nl - 2]
+            for j in range(_nl - 2, 0, -1):
+                _suffix[j] = (_r, _t)
+                # R_{j-1} = S_(j-1, j) * P_j * R_j
+                _rq = _e[..., j] ** 2 * _r
+                _g = 1 / (1 - _rpi[..., j - 1] * _rq)
+                _r = _ri_i[..., j - 1] + _tpi[..., j - 1] * _rq * _g * _ti[..., j - 1]
+                _t = _t * _e[..., j] * _g * _ti[..., j - 1]
+
+        # forward sweep: prefix blocks L_l up to each layer
+        _prefix = {}
+        _r, _t, _rp, _tp = _ri_i[..., 0], _ti[..., 0], _rpi[..., 0], _tpi[..., 0]
+        for j in range(1, _nl - 1):
+            if j in _position:
+                _prefix[j] = (_t, _tp, _rp)
+            # propagation through layer j
+            _t = _t * _e[..., j]
+            _tp = _tp * _e[..., j]
+            _rp = _rp * _e[..., j] ** 2
+            # star product with the interface between layers j and j + 1
+            _g = 1 / (1 - _rp * _ri_i[..., j])
+            _r, _t, _tp, _rp = (
+                _r + _tp * _ri_i[..., j] * _g * _t,
+                _ti[..., j] * _g * _t,
+                _tp * _g * _tpi[..., j],
+                _rpi[..., j] + _ti[..., j] * _g * _rp * _tpi[..., j],
+            )
 
-        # Subtracts the limit from the original arrays, apply absolute value, and finds the minimum or maximum point
-        wavelength_array_lower = np.abs(self.wavelength_array - x_lower_limit).argmin()
-        wavelength_array_upper = np.abs(self.wavelength_array - x_upper_limit).argmin()
-        
-        sliced_wavelength_array = self.wavelength_array[wavelength_array_lower:wavelength_array_upper]
-        sliced_splitting_spectrum = self.pv_stpv_splitting_power_spectrum[wavelength_array_lower:wavelength_array_upper]
+        _factor = _ri[..., -1] * _cos_theta[..., -1] / (_ri[..., 0] * _cos_theta[..., 0])
+        if len(_position) == 0:
+            return _r, _t, _rp, _tp, _factor
+
+        _r_gradient = np.zeros((len(layer_indices),) + _r.shape, dtype=_r.dtype)
+        _t_gradient = np.zeros((len(layer_indices),) + _t.shape, dtype=_t.dtype)
+        for j, _n in _position.items():
+            _tl, _tpl, _rpl = _prefix[j]
+            _rho = _e[..., j] ** 2 * _suffix[j][0]
+            _g = 1 / (1 - _rpl * _rho)
+            _drho = 2j * _kz[..., j] * _rho
+            _r_gradient[_n] = _tpl * _tl * _g ** 2 * _drho
+            _t_gradient[_n] = _t * (1j * _kz[..., j] + _g * _rpl * _drho)
+        return _r, _t, _rp, _tp, _factor, _r_gradient, _t_gradient
+
+    def _compute_batched_layer_fields(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array,
+    ):
+        """computes the forward and backward amplitudes at the bottom interface of every layer
+        for all wavelengths and incident angles at once, normalized to a unit incident amplitude
+
+        With the suffix products Y_l = B_{l+1} ... D_{N-1} of _compute_batched_tm_gradient, the
+        amplitudes at the bottom of layer l are t Dinv_l Y_l e_0 and at its top t P_l Dinv_l Y_l e_0;
+        only the first columns are needed, so the backward sweep is over 2-vectors.
 
-        # Integrate over these slices and store
-        self.pv_stpv_splitting_power = np.pi * np.trapz(sliced_splitting_spectrum, sliced_wavelength_array)
+        Arguments
+        ---------
+            refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+            thickness_array : S x number_of_layers numpy array of floats
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            wavelength_array : numpy array of floats
+                the wavelengths refractive_index_array is sampled on
+        Returns
+        -------
+            _dm : S x A x number_of_wavelengths x number_of_layers x 2 x 2 numpy array of complex floats
+                the D matrices
+            _p : S x A x number_of_wavelengths x number_of_layers numpy array of complex floats
+                the diagonal element exp(-i kz d) of the P matrices
+            _amplitudes : S x A x number_of_wavelengths x number_of_layers x 2 numpy array of complex floats
+                forward and backward amplitudes at the bottom of each layer (the top of the terminal
+                medium); for the incident medium these are (1, r)
+            _kz : S x A x number_of_wavelengths x number_of_layers numpy array of complex floats
+                the z-component of the wavevector in each layer
+            _sin_theta : S x A x number_of_wavelengths x number_of_layers numpy array of complex floats
+                the sine of the refraction angle in each layer
+        """
+        if "i" in self.coherence_array:
+            raise ValueError("layer fields are not available with incoherent layers")
+        if self.graded_layers:
+            raise ValueError("layer fields are not available with graded layers")
+        self._check_transfer_matrix_stack(
+            "layer fields",
+            incident_angles,
+            refractive_index_array,
+            thickness_array,
+            wavelength_array,
+        )
+        _ri, _kz, _cos_theta = self._compute_batched_kz(
+            refractive_index_array, incident_angles, wavelength_array
+        )
+        _nl = _ri.shape[-1]
+        _dm, _dim = self._compute_batched_dm(_ri, _cos_theta, polarization)
+        _d = np.asarray(thickness_array, dtype=float)
+        _d = np.reshape(_d, _d.shape[:-1] + (1,) * np.ndim(incident_angles) + (1, _nl))
+        _p = np.exp(-1j * _kz * _d)
+
+        def _mv(matrix, vector):
+            return np.matmul(matrix, vector[..., np.newaxis])[..., 0]
+
+        # backward sweep over the first columns of the suffix products
+        _amplitudes = np.zeros(_kz.shape + (2,), dtype=complex)
+        _amplitudes[..., _nl - 1, 0] = 1
+        _y = _dm[..., _nl - 1, :, 0]
+        for i in range(_nl - 2, -1, -1):
+            _amplitudes[..., i, :] = _mv(_dim[..., i, :, :], _y)
+            _y = _mv(
+                _dm[..., i, :, :],
+                np.stack(
+                    (_p[..., i] * _amplitudes[..., i, 0], _amplitudes[..., i, 1] / _p[..., i]),
+                    axis=-1,
+                ),
+            )
+        # normalize by t = 1 / M_00
+        _amplitudes /= _amplitudes[..., 0:1, 0:1]
 
+        _sin_theta = (
+            _ri[..., 0:1] * np.sin(np.asarray(incident_angles))[..., np.newaxis, np.newaxis] / _ri
+        )
+        return _dm, _p, _amplitudes, _kz, _sin_theta
+
+    def _compute_batched_layer_absorption(
+        self,
+        incident_angles,
+        polarization,
+        refractive_index_array=None,
+        thickness_array=None,
+        wavelength_array=None,
+    ):
+        """computes the fraction of the incident power absorbed in each layer as the difference
+        of the Poynting flux Re(E_t H_t^*) at its top and bottom interfaces, see
+        compute_layer_absorption
 
-    def compute_self_consistent_temperature(self):
+        Arguments
+        ---------
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            refractive_index_array : S x number_of_wavelengths x number_of_layers numpy array of complex floats
+                default is the _refractive_index_array of the current structure
+            thickness_array : S x number_of_layers numpy array of floats
+                default is the thickness_array of the current structure
+            wavelength_array : numpy array of floats
+                the wavelengths refractive_index_array is sampled on, default is self.wavelength_array
+        Returns
+        -------
+            _absorption : S x A x number_of_layers x number_of_wavelengths numpy array of floats
+                absorbed fraction in each layer; zero for the incident medium and the
+                transmissivity for the terminal medium
         """
-        Method to compute the self-consistent temperature that balances emitted with absorbed power
-        for pv-stpv applications
+        if refractive_index_array is None:
+            refractive_index_array = self._refractive_index_array
+        if thickness_array is None:
+            thickness_array = self.thickness_array
+        if wavelength_array is None:
+            wavelength_array = self.wavelength_array
+
+        _dm, _p, _amplitudes = self._compute_batched_layer_fields(
+            refractive_index_array,
+            thickness_array,
+            incident_angles,
+            polarization,
+            wavelength_array,
+        )[:3]
+
+        # tangential fields D_l P_l a_l at the top of each layer
+        _top = np.stack(
+            (_p * _amplitudes[..., 0], _amplitudes[..., 1] / _p), axis=-1
+        )
+        _fields = np.matmul(_dm, _top[..., np.newaxis])[..., 0]
+        _flux = np.real(_fields[..., 0] * np.conj(_fields[..., 1]))
+        # normalized by the incident flux
+        _flux /= np.real(_dm[..., 0:1, 0, 0] * np.conj(_dm[..., 0:1, 1, 0]))
+
+        _absorption = np.zeros_like(_flux)
+        _absorption[..., 1:-1] = _flux[..., 1:-1] - _flux[..., 2:]
+        _absorption[..., -1] = _flux[..., -1]
+        return np.swapaxes(_absorption, -1, -2)
+
+    def _compute_batched_tm_gradient(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array,
+        layer_indices,
+        adjoint=None,
+        gradient_type="thickness",
+    ):
+        """compute the transfer matrix and the first column of its derivative with respect to the
+        thickness or the refractive index of each layer in layer_indices, for all wavelengths and
+        incident angles at once.
+
+        Writing M = X_l B_l Y_l with B_l = D_l P_l Dinv_l, the prefix product X_l and the suffix
+        product Y_l of layer l, dM / ds_l = X_l D_l (dP_l / ds_l) Dinv_l Y_l and
+        dM / dn_l = X_l (dD_l P_l Dinv_l + D_l dP_l Dinv_l - B_l dD_l Dinv_l) Y_l, where n_l enters
+        through kz_l and cos(theta_l); M is analytic in the complex index so dM / dk_l = i dM / dn_l.
+        One backward sweep for the suffix products and one forward sweep for the prefix products
+        give the derivatives for all layers.
+
+        Arguments
+        ---------
+            refractive_index_array : number_of_wavelengths x number_of_layers numpy array of complex floats
+            thickness_array : number_of_layers numpy array of floats
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            wavelength_array : numpy array of floats
+                the wavelengths refractive_index_array is sampled on
+            layer_indices : list of ints
+                the layers to differentiate with respect to (e.g. gradient_list)
+            adjoint : function
+                optional function of (_tm, _factor) returning a K x A x number_of_wavelengths x 2
+                covector y; if given, only the vector-Jacobian products Re sum y . dM / ds_l e_0
+                over angles and wavelengths are returned instead of the derivatives
+            gradient_type : str
+                "thickness", "n" / "k" for the real / imaginary part of the refractive index, or
+                "fill_fraction" for the fill fraction of effective medium layers
+        Returns
+        -------
+            _tm : A x number_of_wavelengths x 2 x 2 numpy array of complex floats
+                the transfer matrices
+            _factor : A x number_of_wavelengths numpy array of complex floats
+                RI prefactor for computing transmission
+            _tm_gradient : len(layer_indices) x A x number_of_wavelengths x 2 numpy array of complex floats
+                the first column of dM / ds_l for each layer l in layer_indices, or the
+                K x len(layer_indices) numpy array of vector-Jacobian products if adjoint is given
         """
-        # this loops over temperatures starting with 300 K and stops when emitted power exceeds
-        # absorbed power.
-        # TO DO:
-        # need to make sure we are computing the correct values of emissivity using the notes above
-        _kill = 1
-        _T = 300
+        _ri, _kz, _cos_theta = self._compute_batched_kz(
+            refractive_index_array, incident_angles, wavelength_array
+        )
+        _nl = _ri.shape[-1]
+        _dm, _dim = self._compute_batched_dm(_ri, _cos_theta, polarization)
+        _phil = _kz * np.asarray(thickness_array, dtype=float)
+        _p = np.exp(-1j * _phil)
+        _p_inv = np.exp(1j * _phil)
+        _blocks = self._compute_batched_graded_blocks(
+            refractive_index_array,
+            thickness_array,
+            incident_angles,
+            polarization,
+            wavelength_array,
+            gradient=True,
+        )
+        if gradient_type != "thickness" and any(_l in _blocks for _l in layer_indices):
+            raise ValueError("index gradients are not available for graded layers")
+
+        # backward sweep: first column of the suffix products Y_l = B_{l+1} ... D_{N-1}
+        _suffix = {}
+        _b = _dm[..., _nl - 1, :, :]
+        for i in range(_nl - 2, 0, -1):
+            _suffix[i] = np.copy(_b[..., :, 0])
+            if i in _blocks:
+                _b = np.matmul(_blocks[i][0], _b)
+                continue
+            _r = np.matmul(_dim[..., i, :, :], _b)
+            _r[..., 0, :] *= _p[..., i, np.newaxis]
+            _r[..., 1, :] *= _p_inv[..., i, np.newaxis]
+            _b = np.matmul(_dm[..., i, :, :], _r)
+        _tm = np.matmul(_dim[..., 0, :, :], _b)
+        _factor = _ri[..., -1] * _cos_theta[..., -1] / (_ri[..., 0] * _cos_theta[..., 0])
+
+        if gradient_type != "thickness":
+            # derivatives of kz and cos(theta) with respect to the index of each layer
+            _k0 = 2 * np.pi / np.asarray(wavelength_array)
+            _dkz = _ri * _k0[:, np.newaxis] ** 2 / _kz
+            _dcos_theta = _k0[:, np.newaxis] / _kz - _kz / (_ri ** 2 * _k0[:, np.newaxis])
+            _d = np.asarray(thickness_array, dtype=float)
+        if gradient_type == "fill_fraction":
+            self._check_effective_medium_layers(layer_indices)
+            _dn_df = {
+                _l: self._compute_effective_medium_layer(
+                    self.material_array[_l], wavelength_array=wavelength_array
+                )[1]
+                for _l in layer_indices
+            }
+
+        # forward sweep: prefix products X_l = Dinv_0 B_1 ... B_{l-1}
+        if adjoint is None:
+            _tm_gradient = np.zeros(
+                (len(layer_indices),) + _tm.shape[:-1], dtype=complex
+            )
+        else:
+            _y = adjoint(_tm, _factor)
+            _sum_axes = tuple(range(_y.ndim - _tm.ndim + 1, _y.ndim))
+            _tm_gradient = np.zeros(_y.shape[: _y.ndim - _tm.ndim + 1] + (len(layer_indices),))
+        _position = {_l: _n for _n, _l in enumerate(layer_indices)}
+        _a = _dim[..., 0, :, :]
+        for i in range(1, _nl - 1):
+            _prefix = np.matmul(_a, _dm[..., i, :, :])
+            if i in _position:
+                _w = np.matmul(_dim[..., i, :, :], _suffix[i][..., np.newaxis])[..., 0]
+                if i in _blocks:
+                    # X_l dC_l Y_l e_0 for a graded layer
+                    _dtm = np.matmul(
+                        _a, np.matmul(_blocks[i][1], _suffix[i][..., np.newaxis])
+                    )[..., 0]
+                elif gradient_type == "thickness":
+                    # X_l D_l dP_l Dinv_l Y_l e_0, see Eq. (18) of https://journals.aps.org/prresearch/pdf/10.1103/PhysRevResearch.2.013018
+                    _dp = np.stack(
+                        (
+                            -1j * _kz[..., i] * _p[..., i] * _w[..., 0],
+                            1j * _kz[..., i] * _p_inv[..., i] * _w[..., 1],
+                        ),
+                        axis=-1,
+                    )
+                    _dtm = np.matmul(_prefix, _dp[..., np.newaxis])[..., 0]
+                else:
+                    _dtm = self._compute_batched_block_index_derivative(
+                        _a,
+                        _dm[..., i, :, :],
+                        _dim[..., i, :, :],
+                        _w,
+                        _ri[..., i],
+                        _cos_theta[..., i],
+                        _dcos_theta[..., i],
+                        _dkz[..., i] * _d[i],
+                        _p[..., i],
+                        _p_inv[..., i],
+                        polarization,
+                    )
+                    if gradient_type == "k":
+                        _dtm = 1j * _dtm
+                    elif gradient_type == "fill_fraction":
+                        # chain rule through the effective index, dM / df = dM / dn dn / df
+                        _dtm = _dtm * _dn_df[i][..., np.newaxis]
+                if adjoint is None:
+                    _tm_gradient[_position[i]] = _dtm
+                else:
+                    _tm_gradient[..., _position[i]] = np.real(
+                        np.sum(_y * _dtm, axis=_sum_axes)
+                    )
+            if i in _blocks:
+                _a = np.matmul(_a, _blocks[i][0])
+                continue
+            _prefix[..., :, 0] *= _p[..., i, np.newaxis]
+            _prefix[..., :, 1] *= _p_inv[..., i, np.newaxis]
+            _a = np.matmul(_prefix, _dim[..., i, :, :])
+
+        return _tm, _factor, _tm_gradient
+
+    def _compute_batched_block_index_derivative(
+        self,
+        prefix,
+        dm,
+        dim,
+        w,
+        refractive_index,
+        cosine_theta,
+        cosine_theta_derivative,
+        phil_derivative,
+        p,
+        p_inv,
+        polarization,
+    ):
+        """computes X_l dB_l / dn_l Y_l e_0 for one layer given w = Dinv_l Y_l e_0, see
+        _compute_batched_tm_gradient
 
-        #while(_kill):
-        #    _bbs = self._compute_blackbody_spectrum(self.wavelength_array, _T)
-        #    P_emit = np.trapz( np.pi/2 * _bbs * (emissivity_A_B + absorptivity_AB_T), self.wavelength_array)
-        #    _T += 1
-        #    if P_emit > absorptivity_B_T :
-        #        _kill = 0
-        # assign _T to self.temperature
-        self.temperature = _T
+        Returns
+        -------
+            ... x 2 numpy array of complex floats
+        """
+        # derivative of the D matrix through n and cos(theta)
+        _ddm = np.zeros_like(dm)
+        if polarization == "s":
+            _dnc = cosine_theta + refractive_index * cosine_theta_derivative
+            _ddm[..., 1, 0] = _dnc
+            _ddm[..., 1, 1] = -_dnc
+        else:
+            _ddm[..., 0, 0] = cosine_theta_derivative
+            _ddm[..., 0, 1] = cosine_theta_derivative
+            _ddm[..., 1, 0] = 1
+            _ddm[..., 1, 1] = -1
 
+        def _mv(matrix, vector):
+            return np.matmul(matrix, vector[..., np.newaxis])[..., 0]
 
+        def _pv(vector, p0, p1):
+            return np.stack((p0 * vector[..., 0], p1 * vector[..., 1]), axis=-1)
 
-        
-    def compute_cooling(self):
-        """Method to compute the radiative cooling figures of merit
+        # dD P Dinv w + D dP Dinv w - D P Dinv dD Dinv w
+        _v = _mv(_ddm, _pv(w, p, p_inv))
+        _v += _mv(dm, _pv(w, -1j * phil_derivative * p, 1j * phil_derivative * p_inv))
+        _v -= _mv(dm, _pv(_mv(dim, _mv(_ddm, w)), p, p_inv))
+        return _mv(prefix, _v)
 
-        Attributes
-        ----------
-        self.radiative_cooling_power : float
-            the thermal power radiated by a structure into the universe (P_rad)
+    def _compute_batched_spectrum_gradient(
+        self, incident_angles, polarization, wavelength_indices=None
+    ):
+        """compute the spectra and their gradients with respect to the layers in gradient_list
+        for a batch of incident angles and a (chunk of) the wavelengths in one vectorized pass
 
-        self.atmospheric_warming_power : float
-            the thermal power radiated by the atmosphere and absorbed by a structure (P_atm)
+        Arguments
+        ---------
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            wavelength_indices : slice or numpy array of ints
+                the wavelengths to compute, default is all of them
+        Returns
+        -------
+            _R, _T : A x number_of_wavelengths numpy arrays of floats
+                reflectivity and transmissivity spectra
+            _R_gradient, _T_gradient : A x number_of_wavelengths x len(gradient_list) numpy arrays of floats
+                their derivatives with respect to the thicknesses of the layers in gradient_list
+        """
+        if "i" in self.coherence_array:
+            raise ValueError("gradients are not available with incoherent layers")
+        if wavelength_indices is None:
+            wavelength_indices = slice(None)
+        # the thickness gradients of graded layers are taken from the transfer matrices
+        if (
+            self.gradient_type == "thickness"
+            and not self.graded_layers
+            and self._use_scattering_matrix(
+                incident_angles,
+                self._refractive_index_array[wavelength_indices],
+                wavelength_array=self.wavelength_array[wavelength_indices],
+            )
+        ):
+            _r, _t, _, _, _factor, _r_gradient, _t_gradient = self._compute_batched_smatrix(
+                self._refractive_index_array[wavelength_indices],
+                self.thickness_array,
+                incident_angles,
+                polarization,
+                self.wavelength_array[wavelength_indices],
+                self.gradient_list,
+            )
+            _R_gradient = 2 * np.real(np.conj(_r) * _r_gradient)
+            _T_gradient = 2 * np.real(np.conj(_t) * _t_gradient) * np.real(_factor)
+            return (
+                np.real(_r * np.conj(_r)),
+                np.real(_t * np.conj(_t) * _factor),
+                np.moveaxis(_R_gradient, 0, -1),
+                np.moveaxis(_T_gradient, 0, -1),
+            )
+        self._check_transfer_matrix_stack(
+            self.gradient_type + " gradients",
+            incident_angles,
+            self._refractive_index_array[wavelength_indices],
+            wavelength_array=self.wavelength_array[wavelength_indices],
+        )
+        _tm, _factor, _tm_gradient = self._compute_batched_tm_gradient(
+            self._refractive_index_array[wavelength_indices],
+            self.thickness_array,
+            incident_angles,
+            polarization,
+            self.wavelength_array[wavelength_indices],
+            self.gradient_list,
+            gradient_type=self.gradient_type,
+        )
+        return self._compute_batched_rt_gradient(_tm, _factor, _tm_gradient)
 
-        self.solar_warming_power : float
-            the thermal power radiated by the sun and absorbed by a structure (P_sun)
+    def _compute_batched_rt_gradient(self, tm, factor, tm_gradient):
+        """computes R, T and their derivatives from the transfer matrices and the first column of
+        their derivatives, see _compute_batched_spectrum_gradient
 
-        self.net_cooling_power : float
-            P_rad - P_atm - P_sum ... if positive, the structure is net cooling if negative, it is net heating
+        Arguments
+        ---------
+            tm : ... x 2 x 2 numpy array of complex floats
+            factor : ... numpy array of complex floats
+            tm_gradient : G x ... x 2 numpy array of complex floats
 
         Returns
         -------
-        None
+            _R, _T : ... numpy arrays of floats
+            _R_gradient, _T_gradient : ... x G numpy arrays of floats
         """
-
-        # get \epsilon_s(\lambda, \theta) and \epsilon_s(\lambda, \theta) for thermal radiation
-        self.compute_explicit_angle_spectrum()
-
-        # call _compute_thermal_radiated_power( ) function
-        self.radiative_cooling_power = self._compute_thermal_radiated_power(
-            self.emissivity_array_s,
-            self.emissivity_array_p,
-            self.theta_vals,
-            self.theta_weights,
-            self.wavelength_array,
+        _m00 = tm[..., 0, 0]
+        _m10 = tm[..., 1, 0]
+        _r = _m10 / _m00
+        _t = 1 / _m00
+
+        # Eqs. (10) - (15) of https://journals.aps.org/prresearch/abstract/10.1103/PhysRevResearch.2.013018
+        _r_prime = (_m00 * tm_gradient[..., 1] - _m10 * tm_gradient[..., 0]) / _m00 ** 2
+        _t_prime = -tm_gradient[..., 0] / _m00 ** 2
+        _R_gradient = np.real(_r_prime * np.conj(_r) + _r * np.conj(_r_prime))
+        _T_gradient = np.real(
+            (_t_prime * np.conj(_t) + _t * np.conj(_t_prime)) * factor
         )
 
-        # call _compute_atmospheric_radiated_power() function
-        self.atmospheric_warming_power = self._compute_atmospheric_radiated_power(
-            self._atmospheric_transmissivity,
-            self.emissivity_array_s,
-            self.emissivity_array_p,
-            self.theta_vals,
-            self.theta_weights,
-            self.wavelength_array,
+        _R = np.real(_r * np.conj(_r))
+        _T = np.real(_t * np.conj(_t) * factor)
+        return (
+            _R,
+            _T,
+            np.moveaxis(_R_gradient, 0, -1),
+            np.moveaxis(_T_gradient, 0, -1),
         )
 
-        # need to get one more set of \epsilon_s(\lambda, solar_angle) and \epsilon_p(\lamnda, solar_angle)
-        self.incident_angle = self.solar_angle
-        self.polarization = "s"
-        self.compute_spectrum()
-        solar_absorptivity_s = self.emissivity_array
-        self.polarization = "p"
-        self.compute_spectrum()
-        solar_absorptivity_p = self.emissivity_array
-        self.solar_warming_power = self._compute_solar_radiated_power(
-            self._solar_spectrum,
-            solar_absorptivity_s,
-            solar_absorptivity_p,
-            self.wavelength_array,
+    def _compute_batched_needle_tm_gradient(
+        self,
+        refractive_index_array,
+        thickness_array,
+        incident_angles,
+        polarization,
+        wavelength_array,
+        layer_indices,
+        needle_index_array,
+        depth_fractions,
+    ):
+        """compute the transfer matrix and the first column of its derivative with respect to the
+        thickness delta of a needle (an infinitesimally thin layer) of each candidate material
+        inserted at each depth z = f d_l inside each layer l in layer_indices.
+
+        A needle of material m splits P_l into P_l(z) [Dinv_l D_m P_m(delta) Dinv_m D_l] P_l(d_l - z)
+        and D_m P_m(delta) Dinv_m = I + delta G_m + O(delta^2) with G_m = D_m diag(-i kz_m, i kz_m) Dinv_m,
+        so dM / d delta = X_l D_l P_l(z) Dinv_l G_m D_l P_l(d_l - z) Dinv_l Y_l, with the same prefix and
+        suffix products X_l, Y_l as in _compute_batched_tm_gradient.
+
+        Arguments
+        ---------
+            refractive_index_array : number_of_wavelengths x number_of_layers numpy array of complex floats
+            thickness_array : number_of_layers numpy array of floats
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            wavelength_array : numpy array of floats
+                the wavelengths refractive_index_array is sampled on
+            layer_indices : list of ints
+                the host layers of the needles
+            needle_index_array : number_of_materials x number_of_wavelengths numpy array of complex floats
+                refractive index of each candidate material, e.g. from _get_material_index_bank
+            depth_fractions : numpy array of floats
+                depths of the needles as fractions of the host layer thickness
+        Returns
+        -------
+            _tm : A x number_of_wavelengths x 2 x 2 numpy array of complex floats
+                the transfer matrices
+            _factor : A x number_of_wavelengths numpy array of complex floats
+                RI prefactor for computing transmission
+            _tm_gradient : (len(layer_indices) * len(depth_fractions) * number_of_materials) x A x number_of_wavelengths x 2 numpy array of complex floats
+                the first column of dM / d delta for each needle, ordered as layer, depth, material
+        """
+        _ri, _kz, _cos_theta = self._compute_batched_kz(
+            refractive_index_array, incident_angles, wavelength_array
         )
-        self.net_cooling_power = (
-            self.radiative_cooling_power
-            - self.solar_warming_power
-            - self.atmospheric_warming_power
+        _nl = _ri.shape[-1]
+        _dm, _dim = self._compute_batched_dm(_ri, _cos_theta, polarization)
+        _phil = _kz * np.asarray(thickness_array, dtype=float)
+        _p = np.exp(-1j * _phil)
+        _p_inv = np.exp(1j * _phil)
+
+        # G_m of each candidate material, with the incident medium prepended so that kx matches
+        _needle_ri = np.concatenate(
+            (np.asarray(refractive_index_array)[:, :1], np.transpose(needle_index_array)),
+            axis=1,
         )
-
-    def compute_cooling_gradient(self):
-        # get the gradient of the emissivity vs angle and wavelength
-        self.compute_explicit_angle_spectrum_gradient()
-        self.radiative_cooling_power_gradient = (
-            self._compute_thermal_radiated_power_gradient(
-                self.emissivity_gradient_array_s,
-                self.emissivity_gradient_array_p,
-                self.theta_vals,
-                self.theta_weights,
-                self.wavelength_array,
-            )
+        _ri_m, _kz_m, _cos_m = self._compute_batched_kz(
+            _needle_ri, incident_angles, wavelength_array
         )
-
-        self.atmospheric_warming_power_gradient = (
-            self._compute_atmospheric_radiated_power_gradient(
-                self._atmospheric_transmissivity,
-                self.emissivity_gradient_array_s,
-                self.emissivity_gradient_array_p,
-                self.theta_vals,
-                self.theta_weights,
-                self.wavelength_array,
-            )
+        _dm_m, _dim_m = self._compute_batched_dm(_ri_m, _cos_m, polarization)
+        _g = np.copy(_dm_m[..., 1:, :, :])
+        _g[..., :, 0] *= -1j * _kz_m[..., 1:, np.newaxis]
+        _g[..., :, 1] *= 1j * _kz_m[..., 1:, np.newaxis]
+        _g = np.matmul(_g, _dim_m[..., 1:, :, :])
+
+        # backward sweep: first column of the suffix products Y_l = B_{l+1} ... D_{N-1}
+        _suffix = {}
+        _b = _dm[..., _nl - 1, :, :]
+        for i in range(_nl - 2, 0, -1):
+            _suffix[i] = np.copy(_b[..., :, 0])
+            _r = np.matmul(_dim[..., i, :, :], _b)
+            _r[..., 0, :] *= _p[..., i, np.newaxis]
+            _r[..., 1, :] *= _p_inv[..., i, np.newaxis]
+            _b = np.matmul(_dm[..., i, :, :], _r)
+        _tm = np.matmul(_dim[..., 0, :, :], _b)
+        _factor = _ri[..., -1] * _cos_theta[..., -1] / (_ri[..., 0] * _cos_theta[..., 0])
+
+        # forward sweep: prefix products X_l = Dinv_0 B_1 ... B_{l-1}
+        _nm = _g.shape[-3]
+        _tm_gradient = np.zeros(
+            (len(layer_indices), len(depth_fractions), _nm) + _tm.shape[:-1],
+            dtype=complex,
         )
+        _position = {_l: _n for _n, _l in enumerate(layer_indices)}
+        _a = _dim[..., 0, :, :]
+        for i in range(1, _nl - 1):
+            _prefix = np.matmul(_a, _dm[..., i, :, :])
+            if i in _position:
+                # Dinv_l G_m D_l for all candidate materials
+                _h = np.matmul(
+                    np.matmul(_dim[..., i, np.newaxis, :, :], _g), _dm[..., i, np.newaxis, :, :]
+                )
+                _w = np.matmul(_dim[..., i, :, :], _suffix[i][..., np.newaxis])[..., 0]
+                for _k, _f in enumerate(depth_fractions):
+                    _pz = np.exp(-1j * _f * _phil[..., i])
+                    _pd = np.exp(-1j * (1 - _f) * _phil[..., i])
+                    _v = np.stack((_pd * _w[..., 0], _w[..., 1] / _pd), axis=-1)
+                    _u = np.matmul(_h, _v[..., np.newaxis, :, np.newaxis])[..., 0]
+                    _u[..., 0] *= _pz[..., np.newaxis]
+                    _u[..., 1] /= _pz[..., np.newaxis]
+                    _dtm = np.matmul(_prefix[..., np.newaxis, :, :], _u[..., np.newaxis])
+                    _tm_gradient[_position[i], _k] = np.moveaxis(_dtm[..., 0], -2, 0)
+            _prefix[..., :, 0] *= _p[..., i, np.newaxis]
+            _prefix[..., :, 1] *= _p_inv[..., i, np.newaxis]
+            _a = np.matmul(_prefix, _dim[..., i, :, :])
+
+        return _tm, _factor, np.reshape(_tm_gradient, (-1,) + _tm.shape[:-1])
+
+    def _compute_batched_needle_gradient(
+        self, incident_angles, polarization, needle_index_array, depth_fractions, layer_indices=None
+    ):
+        """compute the spectra and their derivatives with respect to the thickness of a needle of
+        each candidate material at each depth of each layer, see _compute_batched_needle_tm_gradient
 
-        # need to get one more set of \epsilon_s(\lambda, solar_angle) and \epsilon_p(\lamnda, solar_angle)
-        self.incident_angle = self.solar_angle
-        self.polarization = "s"
-        self.compute_spectrum()
-        self.compute_spectrum_gradient()
-        solar_absorptivity_s = self.emissivity_gradient_array
-        self.polarization = "p"
-        self.compute_spectrum()
-        self.compute_spectrum_gradient()
-        solar_absorptivity_p = self.emissivity_gradient_array
-
-        self.solar_warming_power_gradient = self._compute_solar_radiated_power_gradient(
-            self._solar_spectrum,
-            solar_absorptivity_s,
-            solar_absorptivity_p,
+        Arguments
+        ---------
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            needle_index_array : number_of_materials x number_of_wavelengths numpy array of complex floats
+                refractive index of each candidate material
+            depth_fractions : numpy array of floats
+                depths of the needles as fractions of the host layer thickness
+            layer_indices : list of ints
+                the host layers, default is all layers between the incident and terminal media
+        Returns
+        -------
+            _R, _T : A x number_of_wavelengths numpy arrays of floats
+                reflectivity and transmissivity spectra
+            _R_gradient, _T_gradient : A x number_of_wavelengths x number_of_needles numpy arrays of floats
+                their derivatives with respect to the needle thicknesses, ordered as layer, depth, material
+        """
+        if layer_indices is None:
+            layer_indices = range(1, self.number_of_layers - 1)
+        if self.graded_layers:
+            raise ValueError("needle derivatives are not available with graded layers")
+        self._check_transfer_matrix_stack("needle derivatives", incident_angles)
+        _tm, _factor, _tm_gradient = self._compute_batched_needle_tm_gradient(
+            self._refractive_index_array,
+            self.thickness_array,
+            incident_angles,
+            polarization,
             self.wavelength_array,
+            list(layer_indices),
+            needle_index_array,
+            depth_fractions,
         )
-        self.net_cooling_power_gradient = (
-            self.radiative_cooling_power_gradient
-            - self.solar_warming_power_gradient
-            - self.atmospheric_warming_power_gradient
+        return self._compute_batched_rt_gradient(_tm, _factor, _tm_gradient)
+
+    def _compute_fom_gradient_vjp(
+        self,
+        incident_angles,
+        polarization,
+        reflectivity_weight,
+        transmissivity_weight,
+        chunk_size=None,
+    ):
+        """compute the gradients of figures of merit that are weighted integrals of R and T with
+        respect to the layers in gradient_list by pushing the weights back through the transfer
+        matrix chain (vector-Jacobian products), without forming the spectral Jacobians.
+
+        With r' = (M00 dM10 - M10 dM00) / M00^2 and t' = -dM00 / M00^2,
+            sum_lambda w_R dR + w_T dT = Re sum_lambda y . dM e_0
+        with the covector y = 2 w_R r* (-M10 / M00^2, 1 / M00) + 2 w_T Re(factor) t* (-1 / M00^2, 0).
+        The wavelengths are processed in chunks, so memory is O(chunk_size x number_of_layers).
+
+        Arguments
+        ---------
+            incident_angles : float or A numpy array of floats
+                angles of incidence in radians
+            polarization : str
+                's' or 'p'
+            reflectivity_weight, transmissivity_weight : K x A x number_of_wavelengths numpy arrays of floats
+                the weights of R and T in the K figures of merit (e.g. minus the FomPlan weight of
+                an emissivity figure of merit for both)
+            chunk_size : int
+                number of wavelengths per chunk, default is self.gradient_chunk_size
+        Returns
+        -------
+            _fom_gradient : K x len(gradient_list) numpy array of floats
+        """
+        if "i" in self.coherence_array:
+            raise ValueError("gradients are not available with incoherent layers")
+        if chunk_size is None:
+            chunk_size = self.gradient_chunk_size
+        _nwl = self.number_of_wavelengths
+        _smatrix = (
+            self.gradient_type == "thickness"
+            and not self.graded_layers
+            and self._use_scattering_matrix(incident_angles)
         )
+        if not _smatrix:
+            self._check_transfer_matrix_stack(
+                self.gradient_type + " gradients", incident_angles
+            )
+        _fom_gradient = 0.0
+        for _start in range(0, _nwl, chunk_size):
+            _chunk = slice(_start, min(_start + chunk_size, _nwl))
+            _w_R = reflectivity_weight[..., _chunk]
+            _w_T = transmissivity_weight[..., _chunk]
+
+            if _smatrix:
+                # the scattering matrices give the chunk of the Jacobians directly
+                _, _, _R_gradient, _T_gradient = self._compute_batched_spectrum_gradient(
+                    incident_angles, polarization, _chunk
+                )
+                _nd = _R_gradient.ndim - 1
+                _axes = (list(range(_w_R.ndim - _nd, _w_R.ndim)), list(range(_nd)))
+                _fom_gradient = (
+                    _fom_gradient
+                    + np.tensordot(_w_R, _R_gradient, axes=_axes)
+                    + np.tensordot(_w_T, _T_gradient, axes=_axes)
+                )
+                continue
+
+            def _adjoint(tm, factor):
+                _m00 = tm[..., 0, 0]
+                _m10 = tm[..., 1, 0]
+                _rc = 2 * _w_R * np.conj(_m10 / _m00)
+                _tc = 2 * _w_T * np.real(factor) * np.conj(1 / _m00)
+                return np.stack(
+                    (-_rc * _m10 / _m00 ** 2 - _tc / _m00 ** 2, _rc / _m00), axis=-1
+                )
+
+            _, _, _chunk_gradient = self._compute_batched_tm_gradient(
+                self._refractive_index_array[_chunk],
+                self.thickness_array,
+                incident_angles,
+                polarization,
+                self.wavelength_array[_chunk],
+                self.gradient_list,
+                adjoint=_adjoint,
+                gradient_type=self.gradient_type,
+            )
+            _fom_gradient = _fom_gradient + _chunk_gradient
+        return _fom_gradient
 
     def _compute_kz(self):
         """computes the z-component of the wavevector in each layer of the stack
@@ -1741,33 +4881,17 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
         None
 
         """
-        # numerators come from the actual spectra times the envelope
-        _ut_array = self.transmissive_envelope * self.transmissivity_array
-        _ur_array = self.reflective_envelope * self.reflectivity_array
+        _plan = self._get_fom_plan()
 
-        # integrate to get numerators
-        _ut = np.trapz(_ut_array, self.wavelength_array)
-        _ur = np.trapz(_ur_array, self.wavelength_array)
-
-        # denominators are slightly different between R and T.
-
-        # T_denom -> integrate transmissive envelope
-        _t_denom = np.trapz(
-            self.transmissive_envelope, self.wavelength_array
-        )
-
-        # R_denom -> integrate reflection spectrum
-        _r_denom = np.trapz(
-            self.reflectivity_array, self.wavelength_array
+        # the transmission weights are already normalized by the integral of the
+        # transmissive envelope (and are zero if the envelope is zero everywhere)
+        self.transmission_efficiency = _plan.evaluate(
+            "transmission_efficiency", self.transmissivity_array
         )
 
-        # if transmissivity_envelope is zero everywhere, this will give nan.. handle
-        # by just giving value of zero the transmission_efficiency
-
-        if _t_denom == 0.0:
-            self.transmission_efficiency = 0.0
-        else:
-            self.transmission_efficiency = (_ut / _t_denom)
+        # numerator and denominator of the reflection efficiency
+        _ur = _plan.evaluate("useful_reflected_power", self.reflectivity_array)
+        _r_denom = _plan.evaluate("total_reflected_power", self.reflectivity_array)
 
         # if reflectivity is zero everywhere, this will give nan - handle
         # by just giving value of zero to reflection_efficiency
@@ -1837,46 +4961,48 @@ class TmmDriver(SpectrumDriver, Materials, Therml):
               f'(lambda) = int reflectivity_envelope R'(lambda) d lambda
 
         """
-        # eta_T' = Pi(lambda) * T'(lambda) / Pi(lambda)
-        self.compute_spectrum_gradient()
-
-        _ngr = len(self.transmissivity_gradient_array[0, :])
-        # integrate the thermal emission spectrum over wavelength using np.trapz
-        self.transmission_efficiency_gradient = np.zeros(_ngr)
-        self.reflection_efficiency_gradient = np.zeros(_ngr)
-
-        # this term is in the denominator of each of the eta_T' elements
-        _eta_T_denom = np.trapz(self.transmissive_envelope, self.wavelength_array)
+        _plan = self._get_fom_plan()
 
         # these terms are in each of the eta_R' elements
-        _f_l = np.trapz(
-            self.reflective_envelope * self.reflectivity_array, self.wavelength_array
-        )
-        _g_l = np.trapz(self.reflectivity_array, self.wavelength_array)
+        _f_l = _plan.evaluate("useful_reflected_power", self.reflectivity_array)
+        _g_l = _plan.evaluate("total_reflected_power", self.reflectivity_array)
+
+        if self.gradient_method == "adjoint":
+            # eta_T', f' and g' as vector-Jacobian products of the three weight vectors
+            _zero = np.zeros_like(self.wavelength_array)
+            _w_R = np.array(
+                [
+                    _zero,
+                    _plan.weights["useful_reflected_power"],
+                    _plan.weights["total_reflected_power"],
+                ]
+            )
+            _w_T = np.array([_plan.weights["transmission_efficiency"], _zero, _zero])
+            (
+                self.transmission_efficiency_gradient,
+                _fp_l,
+                _gp_l,
+            ) = self._compute_fom_gradient_vjp(
+                self.incident_angle, self.polarization, _w_R, _w_T
+            )
+        else:
+            # eta_T' = Pi(lambda) * T'(lambda) / Pi(lambda)
+            self.compute_spectrum_gradient()
 
-        for i in range(_ngr):
             # can compute eta_T' in one shot
-            self.transmission_efficiency_gradient[i] = (
-                np.trapz(
-                    self.transmissive_envelope
-                    * self.transmissivity_gradient_array[:, i],
-                    self.wavelength_array,
-                )
-                / _eta_T_denom
+            self.transmission_efficiency_gradient = _plan.evaluate_gradient(
+                "transmission_efficiency", self.transmissivity_gradient_array
             )
 
-            # need to get parts of g'(lambda) and f'(lambda) terms
-            _gp_l = np.trapz(
-                self.reflectivity_gradient_array[:, i], self.wavelength_array
+            # g'(lambda) and f'(lambda) terms for all layers at once
+            _fp_l = _plan.evaluate_gradient(
+                "useful_reflected_power", self.reflectivity_gradient_array
             )
-            _fp_l = np.trapz(
-                self.reflective_envelope * self.reflectivity_gradient_array[:, i],
-                self.wavelength_array,
+            _gp_l = _plan.evaluate_gradient(
+                "total_reflected_power", self.reflectivity_gradient_array
             )
 
-            self.reflection_efficiency_gradient[i] = (
-                _g_l * _fp_l - _f_l * _gp_l
-            ) / _g_l**2
+        self.reflection_efficiency_gradient = (_g_l * _fp_l - _f_l * _gp_l) / _g_l**2
 
         self.selective_mirror_fom_gradient = (
             self.transmission_efficiency_weight * self.transmission_efficiency_gradient
@@ -0,0 +1,286 @@
+import numpy as np
+from .therml import Therml
+
+
+class FomPlan(Therml):
+    """Collects precomputed quadrature-weight vectors for the spectral figures of merit
+
+    Every figure of merit computed by Therml and TmmDriver is a weighted integral
+    of a spectrum (emissivity, reflectivity or transmissivity) over wavelength (and
+    possibly angle).  The weights depend only on the wavelength grid, the temperatures
+    and the ancillary spectra (AM1.5, atmospheric transmissivity, envelopes), so they
+    are built once here and each evaluation reduces to a single dot product.
+
+    Attributes
+    ----------
+    wavelength_array : numpy array of floats
+        the wavelengths in meters the weights are defined on
+
+    temperature : float or numpy array of floats
+        temperature(s) of the structure in Kelvin
+
+    blackbody_spectrum : numpy array of floats
+        Planck's blackbody spectrum at temperature
+
+    blackbody_power_density : float or numpy array of floats
+        total power density radiated into a hemisphere by a blackbody at temperature
+
+    weights : dict of numpy arrays of floats
+        weight vector for each figure of merit, keyed by the name of the attribute
+        the figure of merit is stored to on the driver
+
+    Returns
+    -------
+    None
+
+    Examples
+    --------
+    >>> plan = FomPlan(wavelength_array, temperature=1500)
+    >>> plan.evaluate("power_density", emissivity_array)
+    """
+
+    def __init__(
+        self,
+        wavelength_array,
+        temperature=300,
+        lambda_bandgap=2254e-9,
+        atmospheric_temperature=300,
+        pv_lambda_bandgap=750e-9,
+        solar_spectrum=None,
+        atmospheric_transmissivity=None,
+        transmissive_envelope=None,
+        reflective_envelope=None,
+        theta_vals=None,
+        theta_weights=None,
+        atmospheric_emissivity_table=None,
+    ):
+        """constructor for the FomPlan class"""
+        self.wavelength_array = wavelength_array
+        self.temperature = temperature
+        self.lambda_bandgap = lambda_bandgap
+        self.atmospheric_temperature = atmospheric_temperature
+        self.pv_lambda_bandgap = pv_lambda_bandgap
+        self.weights = {}
+        # number of trailing (spectral) axes of each weight array
+        self._spectral_ndim = {}
+
+        self._compute_thermal_weights()
+        self._compute_pv_stpv_weights(solar_spectrum)
+        self._compute_selective_mirror_weights(
+            transmissive_envelope, reflective_envelope
+        )
+        self._compute_cooling_weights(
+            solar_spectrum,
+            atmospheric_transmissivity,
+            theta_vals,
+            theta_weights,
+            atmospheric_emissivity_table,
+        )
+
+    def _add_weight(self, name, weight, spectral_ndim=1):
+        """stores the weight array of figure of merit name"""
+        self.weights[name] = weight
+        self._spectral_ndim[name] = spectral_ndim
+
+    def _compute_thermal_weights(self):
+        """builds the weights of the thermal emission figures of merit
+        References
+        ----------
+        Equations (15) - (18) and (27) of https://github.com/FoleyLab/wptherml/blob/master/docs/Equations.pdf
+        """
+        _wl = self.wavelength_array
+        _w = self._compute_trapz_weights(_wl)
+
+        _T = np.asarray(self.temperature, dtype=float)
+        self.blackbody_spectrum = self._compute_blackbody_spectrum(_wl, _T)
+        self.blackbody_power_density = np.pi * np.dot(self.blackbody_spectrum, _w)
+
+        # total power density
+        self._add_weight("power_density", np.pi * _w * self.blackbody_spectrum)
+
+        # useful (sub-bandgap) power density
+        _bg_idx = np.abs(_wl - self.lambda_bandgap).argmin()
+        _w_bg = self._compute_trapz_weights(_wl, 0, _bg_idx)
+        self._add_weight(
+            "stpv_power_density",
+            np.pi * _w_bg * self.blackbody_spectrum * _wl / self.lambda_bandgap,
+        )
+
+        # numerator of the luminous efficiency
+        self._compute_photopic_luminosity(_wl)
+        self._add_weight(
+            "luminous_power_density",
+            np.pi * _w * self._photopic_luminosity_array * self.blackbody_spectrum,
+        )
+
+        # exciton splitting power between 2450 and 4150 nm
+        _min_idx = np.abs(_wl - 2450e-9).argmin()
+        _max_idx = np.abs(_wl - 4150e-9).argmin()
+        _w_ex = self._compute_trapz_weights(_wl, _min_idx, _max_idx)
+        self._add_weight(
+            "pv_stpv_exciton_splitting_power", np.pi * _w_ex * self.blackbody_spectrum
+        )
+
+        # splitting power between 3.0 and 3.5 microns
+        _min_idx = np.abs(_wl - 3e-6).argmin()
+        _max_idx = np.abs(_wl - 3.5e-6).argmin()
+        _w_sp = self._compute_trapz_weights(_wl, _min_idx, _max_idx)
+        self._add_weight(
+            "pv_stpv_splitting_power", np.pi * _w_sp * self.blackbody_spectrum
+        )
+
+    def _compute_pv_stpv_weights(self, solar_spectrum):
+        """builds the weights of the pv-stpv short circuit current"""
+        if solar_spectrum is None:
+            return
+        _wl = self.wavelength_array
+        _w = self._compute_trapz_weights(_wl)
+        # ideal spectral response below the bandgap
+        _bg_idx = np.abs(_wl - self.pv_lambda_bandgap).argmin()
+        _env = np.zeros_like(_wl)
+        _env[:_bg_idx] = _wl[:_bg_idx] / self.pv_lambda_bandgap
+        self._add_weight("pv_stpv_short_circuit_current", _w * solar_spectrum * _env)
+
+    def _compute_selective_mirror_weights(
+        self, transmissive_envelope, reflective_envelope
+    ):
+        """builds the weights of the selective mirror figure of merit"""
+        if transmissive_envelope is None or reflective_envelope is None:
+            return
+        _w = self._compute_trapz_weights(self.wavelength_array)
+
+        # transmission efficiency is normalized by the integral of the envelope
+        _t_denom = np.dot(_w, transmissive_envelope)
+        if _t_denom == 0.0:
+            self._add_weight("transmission_efficiency", np.zeros_like(_w))
+        else:
+            self._add_weight(
+                "transmission_efficiency", _w * transmissive_envelope / _t_denom
+            )
+
+        # reflection efficiency is the ratio of these two, applied to reflectivity
+        self._add_weight("useful_reflected_power", _w * reflective_envelope)
+        self._add_weight("total_reflected_power", _w)
+
+    def _compute_cooling_weights(
+        self,
+        solar_spectrum,
+        atmospheric_transmissivity,
+        theta_vals,
+        theta_weights,
+        atmospheric_emissivity_table=None,
+    ):
+        """builds the weights of the radiative cooling figures of merit, applied separately
+        to the s- and p-polarized emissivities (hence the factors of 0.5); a precomputed
+        atmospheric_emissivity_table (e.g. cached on the driver) is used if provided
+
+        References
+        ----------
+        Eqs. (2) - (4) of https://www.nature.com/articles/nature13883
+        """
+        _wl = self.wavelength_array
+        _w = self._compute_trapz_weights(_wl)
+
+        if solar_spectrum is not None:
+            self._add_weight("solar_warming_power", 0.5 * _w * solar_spectrum)
+
+        if theta_vals is None or theta_weights is None:
+            return
+
+        # angular quadrature weights of the hemispherical integrals
+        _w_theta = 0.5 * self._compute_angle_weights(theta_vals, theta_weights)
+
+        self._add_weight(
+            "radiative_cooling_power",
+            _w_theta[:, np.newaxis]
+            * (_w * self.blackbody_spectrum)[..., np.newaxis, :],
+            spectral_ndim=2,
+        )
+
+        if atmospheric_transmissivity is None:
+            return
+
+        _bb_atm = self._compute_blackbody_spectrum(
+            _wl, np.asarray(self.atmospheric_temperature, dtype=float)
+        )
+        if atmospheric_emissivity_table is None:
+            atmospheric_emissivity_table, _ = self._get_atmospheric_emissivity_table(
+                atmospheric_transmissivity, theta_vals, theta_weights
+            )
+        self._add_weight(
+            "atmospheric_warming_power",
+            _w_theta[:, np.newaxis]
+            * atmospheric_emissivity_table
+            * (_w * _bb_atm)[..., np.newaxis, :],
+            spectral_ndim=2,
+        )
+
+    def compute_support(self, *names):
+        """returns the wavelengths that figures of merit names depend on
+
+        Arguments
+        ---------
+        names : str
+            keys of the figures of merit in self.weights
+
+        Returns
+        -------
+        _support : numpy array of bools
+            True at the wavelengths where the weight of any of the figures of merit is non-zero
+        """
+        _support = np.zeros(len(self.wavelength_array), dtype=bool)
+        for name in names:
+            _weight = self.weights[name]
+            _support |= np.any(
+                np.reshape(_weight, (-1, len(self.wavelength_array))) != 0, axis=0
+            )
+        return _support
+
+    def evaluate(self, name, *spectra):
+        """evaluates figure of merit name as the sum of the weighted integrals of spectra
+
+        Arguments
+        ---------
+        name : str
+            key of the figure of merit in self.weights
+
+        spectra : numpy arrays of floats
+            one or more spectra (e.g. s- and p-polarized emissivities) with trailing
+            axes matching the spectral axes of the weight; leading axes are batch axes
+
+        Returns
+        -------
+        the figure of merit, with shape spectrum batch axes + weight batch axes
+        """
+        _weight = self.weights[name]
+        _nd = self._spectral_ndim[name]
+        _axes = list(range(-_nd, 0))
+        _fom = 0.0
+        for _spectrum in spectra:
+            _fom = _fom + np.tensordot(_spectrum, _weight, axes=(_axes, _axes))
+        return _fom
+
+    def evaluate_gradient(self, name, *spectrum_gradients):
+        """evaluates the gradient of figure of merit name as a matrix-vector product
+
+        Arguments
+        ---------
+        name : str
+            key of the figure of merit in self.weights
+
+        spectrum_gradients : numpy arrays of floats
+            one or more spectral Jacobians of shape spectral axes x len(gradient_list),
+            e.g. emissivity_gradient_array or emissivity_gradient_array_s
+
+        Returns
+        -------
+        the gradient vector, with shape weight batch axes + len(gradient_list)
+        """
+        _weight = self.weights[name]
+        _nd = self._spectral_ndim[name]
+        _w_axes = list(range(_weight.ndim - _nd, _weight.ndim))
+        _g_axes = list(range(_nd))
+        _grad = 0.0
+        for _gradient in spectrum_gradients:
+            _grad = _grad + np.tensordot(_weight, _gradient, axes=(_w_axes, _g_axes))
+        return _grad
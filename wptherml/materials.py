@@ -1,5 +1,6 @@
 import numpy as np
 from scipy.interpolate import InterpolatedUnivariateSpline
+from scipy.optimize import least_squares
 import os
 from scipy import constants
 
@@ -10,6 +11,18 @@ path = path_and_file[:-12]
 class Materials:
     """Compute the absorption, scattering, and extinction spectra of a sphere using Mie theory"""
 
+    # parsed data files shared by all instances, so that each file is only read once
+    _file_data_cache = {}
+
+    def _load_file_data(self, file_path):
+        """returns the contents of the data file file_path as a read-only numpy array,
+        parsing it with np.loadtxt only the first time it is requested"""
+        if file_path not in self._file_data_cache:
+            _data = np.loadtxt(file_path)
+            _data.setflags(write=False)
+            self._file_data_cache[file_path] = _data
+        return self._file_data_cache[file_path]
+
     def _create_test_multilayer(self, central_wavelength):
         """
         Simple method to create a 3-entry array of wavelengths as follows:
@@ -63,6 +76,66 @@ class Materials:
 
     
 
+    def _compute_effective_medium_index(
+        self, host_index, inclusion_index, fill_fraction, model="bruggeman"
+    ):
+        """computes the effective refractive index of inclusions in a host, and its derivative
+        with respect to the fill fraction, vectorized over wavelength and fill fraction
+
+        Arguments
+        ---------
+        host_index, inclusion_index : number_of_wavelengths numpy arrays of complex floats
+            refractive indices of the host and the inclusions
+        fill_fraction : float or F numpy array of floats
+            volume fraction(s) of the inclusions
+        model : str
+            "maxwell_garnett" (dilute inclusions in a continuous host) or "bruggeman"
+            (symmetric mixture)
+
+        Returns
+        -------
+        _index, _index_gradient : F x number_of_wavelengths numpy arrays of complex floats
+            the effective refractive index and its derivative with respect to fill_fraction
+
+        References
+        ----------
+        Maxwell-Garnett: eps = eps_h (eps_i + 2 eps_h + 2 f (eps_i - eps_h)) / (eps_i + 2 eps_h - f (eps_i - eps_h))
+        Bruggeman: f (eps_i - eps) / (eps_i + 2 eps) + (1 - f) (eps_h - eps) / (eps_h + 2 eps) = 0
+        """
+        _f = np.asarray(fill_fraction, dtype=float)[..., np.newaxis]
+        _eh = np.asarray(host_index, dtype=complex) ** 2
+        _ei = np.asarray(inclusion_index, dtype=complex) ** 2
+
+        if model == "maxwell_garnett":
+            _a = _ei + 2 * _eh
+            _delta = _ei - _eh
+            _denominator = _a - _f * _delta
+            _eps = _eh * (_a + 2 * _f * _delta) / _denominator
+            _deps = 3 * _eh * _a * _delta / _denominator ** 2
+        elif model == "bruggeman":
+            # 2 eps^2 - b eps - eps_i eps_h = 0, on the branch with Im(eps) >= 0
+            _b = (3 * _f - 1) * _ei + (2 - 3 * _f) * _eh
+            _root = np.sqrt(_b ** 2 + 8 * _ei * _eh)
+            _eps_plus = (_b + _root) / 4
+            _eps_minus = (_b - _root) / 4
+            _use_plus = np.where(
+                np.isclose(np.imag(_eps_plus), np.imag(_eps_minus)),
+                np.real(_eps_plus) >= np.real(_eps_minus),
+                np.imag(_eps_plus) >= np.imag(_eps_minus),
+            )
+            _eps = np.where(_use_plus, _eps_plus, _eps_minus)
+            # implicit differentiation of the Bruggeman condition
+            _gi = (_ei - _eps) / (_ei + 2 * _eps)
+            _gh = (_eh - _eps) / (_eh + 2 * _eps)
+            _dgi = -3 * _ei / (_ei + 2 * _eps) ** 2
+            _dgh = -3 * _eh / (_eh + 2 * _eps) ** 2
+            _deps = -(_gi - _gh) / (_f * _dgi + (1 - _f) * _dgh)
+        else:
+            raise ValueError("unknown effective medium model " + str(model))
+
+        _index = np.sqrt(_eps)
+        return _index, _deps / (2 * _index)
+
     def material_H2O(self, layer_number):
         """defines the refractive index layer of layer_number to be water
         assuming static refractive index of n = 1.33 + 0j
@@ -71,25 +144,6 @@ class Materials:
             np.ones(len(self.wavelength_array), dtype=complex) * 1.33
         )
 
-    def insert_layer(self, layer_number):
-        """insert an air layer between layer_number-1 and layer_number
-        e.g. if you have a structure that is Air/SiO2/HfO2/Ag/Air
-        and you issue insert_layer(1), the new structure will be
-        Air/Air/SiO2/HfO2/Ag/Air
-        if you issue insert_layer(2), the new structure will be
-        Air/SiO2/Air/HfO2/Ag/Air
-
-        """
-        _nwl = len(self._refractive_index_array[:, 0])
-        _nl = len(self._refractive_index_array[0, :])
-        _temp_ri_array = np.copy(self._refractive_index_array)
-        _new_ri_array = np.zeros((_nwl, _nl + 1), dtype=complex)
-        _new_air_layer = np.ones(_nwl, dtype=complex) * 1.0
-        _new_ri_array[:, :layer_number] = _temp_ri_array[:, :layer_number]
-        _new_ri_array[:, layer_number] = _new_air_layer
-        _new_ri_array[:, layer_number + 1 :] = _temp_ri_array[:, layer_number:]
-        self._refractive_index_array = np.copy(_new_ri_array)
-
     def material_Air(self, layer_number):
         """defines the refractive index layer of layer_number to be air
         assuming static refractive index of n = 1.0 + 0j
@@ -131,13 +185,8 @@ class Materials:
             """
             # get path to the sio2 data file
             file_path = path + "data/" + file_name
-            # now read SiO2 data into a numpy array
-            file_data = np.loadtxt(file_path)
-            # file_path[:,0] -> wavelengths in meters
-            # file_path[:,1] -> real part of the refractive index
-            # file_path[:,2] -> imaginary part of the refractive index
-            # now read Ag data into a numpy array
-            file_data = np.loadtxt(file_path)
+            # now read the data into a numpy array
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -183,7 +232,7 @@ class Materials:
             # get path to the sio2 data file
             file_path = path + "data/2D_HOIP.txt"
             # now read SiO2 data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -227,7 +276,7 @@ class Materials:
             # get path to the sio2 data file
             file_path = path + "data/SiO2_ir.txt"
             # now read SiO2 data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -269,7 +318,7 @@ class Materials:
             # get path to the TiO2 data file
             file_path = path + "data/TiO2_Siefke.txt"
             # now read TiO2 data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -355,7 +404,7 @@ class Materials:
                     file_path = path + "data/Ta2O5_Bright.txt"
 
             # now read Ta2O5 data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -397,7 +446,7 @@ class Materials:
             # get path to the tin data file
             file_path = path + "data/TiN_ellipsometry_data.txt"
             # now read Tin data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -418,6 +467,198 @@ class Materials:
                 np.ones(len(self.wavelength_array), dtype=complex) * refractive_index
             )
 
+    def material_dispersion(self, layer_number, model, parameters):
+        """defines the refractive index of layer layer_number from an analytic dispersion model,
+        see _compute_dispersion_index
+
+        Arguments
+        ----------
+        layer_number : int
+            specifies the layer of the stack
+
+        model : str
+            "drude", "lorentz", "sellmeier" or "cauchy"
+
+        parameters : dict
+            the parameters of the model
+
+        Returns
+        -------
+        None
+
+        Examples
+        --------
+        >>> material_dispersion(1, "sellmeier", {"B": [0.696, 0.408, 0.897], "C": [0.00468, 0.0135, 97.93]})
+        """
+        if layer_number > 0 and layer_number < (self.number_of_layers - 1):
+            self._refractive_index_array[:, layer_number] = self._compute_dispersion_index(
+                self.wavelength_array, model, parameters
+            )
+
+    def _compute_dispersion_index(self, wavelength_array, model, parameters):
+        """evaluates an analytic dispersion model in closed form on any wavelength grid
+
+        Arguments
+        ---------
+        wavelength_array : numpy array of floats
+            wavelengths in meters
+
+        model : str
+            one of
+            "drude" : eps = eps_inf - E_p^2 / (E^2 + i gamma E), with the keys "eps_inf",
+            "plasma_energy" and "damping" (in eV)
+            "lorentz" : eps = eps_inf + sum_j f_j E_j^2 / (E_j^2 - E^2 - i gamma_j E), with the keys
+            "eps_inf" and "oscillators", a list of [f_j, E_j, gamma_j] (energies in eV), plus an
+            optional free-electron (Drude) term from "plasma_energy" and "damping"
+            "sellmeier" : n^2 = A + sum_j B_j lambda^2 / (lambda^2 - C_j), with the keys "B", "C"
+            (in micron^2) and the optional "A" (default 1), lambda in microns
+            "cauchy" : n = A + B / lambda^2 + C / lambda^4 + i k, with the keys "A", "B", "C" and the
+            optional "k" (default 0), lambda in microns
+
+        parameters : dict
+            the parameters of the model
+
+        Returns
+        -------
+        number_of_wavelengths numpy array of complex floats
+        """
+        _wl = np.asarray(wavelength_array, dtype=float)
+        if model in ("drude", "lorentz"):
+            # photon energy in eV
+            _E = constants.h * constants.c / (constants.e * _wl)
+            _eps = parameters["eps_inf"] + 0j
+            if "plasma_energy" in parameters:
+                _eps = _eps - parameters["plasma_energy"] ** 2 / (
+                    _E ** 2 + 1j * parameters["damping"] * _E
+                )
+            for _f, _Ej, _gamma in parameters.get("oscillators", []):
+                _eps = _eps + _f * _Ej ** 2 / (_Ej ** 2 - _E ** 2 - 1j * _gamma * _E)
+            return np.sqrt(_eps + np.zeros_like(_E))
+        # wavelength in microns
+        _lam = _wl * 1e6
+        if model == "sellmeier":
+            _eps = parameters.get("A", 1.0) + 0j
+            for _B, _C in zip(parameters["B"], parameters["C"]):
+                _eps = _eps + _B * _lam ** 2 / (_lam ** 2 - _C)
+            return np.sqrt(_eps + np.zeros_like(_lam))
+        if model == "cauchy":
+            return (
+                parameters["A"]
+                + parameters["B"] / _lam ** 2
+                + parameters.get("C", 0.0) / _lam ** 4
+                + 1j * parameters.get("k", 0.0)
+            )
+        raise ValueError("unknown dispersion model " + str(model))
+
+    def fit_dispersion_model(
+        self,
+        file_name,
+        number_of_oscillators=3,
+        include_drude=None,
+        wavelength_range=None,
+        minimum_damping_ratio=1e-2,
+    ):
+        """fits a Lorentz (or Drude-Lorentz) multi-oscillator model to the refractive index data
+        in a file of the data directory, so that the material can be evaluated in closed form
+        with _compute_dispersion_index without reading the file or building splines
+
+        The residual is the relative error of the complex permittivity.  The parameters are
+        bounded so that the model is causal and extrapolates smoothly beyond the data: the
+        oscillator energies stay within the photon energies of the data, every oscillator has a
+        damping of at least minimum_damping_ratio times its energy and the free-electron damping
+        is at least minimum_damping_ratio times the lowest photon energy, so that no undamped
+        resonance just outside the data can make the material transparent there
+
+        Arguments
+        ---------
+        file_name : str
+            data file with columns wavelength (m), n and k, as for material_from_file
+
+        number_of_oscillators : int
+            number of Lorentz oscillators
+
+        include_drude : bool
+            include a free-electron term; default is to include it if the real part of the
+            permittivity is negative at the longest wavelength of the data (metals)
+
+        wavelength_range : list of floats
+            optional [minimum, maximum] wavelength in meters of the data to fit
+
+        minimum_damping_ratio : float
+            lower bound of the dampings relative to the oscillator energies
+
+        Returns
+        -------
+        _parameters : dict
+            the "lorentz" model parameters
+        _error : float
+            root mean square error |n_fit - n_data| over the fitted data
+
+        Examples
+        --------
+        >>> parameters, error = test.fit_dispersion_model("W_Rakic.txt", 4)
+        >>> test.material_dispersion(1, "lorentz", parameters)
+        """
+        _data = self._load_file_data(path + "data/" + file_name)
+        _idx = self._find_unique_ri_file_data(_data[:, 0])
+        _wl = _data[_idx, 0]
+        _n = _data[_idx, 1] + 1j * _data[_idx, 2]
+        if wavelength_range is not None:
+            _mask = (_wl >= wavelength_range[0]) & (_wl <= wavelength_range[1])
+            _wl = _wl[_mask]
+            _n = _n[_mask]
+        _eps = _n ** 2
+        _E = constants.h * constants.c / (constants.e * _wl)
+        if include_drude is None:
+            include_drude = np.real(_eps[np.argmax(_wl)]) < 0
+
+        _E_min = np.min(_E)
+        _E_max = np.max(_E)
+
+        # the oscillators are fitted as [f_j, E_j, gamma_j / E_j]
+        def _unpack(x):
+            _parameters = {"eps_inf": x[0]}
+            _offset = 1
+            if include_drude:
+                _parameters["plasma_energy"] = x[1]
+                _parameters["damping"] = x[2]
+                _offset = 3
+            _oscillators = np.reshape(x[_offset:], (-1, 3)) * [1.0, 1.0, 0.0]
+            _oscillators[:, 2] = x[_offset + 1 :: 3] * x[_offset + 2 :: 3]
+            _parameters["oscillators"] = _oscillators.tolist()
+            return _parameters
+
+        def _residual(x):
+            _model = self._compute_dispersion_index(_wl, "lorentz", _unpack(x)) ** 2
+            _error = (_model - _eps) / np.abs(_eps)
+            return np.concatenate((np.real(_error), np.imag(_error)))
+
+        # initial guess: oscillators spread logarithmically over the energies of the data
+        _x0 = [1.0]
+        _lower = [1e-6]
+        _upper = [np.inf]
+        if include_drude:
+            _x0 += [
+                np.sqrt(max(-np.real(_eps[np.argmin(_E)]), 1.0)) * _E_min,
+                max(0.05, 2 * minimum_damping_ratio * _E_min),
+            ]
+            _lower += [1e-6, minimum_damping_ratio * _E_min]
+            _upper += [np.inf, np.inf]
+        for _Ej in np.geomspace(_E_min, _E_max, number_of_oscillators):
+            _x0 += [1.0, _Ej, max(0.5, 2 * minimum_damping_ratio)]
+            _lower += [0.0, _E_min, minimum_damping_ratio]
+            _upper += [np.inf, _E_max, np.inf]
+        _fit = least_squares(_residual, _x0, bounds=(_lower, _upper))
+
+        _parameters = _unpack(_fit.x)
+        _error = np.sqrt(
+            np.mean(
+                np.abs(self._compute_dispersion_index(_wl, "lorentz", _parameters) - _n)
+                ** 2
+            )
+        )
+        return _parameters, _error
+
     def material_Al(self, layer_number):
         if layer_number > 0 and layer_number < (self.number_of_layers - 1):
             """defines the refractive index of layer layer_number to be Al
@@ -445,7 +686,7 @@ class Materials:
             # get path to the Al data file
             file_path = path + "data/Al_Rakic.txt"
             # now read Al data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -490,7 +731,7 @@ class Materials:
             # get path to the Platinum data file
             file_path = path + "data/Pt_Rakic.txt"
             # now read Platinum data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             n_spline = InterpolatedUnivariateSpline(
                 file_data[:, 0], file_data[:, 1], k=1
             )
@@ -531,7 +772,7 @@ class Materials:
             # get path to the HfO2 data file
             file_path = path + "data/HfO2_Al-Kuhaili.txt"
 
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -615,7 +856,7 @@ class Materials:
                     file_path = path + "data/Au_IR.txt"
 
             # now read Au data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -660,7 +901,7 @@ class Materials:
             # get path to the Rh data file
             file_path = path + "data/Rh_Weaver.txt"
             # now read Rh data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -704,7 +945,7 @@ class Materials:
             # get path to the Al2O3 data file
             file_path = path + "data/Al2O3_ri.txt"
             # now read Au data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -748,7 +989,7 @@ class Materials:
             # get path to the Ru data file
             file_path = path + "data/Ru.txt"
             # now read Ru data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -793,7 +1034,7 @@ class Materials:
             # get path to the polystyrene data file
             file_path = path + "data/Polystyrene.txt"
             # now read Au data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -878,7 +1119,7 @@ class Materials:
                     file_path = path + "data/AlN_Kischkat.txt"
 
             # now read AlN data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -964,7 +1205,7 @@ class Materials:
                     file_path = path + "data/W_Ordal.txt"
 
             # now read W data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1050,7 +1291,7 @@ class Materials:
                     file_path = path + "data/Si_Shkondin.txt"
 
             # now read Si data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1092,7 +1333,7 @@ class Materials:
             # get path to the Si3N4 data file
             file_path = path + "data/Si3N4_Luke.txt"
             # now read Tin data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1134,7 +1375,7 @@ class Materials:
             # get path to the Zr02 data file
             file_path = path + "data/ZrO2_Wood.txt"
             # now read Tin data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1176,7 +1417,7 @@ class Materials:
             # get path to the Si02 data file
             file_path = path + "data/SiO2_udm.txt"
             # now read Tin data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1226,7 +1467,7 @@ class Materials:
             # get path to the Al203 data file
             file_path = path + "data/Al2O3_udm.txt"
             # now read Tin data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1320,7 +1561,7 @@ class Materials:
                     file_path = path + "data/Re_Palik.txt"
 
             # now read Re data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1401,7 +1642,7 @@ class Materials:
                     file_path = path + "data/Ag_Yang.txt"
 
             # now read Ag data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1487,7 +1728,7 @@ class Materials:
                     file_path = path + "data/Pb_Ordal.txt"
 
             # now read Pb data into a numpy array
-            file_data = np.loadtxt(file_path)
+            file_data = self._load_file_data(file_path)
             # file_path[:,0] -> wavelengths in meters
             # file_path[:,1] -> real part of the refractive index
             # file_path[:,2] -> imaginary part of the refractive index
@@ -1536,7 +1777,7 @@ class Materials:
         # get path to the cie data
         file_path = path + "data/cie_cmf.txt"
         # now read Rh data into a numpy array
-        file_data = np.loadtxt(file_path)
+        file_data = self._load_file_data(file_path)
         # file_data[:,0] -> wavelengths in nm
         # file_data[:,1] -> cr response function
         # file_data[:,2] -> cg response function
@@ -1587,7 +1828,7 @@ class Materials:
         # get path to the AM data
         file_path = path + "data/scaled_AM_1_5.txt"
         # now read Rh data into a numpy array
-        file_data = np.loadtxt(file_path)
+        file_data = self._load_file_data(file_path)
         # file_data[:,0] -> wavelengths in m
         # file_data[:,1] -> solar spectrum in W / m / m^2 / sr
 
@@ -1627,7 +1868,7 @@ class Materials:
         # get path to the AM data
         file_path = path + "data/Atmospheric_transmissivity.txt"
         # now read Rh data into a numpy array
-        file_data = np.loadtxt(file_path)
+        file_data = self._load_file_data(file_path)
         # file_data[:,0] -> wavelengths in m
         # file_data[:,1] -> atmospheric transmissivity
 
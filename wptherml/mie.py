@@ -90,16 +90,9 @@ class MieDriver(SpectrumDriver, Materials):
         else:
             self.radius = 100e-9
 
-        if "wavelength_list" in args:
-            lamlist = args["wavelength_list"]
-            self.wavelength_array = np.linspace(lamlist[0], lamlist[1], int(lamlist[2]))
-            self.number_of_wavelengths = int(lamlist[2])
-            self.wavenumber_array = 1 / self.wavelength_array
-        # default wavelength array
-        else:
-            self.wavelength_array = np.linspace(400e-9, 800e-9, 10)
-            self.number_of_wavelengths = 10
-            self.wavenumber_array = 1 / self.wavelength_array
+        # wavelength grid from wavelength_list, an explicit array or segments in
+        # wavelength, wavenumber or energy
+        self._parse_wavelength_input(args)
 
         if "sphere_material" in args:
             self.sphere_material = args["sphere_material"]
@@ -0,0 +1,745 @@
+import numpy as np
+from scipy.optimize import minimize, Bounds, BFGS
+
+
+class Optimizer:
+    """Gradient-based optimization of the layer thicknesses (or, with gradient_type
+    "fill_fraction", the fill fractions of the effective medium layers) of a TmmDriver
+
+    Each evaluation of the objective computes the figure of merit and its gradient
+    together: the spectra and their derivatives with respect to the layers in
+    gradient_list come out of one batched transfer-matrix sweep, and both are
+    integrated with the weights of the driver's FomPlan.  The value and gradient
+    of the last point are cached, so a scipy iteration that asks for both costs
+    one forward plus one gradient sweep.
+
+    Attributes
+    ----------
+    driver : TmmDriver
+        the multilayer whose thickness_array is optimized
+
+    figure_of_merit : str
+        the figure of merit to optimize, one of the keys of Optimizer.figures_of_merit
+
+    maximize : bool
+        maximize (default) or minimize the figure of merit
+
+    method : str
+        "L-BFGS-B" (default) or "trust-constr"
+
+    layer_indices : numpy array of ints
+        the layers that are optimized, i.e. driver.gradient_list
+
+    bounds : scipy.optimize.Bounds
+        thickness bounds in nm, from driver.minimum_thickness_nm and driver.maximum_thickness_nm,
+        or [0, 1] for fill fractions
+
+    number_of_evaluations : int
+        number of forward + gradient sweeps performed
+
+    Returns
+    -------
+    None
+
+    Examples
+    --------
+    >>> opt = Optimizer(driver, "stpv_spectral_efficiency")
+    >>> result = opt.optimize()
+    """
+
+    figures_of_merit = (
+        "power_density",
+        "stpv_power_density",
+        "stpv_spectral_efficiency",
+        "transmission_efficiency",
+        "reflection_efficiency",
+        "selective_mirror_fom",
+        "radiative_cooling_power",
+        "net_cooling_power",
+    )
+
+    def __init__(
+        self,
+        driver,
+        figure_of_merit="stpv_spectral_efficiency",
+        maximize=True,
+        method="L-BFGS-B",
+        bounds_nm=None,
+    ):
+        """constructor for the Optimizer class
+
+        Arguments
+        ---------
+        bounds_nm : list of floats
+            optional [minimum, maximum] thickness in nm, overriding the bounds of the driver
+        """
+        if figure_of_merit not in self.figures_of_merit:
+            raise ValueError(
+                "figure_of_merit must be one of " + ", ".join(self.figures_of_merit)
+            )
+        if driver.gradient_type not in ("thickness", "fill_fraction"):
+            raise ValueError(
+                "the optimizer requires gradient_type 'thickness' or 'fill_fraction'"
+            )
+
+        self.driver = driver
+        self.figure_of_merit = figure_of_merit
+        self.maximize = maximize
+        self.method = method
+        self.layer_indices = np.asarray(driver.gradient_list, dtype=int)
+
+        if bounds_nm is None:
+            bounds_nm = [driver.minimum_thickness_nm, driver.maximum_thickness_nm]
+        self.bounds_nm = [float(bounds_nm[0]), float(bounds_nm[1])]
+        _n = len(self.layer_indices)
+        if driver.gradient_type == "fill_fraction":
+            self.bounds = Bounds(np.zeros(_n), np.ones(_n))
+        else:
+            self.bounds = Bounds(
+                np.full(_n, self.bounds_nm[0]), np.full(_n, self.bounds_nm[1])
+            )
+
+        self.number_of_evaluations = 0
+        self._last_x = None
+        self._last_value = None
+        self._last_gradient = None
+
+    def _compute_spectrum_jacobian(self, incident_angles, polarization):
+        """returns R, T and their derivatives with respect to the optimization variables"""
+        return self.driver._compute_batched_spectrum_gradient(
+            incident_angles, polarization
+        )
+
+    def _compute_spectra_gradient(self, incident_angles, polarization):
+        """returns the emissivity, reflectivity, transmissivity and their gradients
+        from a single batched sweep, with the thickness gradients per nm"""
+        _R, _T, _dR, _dT = self._compute_spectrum_jacobian(
+            incident_angles, polarization
+        )
+        if self.driver.gradient_type == "thickness":
+            _dR = _dR * 1e-9
+            _dT = _dT * 1e-9
+        return 1 - _R - _T, _R, _T, -_dR - _dT, _dR, _dT
+
+    def _compute_stpv_fom(self, plan):
+        """STPV figures of merit and their gradients"""
+        _d = self.driver
+        _E, _, _, _dE, _, _ = self._compute_spectra_gradient(
+            _d.incident_angle, _d.polarization
+        )
+        _P = plan.evaluate("power_density", _E)
+        _dP = plan.evaluate_gradient("power_density", _dE)
+        if self.figure_of_merit == "power_density":
+            return _P, _dP
+
+        _rho = plan.evaluate("stpv_power_density", _E)
+        _drho = plan.evaluate_gradient("stpv_power_density", _dE)
+        if self.figure_of_merit == "stpv_power_density":
+            return _rho, _drho
+
+        # quotient rule, see Eq. (4) of https://journals.aps.org/prresearch/abstract/10.1103/PhysRevResearch.2.013018
+        return _rho / _P, (_drho * _P - _dP * _rho) / (_P * _P)
+
+    def _compute_selective_mirror_fom(self, plan):
+        """selective mirror figures of merit and their gradients"""
+        _d = self.driver
+        _, _R, _T, _, _dR, _dT = self._compute_spectra_gradient(
+            _d.incident_angle, _d.polarization
+        )
+        _eta_T = plan.evaluate("transmission_efficiency", _T)
+        _deta_T = plan.evaluate_gradient("transmission_efficiency", _dT)
+        if self.figure_of_merit == "transmission_efficiency":
+            return _eta_T, _deta_T
+
+        _f = plan.evaluate("useful_reflected_power", _R)
+        _df = plan.evaluate_gradient("useful_reflected_power", _dR)
+        _g = plan.evaluate("total_reflected_power", _R)
+        _dg = plan.evaluate_gradient("total_reflected_power", _dR)
+        if _g == 0.0:
+            _eta_R, _deta_R = 0.0, np.zeros_like(_df)
+        else:
+            _eta_R, _deta_R = _f / _g, (_g * _df - _f * _dg) / _g ** 2
+        if self.figure_of_merit == "reflection_efficiency":
+            return _eta_R, _deta_R
+
+        _a = _d.transmission_efficiency_weight
+        _b = _d.reflection_efficiency_weight
+        return _a * _eta_T + _b * _eta_R, _a * _deta_T + _b * _deta_R
+
+    def _compute_cooling_fom(self, plan):
+        """radiative cooling figures of merit and their gradients"""
+        _d = self.driver
+        _value = 0.0
+        _gradient = 0.0
+        for _pol in ("s", "p"):
+            _E, _, _, _dE, _, _ = self._compute_spectra_gradient(_d.theta_vals, _pol)
+            _value = _value + plan.evaluate("radiative_cooling_power", _E)
+            _gradient = _gradient + plan.evaluate_gradient(
+                "radiative_cooling_power", _dE
+            )
+            if self.figure_of_merit == "net_cooling_power":
+                _value = _value - plan.evaluate("atmospheric_warming_power", _E)
+                _gradient = _gradient - plan.evaluate_gradient(
+                    "atmospheric_warming_power", _dE
+                )
+                _E, _, _, _dE, _, _ = self._compute_spectra_gradient(
+                    _d.solar_angle, _pol
+                )
+                _value = _value - plan.evaluate("solar_warming_power", _E)
+                _gradient = _gradient - plan.evaluate_gradient(
+                    "solar_warming_power", _dE
+                )
+        return _value, _gradient
+
+    def compute_fom_and_gradient(self, x):
+        """evaluates the figure of merit and its gradient at thicknesses x
+
+        Arguments
+        ---------
+        x : numpy array of floats
+            thicknesses in nm (or fill fractions) of the layers in layer_indices
+
+        Returns
+        -------
+        _value : float
+            the figure of merit
+        _gradient : numpy array of floats
+            its derivative with respect to each thickness in nm (or fill fraction)
+        """
+        x = np.asarray(x, dtype=float)
+        self._set_variables(x)
+        if self._last_x is not None and np.array_equal(x, self._last_x):
+            return self._last_value, self._last_gradient
+
+        _value, _gradient = self._evaluate_fom()
+        self.number_of_evaluations += 1
+
+        self._last_x = np.copy(x)
+        self._last_value = float(_value)
+        self._last_gradient = np.asarray(_gradient, dtype=float)
+        return self._last_value, self._last_gradient
+
+    def _set_variables(self, x):
+        """sets the thicknesses in nm or the fill fractions x of the driver"""
+        _d = self.driver
+        if _d.gradient_type == "fill_fraction":
+            for _l, _f in zip(self.layer_indices, x):
+                _d.set_fill_fraction(_l, _f)
+        else:
+            _d.thickness_array[self.layer_indices] = x * 1e-9
+
+    def _evaluate_fom(self):
+        """evaluates the figure of merit and its gradient for the current structure"""
+        _d = self.driver
+        if self.figure_of_merit in ("radiative_cooling_power", "net_cooling_power"):
+            if getattr(_d, "theta_vals", None) is None:
+                _d.theta_vals, _d.theta_weights = _d._get_angular_quadrature(
+                    _d.number_of_angles
+                )
+            _evaluate = self._compute_cooling_fom
+        elif self.figure_of_merit in (
+            "transmission_efficiency",
+            "reflection_efficiency",
+            "selective_mirror_fom",
+        ):
+            _evaluate = self._compute_selective_mirror_fom
+        else:
+            _evaluate = self._compute_stpv_fom
+
+        return _evaluate(_d._get_fom_plan())
+
+    def _objective(self, x):
+        """objective passed to scipy, which always minimizes"""
+        _value, _gradient = self.compute_fom_and_gradient(x)
+        if self.maximize:
+            return -_value, -_gradient
+        return _value, _gradient
+
+    def optimize(self, x0=None, tolerance=None, max_iterations=200):
+        """optimizes the thicknesses of the layers in layer_indices within bounds and leaves the
+        driver at the optimum
+
+        Arguments
+        ---------
+        x0 : numpy array of floats
+            initial thicknesses in nm (or fill fractions), default is the current structure
+
+        tolerance : float
+            optional tolerance passed to scipy.optimize.minimize
+
+        max_iterations : int
+            maximum number of iterations
+
+        Attributes
+        ----------
+        result : scipy.optimize.OptimizeResult
+            the result of the optimization; result.x are the thicknesses in nm and result.fun
+            is the optimized figure of merit (with its sign restored)
+
+        Returns
+        -------
+        result
+        """
+        if x0 is None and self.driver.gradient_type == "fill_fraction":
+            x0 = [self.driver.get_fill_fraction(_l) for _l in self.layer_indices]
+        elif x0 is None:
+            x0 = self.driver.thickness_array[self.layer_indices] * 1e9
+        x0 = np.clip(np.asarray(x0, dtype=float), self.bounds.lb, self.bounds.ub)
+
+        _kwargs = {}
+        if self.method == "trust-constr":
+            _kwargs["hess"] = BFGS()
+        self.result = minimize(
+            self._objective,
+            x0,
+            jac=True,
+            method=self.method,
+            bounds=self.bounds,
+            tol=tolerance,
+            options={"maxiter": max_iterations},
+            **_kwargs
+        )
+
+        # leave the driver at the optimum
+        _value, _gradient = self.compute_fom_and_gradient(self.result.x)
+        self.result.fun = _value
+        self.result.jac = _gradient
+        return self.result
+
+
+class NeedleOptimizer(Optimizer):
+    """Needle optimization of a TmmDriver: thin layers of candidate materials are inserted
+    where the figure of merit improves fastest and all thicknesses are then refined
+
+    The derivative of the figure of merit with respect to the thickness of a needle of each
+    candidate material at depth_fractions of every layer comes from one batched sweep over
+    the prefix and suffix transfer-matrix products (see
+    TmmDriver._compute_batched_needle_tm_gradient) and is integrated with the same FomPlan
+    weights as the thickness gradient.  Layers are inserted and removed in the preallocated
+    layer buffers of the driver.
+
+    Attributes
+    ----------
+    needle_materials : list of str
+        the candidate materials, default is driver.possible_materials
+
+    depth_fractions : numpy array of floats
+        depths of the candidate needles as fractions of the host layer thickness
+
+    needle_derivatives : number_of_layers - 2 x len(depth_fractions) x len(needle_materials) numpy array of floats
+        derivative of the figure of merit (per nm of needle) of each candidate of the last search
+
+    fom_history : list of floats
+        figure of merit after each refinement
+
+    Returns
+    -------
+    None
+
+    Examples
+    --------
+    >>> opt = NeedleOptimizer(driver, "selective_mirror_fom", needle_materials=["SiO2", "TiO2"])
+    >>> opt.optimize_needles(number_of_needles=5)
+    """
+
+    def __init__(
+        self,
+        driver,
+        figure_of_merit="stpv_spectral_efficiency",
+        maximize=True,
+        method="L-BFGS-B",
+        bounds_nm=None,
+        needle_materials=None,
+        number_of_depths=10,
+    ):
+        """constructor for the NeedleOptimizer class
+
+        Arguments
+        ---------
+        needle_materials : list of str
+            the candidate materials, default is driver.possible_materials
+
+        number_of_depths : int
+            number of candidate depths per layer
+        """
+        Optimizer.__init__(self, driver, figure_of_merit, maximize, method, bounds_nm)
+        if needle_materials is None:
+            needle_materials = driver.possible_materials
+        self.needle_materials = list(needle_materials)
+        self._index_bank = driver._get_material_index_bank(self.needle_materials)
+        self.depth_fractions = (np.arange(number_of_depths) + 0.5) / number_of_depths
+        self.fom_history = []
+        self._needle_search = False
+
+    def _compute_spectrum_jacobian(self, incident_angles, polarization):
+        """returns R, T and their derivatives with respect to the thicknesses or, during a
+        needle search, with respect to the needle thicknesses"""
+        if not self._needle_search:
+            return Optimizer._compute_spectrum_jacobian(
+                self, incident_angles, polarization
+            )
+        return self.driver._compute_batched_needle_gradient(
+            incident_angles, polarization, self._index_bank, self.depth_fractions
+        )
+
+    def _set_all_layers(self):
+        """optimizes all layers between the incident and terminal media"""
+        _d = self.driver
+        _d.gradient_list = np.arange(1, _d.number_of_layers - 1)
+        self.layer_indices = _d.gradient_list
+        _n = len(self.layer_indices)
+        self.bounds = Bounds(
+            np.full(_n, self.bounds_nm[0]), np.full(_n, self.bounds_nm[1])
+        )
+        self._last_x = None
+
+    def compute_needle_derivatives(self):
+        """computes the derivative of the figure of merit with respect to the thickness (in nm)
+        of a needle of each candidate material at each depth of each layer
+
+        Attributes
+        ----------
+        needle_derivatives : number_of_layers - 2 x len(depth_fractions) x len(needle_materials) numpy array of floats
+
+        Returns
+        -------
+        needle_derivatives
+        """
+        _d = self.driver
+        self._needle_search = True
+        try:
+            _, _derivatives = self._evaluate_fom()
+        finally:
+            self._needle_search = False
+        self.needle_derivatives = np.reshape(
+            _derivatives,
+            (_d.number_of_layers - 2, len(self.depth_fractions), len(self.needle_materials)),
+        )
+        return self.needle_derivatives
+
+    def _insert_needle(self):
+        """inserts the needle with the largest improvement rate, if there is one
+
+        Returns
+        -------
+        bool
+            True if a needle was inserted
+        """
+        _d = self.driver
+        _sign = 1.0 if self.maximize else -1.0
+        _rate = _sign * self.compute_needle_derivatives()
+
+        # both parts of the split host layer must respect the lower bound, and a
+        # needle of the host material is just a thicker host layer
+        _thickness_nm = _d.thickness_array[1:-1] * 1e9
+        _depth = _thickness_nm[:, np.newaxis] * self.depth_fractions
+        _valid = (_depth >= self.bounds_nm[0]) & (
+            _thickness_nm[:, np.newaxis] - _depth >= self.bounds_nm[0]
+        )
+        _host = np.array(
+            [
+                [
+                    np.allclose(_bank, _d._refractive_index_array[:, _l])
+                    for _bank in self._index_bank
+                ]
+                for _l in range(1, _d.number_of_layers - 1)
+            ]
+        )
+        _rate = np.where(_valid[:, :, np.newaxis] & ~_host[:, np.newaxis, :], _rate, -np.inf)
+        if not np.max(_rate) > 0:
+            return False
+
+        _l, _k, _m = np.unravel_index(np.argmax(_rate), _rate.shape)
+        _l += 1
+        _thickness = _d.thickness_array[_l]
+        _depth = self.depth_fractions[_k] * _thickness
+        _d.thickness_array[_l] = _depth
+        _d._insert_layer(
+            _l + 1,
+            self.needle_thickness_nm * 1e-9,
+            self.needle_materials[_m],
+            self._index_bank[_m],
+        )
+        _d._insert_layer(
+            _l + 2,
+            _thickness - _depth,
+            _d.material_array[_l],
+            _d._refractive_index_array[:, _l],
+        )
+        return True
+
+    def _remove_thin_layers(self):
+        """removes layers that have collapsed to the lower thickness bound and merges
+        neighbouring layers of the same material"""
+        _d = self.driver
+        _l = 1
+        while _l < _d.number_of_layers - 1 and _d.number_of_layers > 3:
+            if _d.thickness_array[_l] * 1e9 <= self.bounds_nm[0] * (1 + 1e-6):
+                _d.remove_layer(_l)
+            elif _l > 1 and np.array_equal(
+                _d._refractive_index_array[:, _l], _d._refractive_index_array[:, _l - 1]
+            ):
+                _d.thickness_array[_l - 1] += _d.thickness_array[_l]
+                _d.remove_layer(_l)
+            else:
+                _l += 1
+
+    def optimize_needles(
+        self, number_of_needles=10, needle_thickness_nm=None, max_iterations=100
+    ):
+        """alternates thickness refinement and needle insertion until no needle improves the
+        figure of merit or number_of_needles have been inserted, and leaves the driver at the
+        final structure
+
+        Arguments
+        ---------
+        number_of_needles : int
+            maximum number of needles to insert
+
+        needle_thickness_nm : float
+            initial thickness of an inserted needle, default is the lower thickness bound
+
+        max_iterations : int
+            maximum number of iterations of each refinement
+
+        Returns
+        -------
+        the final figure of merit
+        """
+        if needle_thickness_nm is None:
+            needle_thickness_nm = self.bounds_nm[0]
+        self.needle_thickness_nm = max(needle_thickness_nm, self.bounds_nm[0])
+
+        for _n in range(number_of_needles + 1):
+            self._set_all_layers()
+            self.optimize(max_iterations=max_iterations)
+            self._remove_thin_layers()
+            self._set_all_layers()
+            self.fom_history.append(
+                self.compute_fom_and_gradient(
+                    self.driver.thickness_array[self.layer_indices] * 1e9
+                )[0]
+            )
+            if _n == number_of_needles or not self._insert_needle():
+                break
+
+        self._set_all_layers()
+        return self.fom_history[-1]
+
+
+class EvolutionaryOptimizer:
+    """Population-based global optimization of the thicknesses and materials of a TmmDriver
+
+    The genome of each individual is the thickness vector (in nm) of the layers in
+    random_thickness_list plus the materials_code of the layers in random_materials_list,
+    i.e. indices into possible_materials.  Thicknesses evolve by differential evolution
+    (DE/rand/1/bin) and material codes are inherited from the donor individual or redrawn
+    with material_mutation_rate.  The refractive index of every possible material is
+    looked up once in an index bank, and each generation is evaluated in one batched
+    transfer-matrix pass over the whole population.
+
+    Attributes
+    ----------
+    driver : TmmDriver
+        the multilayer that is optimized
+
+    figure_of_merit : str
+        the figure of merit to optimize, one of Optimizer.figures_of_merit
+
+    population_size : int
+        number of individuals, at least 4 so that each trial vector has three distinct donors
+
+    thickness_population : population_size x len(random_thickness_list) numpy array of floats
+        thicknesses in nm of each individual
+
+    materials_population : population_size x len(random_materials_list) numpy array of ints
+        materials codes of each individual
+
+    fom_population : population_size numpy array of floats
+        figure of merit of each individual
+
+    fom_history : list of floats
+        best figure of merit after each generation
+
+    Returns
+    -------
+    None
+
+    Examples
+    --------
+    >>> opt = EvolutionaryOptimizer(driver, "selective_mirror_fom", seed=1)
+    >>> best = opt.optimize(number_of_generations=50)
+    """
+
+    def __init__(
+        self,
+        driver,
+        figure_of_merit="stpv_spectral_efficiency",
+        maximize=True,
+        population_size=20,
+        mutation_factor=0.6,
+        crossover_rate=0.7,
+        material_mutation_rate=0.1,
+        bounds_nm=None,
+        seed=None,
+    ):
+        """constructor for the EvolutionaryOptimizer class
+
+        Arguments
+        ---------
+        bounds_nm : list of floats
+            optional [minimum, maximum] thickness in nm, overriding the bounds of the driver
+
+        seed : int or numpy.random.Generator
+            seed of the random number generator
+        """
+        if figure_of_merit not in Optimizer.figures_of_merit:
+            raise ValueError(
+                "figure_of_merit must be one of "
+                + ", ".join(Optimizer.figures_of_merit)
+            )
+        if population_size < 4:
+            raise ValueError(
+                "population_size must be at least 4 so that the donors of each trial vector "
+                "differ from the individual"
+            )
+        self.driver = driver
+        self.figure_of_merit = figure_of_merit
+        self.maximize = maximize
+        self.population_size = population_size
+        self.mutation_factor = mutation_factor
+        self.crossover_rate = crossover_rate
+        self.material_mutation_rate = material_mutation_rate
+        self.rng = np.random.default_rng(seed)
+
+        if bounds_nm is None:
+            bounds_nm = [driver.minimum_thickness_nm, driver.maximum_thickness_nm]
+        self.minimum_thickness_nm = float(bounds_nm[0])
+        self.maximum_thickness_nm = float(bounds_nm[1])
+
+        self.thickness_layers = np.asarray(driver.random_thickness_list, dtype=int)
+        self.material_layers = np.asarray(driver.random_materials_list, dtype=int)
+        self._index_bank = driver._get_material_index_bank(driver.possible_materials)
+
+        # random initial population
+        self.thickness_population = self.rng.uniform(
+            self.minimum_thickness_nm,
+            self.maximum_thickness_nm,
+            (population_size, len(self.thickness_layers)),
+        )
+        self.materials_population = self.rng.integers(
+            0, len(driver.possible_materials), (population_size, len(self.material_layers))
+        )
+        self.fom_population = self.compute_population_fom(
+            self.thickness_population, self.materials_population
+        )
+        self.fom_history = []
+
+    def _build_population_arrays(self, thickness_population, materials_population):
+        """returns the S x number_of_wavelengths x number_of_layers refractive index and
+        S x number_of_layers thickness arrays of a population"""
+        _d = self.driver
+        _S = len(thickness_population)
+        _ri = np.repeat(_d._refractive_index_array[np.newaxis], _S, axis=0)
+        # S x number_of_material_layers x number_of_wavelengths -> S x nwl x nml
+        _ri[:, :, self.material_layers] = np.swapaxes(
+            self._index_bank[materials_population], 1, 2
+        )
+        _thickness = np.repeat(_d.thickness_array[np.newaxis], _S, axis=0)
+        _thickness[:, self.thickness_layers] = thickness_population * 1e-9
+        return _ri, _thickness
+
+    def compute_population_fom(self, thickness_population, materials_population):
+        """evaluates the figure of merit of every individual in one batched pass
+
+        Arguments
+        ---------
+        thickness_population : S x len(random_thickness_list) numpy array of floats
+            thicknesses in nm
+        materials_population : S x len(random_materials_list) numpy array of ints
+            indices into possible_materials
+
+        Returns
+        -------
+        S numpy array of floats
+        """
+        _ri, _thickness = self._build_population_arrays(
+            thickness_population, materials_population
+        )
+        return self.driver._compute_batched_fom(self.figure_of_merit, _ri, _thickness)
+
+    def _compute_trial_population(self):
+        """DE/rand/1/bin mutation and crossover of the whole population"""
+        _P = self.population_size
+        _x = self.thickness_population
+        _m = self.materials_population
+
+        # three distinct donors r1, r2, r3 different from each individual
+        _donors = np.argsort(self.rng.random((_P, _P)) + 2 * np.eye(_P), axis=1)[:, :3]
+        _r1, _r2, _r3 = _donors.T
+
+        _mutant = _x[_r1] + self.mutation_factor * (_x[_r2] - _x[_r3])
+        _mutant = np.clip(_mutant, self.minimum_thickness_nm, self.maximum_thickness_nm)
+        _cross = self.rng.random(_x.shape) < self.crossover_rate
+        # at least one thickness gene comes from the mutant
+        _cross[np.arange(_P), self.rng.integers(0, _x.shape[1], _P)] = True
+        _trial_x = np.where(_cross, _mutant, _x)
+
+        _trial_m = np.where(
+            self.rng.random(_m.shape) < self.crossover_rate, _m[_r1], _m
+        )
+        _redraw = self.rng.random(_m.shape) < self.material_mutation_rate
+        _trial_m[_redraw] = self.rng.integers(
+            0, len(self._index_bank), np.count_nonzero(_redraw)
+        )
+        return _trial_x, _trial_m
+
+    def optimize(self, number_of_generations=50):
+        """evolves the population and leaves the driver at the best individual
+
+        Arguments
+        ---------
+        number_of_generations : int
+            number of generations
+
+        Attributes
+        ----------
+        best_fom : float
+            the best figure of merit found
+
+        best_thickness_nm : numpy array of floats
+            thicknesses in nm of the best individual
+
+        best_materials_code : numpy array of ints
+            materials codes of the best individual
+
+        Returns
+        -------
+        best_fom
+        """
+        _sign = 1.0 if self.maximize else -1.0
+        for _ in range(number_of_generations):
+            _trial_x, _trial_m = self._compute_trial_population()
+            _trial_fom = self.compute_population_fom(_trial_x, _trial_m)
+            _better = _sign * _trial_fom >= _sign * self.fom_population
+            self.thickness_population[_better] = _trial_x[_better]
+            self.materials_population[_better] = _trial_m[_better]
+            self.fom_population[_better] = _trial_fom[_better]
+            self.fom_history.append(np.max(_sign * self.fom_population) * _sign)
+
+        _best = np.argmax(_sign * self.fom_population)
+        self.best_fom = self.fom_population[_best]
+        self.best_thickness_nm = np.copy(self.thickness_population[_best])
+        self.best_materials_code = np.copy(self.materials_population[_best])
+        self._set_driver_structure(self.best_thickness_nm, self.best_materials_code)
+        return self.best_fom
+
+    def _set_driver_structure(self, thickness_nm, materials_code):
+        """sets the thicknesses and materials of the driver from a genome, taking the
+        refractive index from the index bank"""
+        _d = self.driver
+        _d.thickness_array[self.thickness_layers] = thickness_nm * 1e-9
+        for _layer, _code in zip(self.material_layers, materials_code):
+            _d.material_array[_layer] = _d.possible_materials[_code]
+            _d._refractive_index_array[:, _layer] = self._index_bank[_code]
+        _d.materials_code = np.copy(materials_code)
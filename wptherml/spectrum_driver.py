@@ -1,7 +1,91 @@
 from abc import abstractmethod, ABC
+import numpy as np
+from scipy import constants
 
 
 class SpectrumDriver(ABC):
     @abstractmethod
     def compute_spectrum():
         pass
+
+    def _convert_to_wavelength(self, values, unit="m"):
+        """converts spectral coordinates to wavelengths in meters
+
+        Arguments
+        ---------
+        values : float or numpy array of floats
+            the spectral coordinates
+
+        unit : str
+            "m" or "nm" for wavelengths, "cm^-1" for wavenumbers, "eV" for photon energies
+
+        Returns
+        -------
+        numpy array of floats
+            the corresponding wavelengths in meters
+        """
+        values = np.asarray(values, dtype=float)
+        _unit = unit.lower()
+        if _unit == "m":
+            return values
+        elif _unit == "nm":
+            return values * 1e-9
+        elif _unit in ("cm^-1", "cm-1", "wavenumber"):
+            return 1e-2 / values
+        elif _unit in ("ev", "energy"):
+            return constants.h * constants.c / (values * constants.e)
+        else:
+            raise ValueError("unknown spectral unit " + str(unit))
+
+    def _parse_wavelength_input(self, args):
+        """defines wavelength_array, number_of_wavelengths and wavenumber_array from the
+        user inputs; the grid may be non-uniform and is always sorted in increasing wavelength
+
+        Accepted keys, checked in this order:
+            "wavelength_array" : explicit array of wavelengths in meters
+            "wavelength_segments" : list of [start, stop, number, unit] segments with unit
+                "m" (default if omitted), "nm", "cm^-1" or "eV", each uniform in its own unit;
+                end points shared by adjacent segments are merged
+            "wavenumber_list" : [start, stop, number] uniform in wavenumber (cm^-1)
+            "energy_list" : [start, stop, number] uniform in photon energy (eV)
+            "wavelength_list" : [start, stop, number] uniform in wavelength (meters)
+
+        Returns
+        -------
+        None
+        """
+        if "wavelength_array" in args:
+            _wl = self._convert_to_wavelength(args["wavelength_array"])
+        elif "wavelength_segments" in args:
+            _segments = []
+            for _segment in args["wavelength_segments"]:
+                _unit = _segment[3] if len(_segment) > 3 else "m"
+                _values = np.linspace(_segment[0], _segment[1], int(_segment[2]))
+                _segments.append(self._convert_to_wavelength(_values, _unit))
+            _wl = np.concatenate(_segments)
+        elif "wavenumber_list" in args:
+            lamlist = args["wavenumber_list"]
+            _wl = self._convert_to_wavelength(
+                np.linspace(lamlist[0], lamlist[1], int(lamlist[2])), "cm^-1"
+            )
+        elif "energy_list" in args:
+            lamlist = args["energy_list"]
+            _wl = self._convert_to_wavelength(
+                np.linspace(lamlist[0], lamlist[1], int(lamlist[2])), "eV"
+            )
+        elif "wavelength_list" in args:
+            lamlist = args["wavelength_list"]
+            _wl = np.linspace(lamlist[0], lamlist[1], int(lamlist[2]))
+        # default wavelength array
+        else:
+            _wl = np.linspace(400e-9, 800e-9, 10)
+
+        # the quadrature and the material splines expect increasing, distinct wavelengths;
+        # end points shared by segments in different units agree only to round-off
+        if np.any(np.diff(_wl) <= 1e-12 * _wl[1:]):
+            _wl = np.sort(_wl)
+            _wl = _wl[np.concatenate(([True], np.diff(_wl) > 1e-12 * _wl[1:]))]
+
+        self.wavelength_array = _wl
+        self.number_of_wavelengths = len(_wl)
+        self.wavenumber_array = 1 / self.wavelength_array
@@ -669,3 +669,524 @@ def test_selective_mirror_fom_gradient():
     # compare cfd to analytic gradient
     np.isclose(_r_grad, test.reflection_efficiency_gradient[_n_layer])
     np.isclose(_r_grad, test.transmission_efficiency_gradient[_n_layer])
+
+
+def test_compute_adaptive_spectrum():
+    """the adaptive grid should reproduce the thermal power density of a fine uniform
+    grid with fewer wavelengths, and its spectra should match compute_spectrum"""
+    test_args = {
+        "wavelength_list": [400e-9, 7000e-9, 4000],
+        "material_list": ["Air", "SiO2", "TiN", "SiO2", "Air"],
+        "thickness_list": [0, 1500e-9, 8e-9, 2000e-9, 0],
+        "temperature": 1700,
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.compute_stpv()
+    _expected_power_density = test.power_density
+
+    test.compute_adaptive_spectrum(tolerance=1e-3)
+    assert test.number_of_wavelengths < 1000
+    assert test.adaptive_spectrum_error < 1e-3
+    assert len(test._refractive_index_array) == test.number_of_wavelengths
+    assert len(test._solar_spectrum) == test.number_of_wavelengths
+
+    _emissivity = np.copy(test.emissivity_array)
+    test.compute_spectrum()
+    assert np.allclose(_emissivity, test.emissivity_array)
+
+    test.compute_stpv()
+    assert np.isclose(test.power_density, _expected_power_density, 1e-3)
+
+
+def test_compute_adaptive_spectrum_graded_layer():
+    """the refinement should redefine the grid only once and evaluate graded
+    layers on the new points"""
+    test_args = {
+        "wavelength_list": [400e-9, 2000e-9, 100],
+        "material_list": ["Air", "SiO2", "TiO2", "Air"],
+        "thickness_list": [0, 300e-9, 200e-9, 0],
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.set_graded_layer(1, lambda z: z, materials=["SiO2", "TiO2"])
+    _calls = []
+    _set_wavelength_array = test.set_wavelength_array
+    test.set_wavelength_array = lambda wl: (
+        _calls.append(len(wl)),
+        _set_wavelength_array(wl),
+    )
+    test.compute_adaptive_spectrum(tolerance=1e-3)
+    assert _calls == [test.number_of_wavelengths]
+    assert test.graded_layers[1]["index"].shape[0] == test.number_of_wavelengths
+
+    _reflectivity = np.copy(test.reflectivity_array)
+    test.compute_spectrum()
+    assert np.allclose(_reflectivity, test.reflectivity_array)
+
+
+def test_wavelength_grid_input():
+    """explicit arrays and segments in wavelength, wavenumber and energy should
+    define increasing non-uniform grids"""
+    _wl = np.array([400e-9, 450e-9, 700e-9, 701e-9])
+    test = sf.spectrum_factory("Tmm", {"wavelength_array": _wl})
+    assert np.allclose(test.wavelength_array, _wl)
+    assert test.number_of_wavelengths == 4
+
+    test = sf.spectrum_factory("Tmm", {"wavenumber_list": [2000, 1000, 11]})
+    assert np.allclose(test.wavelength_array, 1e-2 / np.linspace(2000, 1000, 11))
+
+    # dense between 1000 and 1240 nm, sparse elsewhere; shared end points are removed
+    test = sf.spectrum_factory(
+        "Tmm",
+        {
+            "wavelength_segments": [
+                [400e-9, 1000e-9, 7],
+                [1000, 1200, 21, "nm"],
+                [1.2398419843320025e-06 / 1.2e-6, 1.0, 11, "eV"],
+                [8000, 5000, 5, "cm^-1"],
+            ]
+        },
+    )
+    assert np.all(np.diff(test.wavelength_array) > 0)
+    assert test.number_of_wavelengths == 7 + 20 + 10 + 5
+    assert np.isclose(test.wavelength_array[26], 1.2e-6, rtol=1e-10, atol=0)
+    assert np.isclose(test.wavelength_array[-1], 2e-6, rtol=1e-10, atol=0)
+    assert len(test._refractive_index_array) == test.number_of_wavelengths
+
+
+def test_single_precision_batched_spectrum():
+    """single precision spectra should agree with double precision, and fall back to
+    double precision when a thick absorbing layer overflows exp(-i kz d)"""
+    test_args = {
+        "wavelength_list": [400e-9, 7000e-9, 200],
+        "material_list": ["Air", "SiO2", "TiN", "SiO2", "Ag", "Air"],
+        "thickness_list": [0, 1500e-9, 8e-9, 2000e-9, 100e-9, 0],
+        "dtype": "single",
+        "backend": "tmm",
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    _angles = np.array([0.1, 0.7, 1.2])
+
+    _R, _T, _E = test._compute_batched_spectrum(_angles, "p")
+    assert _R.dtype == np.float32
+    assert not test.single_precision_fallback
+    _R_ref, _T_ref, _E_ref = test._compute_batched_spectrum(
+        _angles, "p", dtype=np.complex128
+    )
+    assert np.allclose(_R, _R_ref, atol=1e-4)
+    assert np.allclose(_E, _E_ref, atol=1e-4)
+
+    # a batch of designs is checked on more than its first structure
+    _ri = np.repeat(test._refractive_index_array[np.newaxis], 20, axis=0)
+    _d = np.repeat(test.thickness_array[np.newaxis], 20, axis=0)
+    _R, _T, _E = test._compute_batched_spectrum(
+        _angles, "p", refractive_index_array=_ri, thickness_array=_d
+    )
+    assert _R.shape == (20, 3, 200)
+    assert not test.single_precision_fallback
+    _d[11, 4] = 5e-6
+    _R, _T, _E = test._compute_batched_spectrum(
+        _angles, "p", refractive_index_array=_ri, thickness_array=_d
+    )
+    assert test.single_precision_fallback
+    assert np.all(np.isfinite(_R))
+
+    test.thickness_array[4] = 5e-6
+    _R, _T, _E = test._compute_batched_spectrum(_angles, "p")
+    assert test.single_precision_fallback
+    assert np.all(np.isfinite(_R))
+
+
+def test_refractive_index_gradient():
+    """analytic gradients with respect to n and k should agree with finite differences"""
+    test_args = {
+        "wavelength_list": [400e-9, 1200e-9, 9],
+        "material_list": ["Air", "SiO2", "TiN", "Al2O3", "Air"],
+        "thickness_list": [0, 230e-9, 12e-9, 410e-9, 0],
+        "incident_angle": 40.0,
+        "gradient_type": "n",
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    _h = 1e-6
+    for _pol in ["s", "p"]:
+        for _type, _dn in [("n", _h), ("k", 1j * _h)]:
+            test.gradient_type = _type
+            _R, _T, _dR, _dT = test._compute_batched_spectrum_gradient(
+                test.incident_angle, _pol
+            )
+            for _n, _layer in enumerate(test.gradient_list):
+                test._refractive_index_array[:, _layer] += _dn
+                _Rp, _Tp, _, _ = test._compute_batched_spectrum_gradient(
+                    test.incident_angle, _pol
+                )
+                test._refractive_index_array[:, _layer] -= 2 * _dn
+                _Rm, _Tm, _, _ = test._compute_batched_spectrum_gradient(
+                    test.incident_angle, _pol
+                )
+                test._refractive_index_array[:, _layer] += _dn
+                assert np.allclose(_dR[..., _n], (_Rp - _Rm) / (2 * _h), atol=1e-6)
+                assert np.allclose(_dT[..., _n], (_Tp - _Tm) / (2 * _h), atol=1e-6)
+
+    # the attribute arrays are filled from the batched gradients
+    test.polarization = "p"
+    test.gradient_type = "k"
+    test.compute_spectrum_gradient()
+    assert np.allclose(test.reflectivity_gradient_array, _dR)
+    assert np.allclose(
+        test.emissivity_gradient_array, -test.reflectivity_gradient_array - _dT
+    )
+
+
+def test_needle_gradient():
+    """the needle derivatives should agree with inserting a very thin layer, and structure
+    edits should reuse the preallocated layer buffers"""
+    test_args = {
+        "wavelength_list": [400e-9, 1200e-9, 7],
+        "material_list": ["Air", "SiO2", "TiN", "Al2O3", "Air"],
+        "thickness_list": [0, 230e-9, 12e-9, 410e-9, 0],
+        "incident_angle": 35.0,
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    _materials = ["TiO2", "Ag"]
+    _bank = test._get_material_index_bank(_materials)
+    _fractions = np.array([0.25, 0.6])
+    _h = 1e-14
+    _R, _T, _dR, _dT = test._compute_batched_needle_gradient(
+        test.incident_angle, "p", _bank, _fractions
+    )
+
+    _n = 0
+    for _layer in range(1, 4):
+        for _f in _fractions:
+            for _m in range(len(_materials)):
+                needle = sf.spectrum_factory("Tmm", test_args)
+                _d = needle.thickness_array[_layer]
+                needle.thickness_array[_layer] = _f * _d
+                needle.insert_layer(_layer + 1, _h, _materials[_m])
+                needle._insert_layer(
+                    _layer + 2,
+                    (1 - _f) * _d,
+                    needle.material_array[_layer],
+                    needle._refractive_index_array[:, _layer],
+                )
+                _Rn, _Tn, _ = needle._compute_batched_spectrum(test.incident_angle, "p")
+                assert np.allclose((_Rn - _R) / _h, _dR[:, _n], rtol=1e-3, atol=1e3)
+                assert np.allclose((_Tn - _T) / _h, _dT[:, _n], rtol=1e-3, atol=1e3)
+                _n += 1
+
+    # repeated edits shift columns within the same buffers
+    _buffer = needle._refractive_index_buffer
+    for _ in range(3):
+        needle.insert_layer(1, 10e-9, "SiO2")
+    for _ in range(3):
+        needle.remove_layer(1)
+    assert needle._refractive_index_buffer is _buffer
+    assert needle.number_of_layers == len(needle.material_array) == 7
+
+
+def test_layer_absorption():
+    """layer absorptions should add up to 1 - R, match the field intensity integrated over an
+    absorbing layer, and give the PV current and its gradient without editing the stack"""
+    test_args = {
+        "wavelength_list": [400e-9, 1200e-9, 7],
+        "material_list": ["Air", "SiO2", "TiN", "Ag", "Air"],
+        "thickness_list": [0, 230e-9, 12e-9, 10e-9, 0],
+        "incident_angle": 35.0,
+        "polarization": "p",
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.compute_layer_absorption()
+    _A = test.layer_absorption_array
+    assert np.allclose(np.sum(_A, axis=0), 1 - test.reflectivity_array)
+    assert np.allclose(_A[-1], test.transmissivity_array)
+
+    # absorbed power density is k0 Im(eps) |E|^2 / (n0 cos(theta0))
+    _z = np.linspace(230e-9, 242e-9, 2001)
+    test.compute_field_intensity(_z)
+    _eps = test._refractive_index_array[:, 2] ** 2
+    _k0 = 2 * np.pi / test.wavelength_array
+    _absorbed = (
+        np.trapz(test.field_intensity_array, _z, axis=0)
+        * np.imag(_eps)
+        * _k0
+        / np.cos(test.incident_angle)
+    )
+    assert np.allclose(_absorbed, _A[2], rtol=1e-5)
+
+    # short circuit current from the active layer, with the structure left untouched
+    test_args = {
+        "wavelength_list": [300e-9, 800e-9, 51],
+        "material_list": ["Air", "SiO2", "TiO2", "Air"],
+        "thickness_list": [0, 100e-9, 50e-9, 0],
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.compute_pv_stpv_short_circuit_current_gradient_gradient()
+    _current = test.pv_stpv_short_circuit_current
+    _gradient = test.pv_stpv_short_circuit_current_gradient
+    assert test.number_of_layers == 4
+
+    test.insert_layer(3, 1000e-9, "2D_HOIP")
+    test.compute_layer_absorption()
+    assert np.allclose(test.layer_absorption_array[3], test.pv_stpv_active_layer_absorption_array)
+    test.remove_layer(3)
+
+    _h = 1e-11
+    for _n, _layer in enumerate(test.gradient_list):
+        test.thickness_array[_layer] += _h
+        test.compute_pv_stpv_short_circuit_current()
+        _plus = test.pv_stpv_short_circuit_current
+        test.thickness_array[_layer] -= 2 * _h
+        test.compute_pv_stpv_short_circuit_current()
+        _minus = test.pv_stpv_short_circuit_current
+        test.thickness_array[_layer] += _h
+        assert np.isclose(_gradient[_n], (_plus - _minus) / (2 * _h), rtol=1e-5)
+    assert _current > 0
+
+
+def test_compute_spectrum_both_sides():
+    """the back side spectra from the same transfer matrix should match the reversed stack"""
+    test_args = {
+        "wavelength_list": [400e-9, 2000e-9, 20],
+        "material_list": ["Air", "SiO2", "TiN", "Ag", "Air"],
+        "thickness_list": [0, 230e-9, 12e-9, 10e-9, 0],
+        "incident_angle": 35.0,
+    }
+    for _pol in ["s", "p"]:
+        test_args["polarization"] = _pol
+        test = sf.spectrum_factory("Tmm", test_args)
+        test.compute_spectrum(both_sides=True)
+        _front = np.copy(test.emissivity_array)
+        _back = [
+            np.copy(test.reflectivity_back_array),
+            np.copy(test.transmissivity_back_array),
+            np.copy(test.emissivity_back_array),
+        ]
+        test.reverse_stack()
+        test.compute_spectrum()
+        assert np.allclose(test.reflectivity_array, _back[0])
+        assert np.allclose(test.transmissivity_array, _back[1])
+        assert np.allclose(test.emissivity_array, _back[2])
+        assert not np.allclose(_front, _back[2])
+
+
+def test_scattering_matrix_backend():
+    """the scattering matrices should reproduce the transfer matrix spectra and gradients, and
+    stay finite for a thick absorbing layer where the transfer matrices overflow"""
+    test_args = {
+        "wavelength_list": [400e-9, 2000e-9, 20],
+        "material_list": ["Air", "SiO2", "TiN", "Ag", "Al2O3", "Air"],
+        "thickness_list": [0, 230e-9, 12e-9, 10e-9, 300e-9, 0],
+        "incident_angle": 35.0,
+        "gradient_list": [1, 2, 3, 4],
+    }
+    tmm = sf.spectrum_factory("Tmm", dict(test_args, backend="tmm"))
+    smatrix = sf.spectrum_factory("Tmm", dict(test_args, backend="smatrix"))
+    for test in [tmm, smatrix]:
+        test.compute_spectrum(both_sides=True)
+        test.compute_spectrum_gradient()
+    assert np.allclose(smatrix.reflectivity_array, tmm.reflectivity_array, atol=1e-12)
+    assert np.allclose(
+        smatrix.transmissivity_back_array, tmm.transmissivity_back_array, atol=1e-12
+    )
+    assert np.allclose(
+        smatrix.emissivity_gradient_array, tmm.emissivity_gradient_array, rtol=1e-8
+    )
+
+    # a 1 mm tungsten layer: exp(Im(kz) d) overflows the transfer matrices
+    test_args = {
+        "wavelength_list": [400e-9, 2000e-9, 20],
+        "material_list": ["Air", "SiO2", "W", "Air"],
+        "thickness_list": [0, 100e-9, 1e-3, 0],
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    assert test._use_scattering_matrix(test.incident_angle)
+    assert np.all(np.isfinite(test.reflectivity_array))
+    assert np.allclose(test.transmissivity_array, 0.0)
+    assert np.allclose(test.emissivity_array, 1 - test.reflectivity_array, atol=1e-12)
+
+    # the calculations that only exist with transfer matrices refuse such stacks
+    with pytest.raises(ValueError):
+        test.compute_layer_absorption()
+    test.gradient_type = "n"
+    test.gradient_list = [1]
+    with pytest.raises(ValueError):
+        test.compute_spectrum_gradient()
+    with pytest.raises(ValueError):
+        sf.spectrum_factory("Tmm", dict(test_args, backend="s-matrix"))
+
+
+def test_incoherent_substrate():
+    """an incoherent substrate should give the coherent spectra averaged over one fringe period"""
+    test_args = {
+        "wavelength_list": [500e-9, 1500e-9, 3],
+        "material_list": ["Air", "TiO2", "SiO2", "Ag", "Air"],
+        "thickness_list": [0, 80e-9, 1e-3, 5e-9, 0],
+        "coherence_list": ["c", "c", "i", "c", "c"],
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.compute_spectrum(both_sides=True)
+
+    coherent = sf.spectrum_factory("Tmm", dict(test_args, coherence_list=["c"] * 5))
+    _n = np.real(coherent._refractive_index_array[:, 2])
+    _period = coherent.wavelength_array / (2 * _n)
+    _R = np.zeros(3)
+    _T = np.zeros(3)
+    _R_back = np.zeros(3)
+    for k in range(16):
+        for j in range(3):
+            coherent.thickness_array[2] = 1e-3 + k / 16 * _period[j]
+            coherent.compute_spectrum(both_sides=True)
+            _R[j] += coherent.reflectivity_array[j] / 16
+            _T[j] += coherent.transmissivity_array[j] / 16
+            _R_back[j] += coherent.reflectivity_back_array[j] / 16
+
+    assert np.allclose(test.reflectivity_array, _R, atol=1e-10)
+    assert np.allclose(test.transmissivity_array, _T, atol=1e-10)
+    assert np.allclose(test.reflectivity_back_array, _R_back, atol=1e-10)
+    with pytest.raises(ValueError):
+        test.compute_spectrum_gradient()
+    with pytest.raises(ValueError):
+        test.compute_layer_absorption()
+    for _coherence_list in [["c", "c", "i", "c"], ["c", "c", "x", "c", "c"]]:
+        with pytest.raises(ValueError):
+            sf.spectrum_factory("Tmm", dict(test_args, coherence_list=_coherence_list))
+
+
+def test_graded_layer():
+    """a graded layer should reproduce the same profile given as explicit sublayers, and its
+    thickness gradient should be the sum of the sublayer gradients over their number"""
+    _ns = 20
+    test_args = {
+        "wavelength_list": [400e-9, 1500e-9, 20],
+        "material_list": ["Air", "SiO2", "SiO2", "Ag", "Air"],
+        "thickness_list": [0, 100e-9, 400e-9, 20e-9, 0],
+        "incident_angle": 40.0,
+        "gradient_list": [1, 2, 3],
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.set_graded_layer(
+        2, lambda z: 0.5 - 0.5 * np.cos(4 * np.pi * z), ["SiO2", "TiO2"], _ns
+    )
+    test.compute_spectrum()
+    test.compute_spectrum_gradient()
+
+    sliced_args = {
+        "wavelength_list": [400e-9, 1500e-9, 20],
+        "material_list": ["Air", "SiO2"] + ["SiO2"] * _ns + ["Ag", "Air"],
+        "thickness_list": [0, 100e-9] + [400e-9 / _ns] * _ns + [20e-9, 0],
+        "incident_angle": 40.0,
+        "gradient_list": list(range(1, _ns + 3)),
+    }
+    sliced = sf.spectrum_factory("Tmm", sliced_args)
+    sliced._refractive_index_array[:, 2 : 2 + _ns] = test.graded_layers[2]["index"]
+    sliced.compute_spectrum()
+    sliced.compute_spectrum_gradient()
+
+    assert np.allclose(test.reflectivity_array, sliced.reflectivity_array, atol=1e-12)
+    assert np.allclose(test.emissivity_array, sliced.emissivity_array, atol=1e-12)
+    _gradient = sliced.emissivity_gradient_array
+    _expected = np.stack(
+        (
+            _gradient[:, 0],
+            np.sum(_gradient[:, 1 : 1 + _ns], axis=1) / _ns,
+            _gradient[:, -1],
+        ),
+        axis=1,
+    )
+    assert np.allclose(test.emissivity_gradient_array, _expected, rtol=1e-8)
+
+    # the scattering matrices merge the graded layer into a single interface
+    test.backend = "smatrix"
+    test.compute_spectrum()
+    assert np.allclose(test.reflectivity_array, sliced.reflectivity_array, atol=1e-12)
+
+    # the field-based calculations do not resolve the profile
+    with pytest.raises(ValueError):
+        test.compute_layer_absorption()
+
+    # the star products over the slices stay finite for a thick absorbing graded layer
+    thick = sf.spectrum_factory(
+        "Tmm",
+        {
+            "wavelength_list": [400e-9, 1500e-9, 20],
+            "material_list": ["Air", "SiO2", "W", "Air"],
+            "thickness_list": [0, 100e-9, 1e-3, 0],
+        },
+    )
+    thick.set_graded_layer(2, lambda z: z, ["W", "TiN"], _ns)
+    thick.compute_spectrum()
+    assert np.all(np.isfinite(thick.reflectivity_array))
+    assert np.allclose(thick.transmissivity_array, 0.0)
+
+
+def test_effective_medium():
+    """effective medium layers should reduce to their components at fill fractions 0 and 1,
+    and their fill fraction gradients should agree with finite differences"""
+    test_args = {
+        "wavelength_list": [400e-9, 2000e-9, 20],
+        "material_list": [
+            "Air",
+            "bruggeman:SiO2:Air:0.3",
+            "maxwell_garnett:TiO2:Ag:0.05",
+            "Air",
+        ],
+        "thickness_list": [0, 200e-9, 150e-9, 0],
+        "gradient_list": [1, 2],
+        "gradient_type": "fill_fraction",
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    _bank = test._get_material_index_bank(["SiO2", "Air", "TiO2", "Ag"])
+    for _material, _host, _inclusion in [
+        ("bruggeman:SiO2:Air:0.3", 0, 1),
+        ("maxwell_garnett:TiO2:Ag:0.05", 2, 3),
+    ]:
+        _index, _ = test._compute_effective_medium_layer(_material, np.array([0, 1]))
+        assert np.allclose(_index[0], _bank[_host])
+        assert np.allclose(_index[1], _bank[_inclusion])
+
+    test.compute_spectrum_gradient()
+    _gradient = np.copy(test.emissivity_gradient_array)
+    for _n, _layer in enumerate([1, 2]):
+        _f = test.get_fill_fraction(_layer)
+        test.set_fill_fraction(_layer, _f + 1e-6)
+        test.compute_spectrum()
+        _plus = np.copy(test.emissivity_array)
+        test.set_fill_fraction(_layer, _f - 1e-6)
+        test.compute_spectrum()
+        test.set_fill_fraction(_layer, _f)
+        _expected = (_plus - test.emissivity_array) / 2e-6
+        assert np.allclose(_gradient[:, _n], _expected, atol=1e-6)
+
+    # a sweep at the current fill fraction reproduces the spectrum
+    test.compute_spectrum()
+    test.compute_fill_fraction_sweep(1, [0.1, 0.3])
+    assert np.allclose(test.emissivity_sweep_array[1], test.emissivity_array)
+
+    # fill fraction gradients need effective medium layers, and off-grid wavelengths are refused
+    test.gradient_list = [1, 3]
+    with pytest.raises(ValueError, match="effective medium"):
+        test.compute_spectrum_gradient()
+    with pytest.raises(ValueError):
+        test._get_wavelength_indices(test.wavelength_array[:3] * 1.001)
+
+
+def test_dispersion_material():
+    """a registered dispersion material is used like a tabulated material"""
+    _sellmeier = {"B": [0.6961663, 0.4079426, 0.8974794], "C": [0.0046791, 0.0135121, 97.934003]}
+    test_args = {
+        "wavelength_list": [400e-9, 1600e-9, 50],
+        "material_list": ["Air", "silica", "Air"],
+        "thickness_list": [0, 500e-9, 0],
+        "dispersion_materials": {"Silica": ("sellmeier", _sellmeier)},
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    _expected = test._compute_dispersion_index(test.wavelength_array, "sellmeier", _sellmeier)
+    assert np.allclose(test._refractive_index_array[:, 1], _expected)
+    assert np.allclose(test.emissivity_array, 0.0)
+
+    # re-registering a name replaces the material, also in the effective-medium index bank
+    test.add_dispersion_material("silica", "cauchy", {"A": 2.0, "B": 0.0})
+    test.material_array[1] = "maxwell_garnett:silica:air:0.0"
+    test.set_refractive_index_array()
+    assert np.allclose(test._refractive_index_array[:, 1], 2.0)
+    with pytest.raises(ValueError):
+        test.add_dispersion_material("bad", "debye", {})
@@ -0,0 +1,103 @@
+"""
+Unit and regression test for the wpspec package.
+"""
+
+# Import package, test suite, and other packages as needed
+import wptherml
+import numpy as np
+import pytest
+import sys
+
+sf = wptherml.SpectrumFactory()
+
+
+def test_trapz_weights():
+    """the trapz weights should reproduce np.trapz on non-uniform grids and slices"""
+    x = np.sort(np.random.rand(50)) * 1e-6
+    y = np.random.rand(50)
+    plan = wptherml.FomPlan(x)
+    assert np.isclose(np.dot(plan._compute_trapz_weights(x), y), np.trapz(y, x))
+    assert np.isclose(
+        np.dot(plan._compute_trapz_weights(x, 7, 31), y), np.trapz(y[7:31], x[7:31])
+    )
+
+
+def test_fom_plan_stpv():
+    """figures of merit from the FomPlan should agree with the Therml methods"""
+    test_args = {
+        "wavelength_list": [400e-9, 7000e-9, 1000],
+        "material_list": ["Air", "SiO2", "TiN", "Air"],
+        "thickness_list": [0, 20e-9, 400e-9, 0],
+        "temperature": 1700,
+        "therml": True,
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    # values computed by the Therml methods in the constructor
+    _expected_power_density = test.power_density
+    _expected_stpv_power_density = test.stpv_power_density
+    _expected_stpv_spectral_efficiency = test.stpv_spectral_efficiency
+    _expected_luminous_efficiency = test.luminous_efficiency
+
+    test.compute_stpv()
+    assert np.isclose(test.power_density, _expected_power_density, 1e-10)
+    assert np.isclose(test.stpv_power_density, _expected_stpv_power_density, 1e-10)
+    assert np.isclose(
+        test.stpv_spectral_efficiency, _expected_stpv_spectral_efficiency, 1e-10
+    )
+
+    plan = test._get_fom_plan()
+    _luminous_efficiency = plan.evaluate(
+        "luminous_power_density", test.emissivity_array
+    ) / plan.evaluate("power_density", test.emissivity_array)
+    assert np.isclose(_luminous_efficiency, _expected_luminous_efficiency, 1e-10)
+
+    # the plan is only rebuilt when the temperature or grid changes
+    assert test._get_fom_plan() is plan
+    test.temperature = 1800
+    assert test._get_fom_plan() is not plan
+    plan = test._get_fom_plan()
+    test.set_wavelength_array(np.linspace(400e-9, 7000e-9, 500))
+    assert test._get_fom_plan() is not plan
+
+    # gradient is a matrix-vector product with the same weights
+    test.compute_stpv_gradient()
+    _expected_gradient = np.pi * np.trapz(
+        test.thermal_emission_gradient_array, test.wavelength_array, axis=0
+    )
+    assert np.allclose(test.power_density_gradient, _expected_gradient, 1e-10)
+
+
+def test_fom_support():
+    """restricting the optics to the support of a figure of merit should not change it"""
+    test_args = {
+        "wavelength_list": [400e-9, 7000e-9, 500],
+        "material_list": ["Air", "SiO2", "TiN", "Air"],
+        "thickness_list": [0, 200e-9, 400e-9, 0],
+        "temperature": 1700,
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    _support = test._get_fom_support("pv_stpv_splitting_power")
+    assert np.all(test.wavelength_array[_support] >= 2.99e-6)
+    assert np.all(test.wavelength_array[_support] <= 3.51e-6)
+
+    test.compute_spectrum()
+    _emissivity = np.copy(test.emissivity_array)
+    test.compute_pv_stpv_splitting_power()
+    # the public spectra are not clobbered outside the support
+    assert np.allclose(test.emissivity_array, _emissivity)
+    test.reverse_stack()
+    test.compute_spectrum()
+    _expected = test._get_fom_plan().evaluate(
+        "pv_stpv_splitting_power", test.emissivity_array
+    )
+    assert np.allclose(
+        test._pv_stpv_back_emissivity_array[_support], test.emissivity_array[_support]
+    )
+    test.reverse_stack()
+    assert np.isclose(test.pv_stpv_splitting_power, _expected, 1e-12)
+
+    # the union of supports covers both windows
+    _union = test._get_fom_support("pv_stpv_splitting_power", "stpv_power_density")
+    assert len(_union) > len(_support)
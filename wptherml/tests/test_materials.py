@@ -763,3 +763,49 @@ def test_read_atmospheric_transmissivity():
 
     # test to see if the expected value is close to the read value
     assert np.isclose(_atmospheric_transmissivity[1], _expected_value, 1e-3)
+
+
+def test_dispersion_models():
+    """closed-form dispersion models and a Drude-Lorentz fit of the Ag data"""
+    _wl = np.array([500e-9, 1000e-9, 1550e-9])
+
+    # fused silica (Malitson)
+    _n = material_test._compute_dispersion_index(
+        _wl,
+        "sellmeier",
+        {"B": [0.6961663, 0.4079426, 0.8974794], "C": [0.0046791, 0.0135121, 97.934003]},
+    )
+    assert np.allclose(_n, [1.4623, 1.4504, 1.4440], atol=1e-4)
+
+    _n = material_test._compute_dispersion_index(
+        _wl, "cauchy", {"A": 1.5, "B": 0.01, "C": 0.0}
+    )
+    assert np.allclose(_n, 1.5 + 0.01 / (_wl * 1e6) ** 2)
+
+    # a Lorentz model with only a Drude term is the Drude model
+    _drude = {"eps_inf": 1.0, "plasma_energy": 9.0, "damping": 0.05}
+    _E = 1239.841984e-9 / _wl
+    _eps = 1.0 - 81.0 / (_E ** 2 + 0.05j * _E)
+    assert np.allclose(
+        material_test._compute_dispersion_index(_wl, "drude", _drude) ** 2, _eps
+    )
+    assert np.allclose(
+        material_test._compute_dispersion_index(_wl, "lorentz", _drude) ** 2, _eps
+    )
+
+    with pytest.raises(ValueError):
+        material_test._compute_dispersion_index(_wl, "debye", {})
+
+    for _number_of_oscillators in [2, 4]:
+        _parameters, _error = material_test.fit_dispersion_model(
+            "Ag_JC.txt", _number_of_oscillators
+        )
+        assert "plasma_energy" in _parameters
+        assert _error < 0.3
+
+        # beyond the data (188 nm - 1.94 um) silver stays a smooth, increasingly lossy metal
+        _n = material_test._compute_dispersion_index(
+            np.linspace(2e-6, 20e-6, 200), "lorentz", _parameters
+        )
+        assert np.all(np.diff(np.imag(_n)) > 0)
+        assert np.all(np.imag(_n) > 10 * np.real(_n))
@@ -0,0 +1,140 @@
+"""
+Unit and regression test for the wpspec package.
+"""
+
+# Import package, test suite, and other packages as needed
+import wptherml
+import numpy as np
+import pytest
+import sys
+
+sf = wptherml.SpectrumFactory()
+
+# selective mirror transmitting 300 - 700 nm and reflecting 1000 - 1818 nm
+selective_mirror_args = {
+    "wavelength_list": [300e-9, 2000e-9, 100],
+    "transmissive_window_nm": [300, 700],
+    "reflective_window_wn": [5500, 10000],
+}
+
+
+def test_fused_fom_and_gradient():
+    """the fused evaluation should agree with compute_stpv_gradient and be cached"""
+    test_args = {
+        "wavelength_list": [400e-9, 7000e-9, 200],
+        "material_list": ["Air", "SiO2", "TiN", "Air"],
+        "thickness_list": [0, 200e-9, 400e-9, 0],
+        "temperature": 1700,
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    opt = wptherml.Optimizer(test, "stpv_spectral_efficiency")
+
+    _x = np.array([250.0, 300.0])
+    _value, _gradient = opt.compute_fom_and_gradient(_x)
+    test.compute_stpv_gradient()
+    assert np.isclose(_value, test.stpv_spectral_efficiency, 1e-10)
+    assert np.allclose(_gradient, test.stpv_spectral_efficiency_gradient * 1e-9)
+
+    opt.compute_fom_and_gradient(_x)
+    assert opt.number_of_evaluations == 1
+
+
+def test_optimize_bounds():
+    """L-BFGS-B and trust-constr should improve the figure of merit within the bounds"""
+    test_args = dict(
+        selective_mirror_args,
+        material_list=["Air", "TiO2", "SiO2", "TiO2", "Air"],
+        thickness_list=[0, 50e-9, 120e-9, 50e-9, 0],
+        random_thickness_bounds_nm=[10, 300],
+    )
+    for _method in ["L-BFGS-B", "trust-constr"]:
+        test = sf.spectrum_factory("Tmm", test_args)
+        test.compute_selective_mirror_fom()
+        assert test.reflection_efficiency > 0
+        opt = wptherml.Optimizer(test, "selective_mirror_fom", method=_method)
+        _x0 = np.array([50.0, 120.0, 50.0])
+        _initial, _gradient = opt.compute_fom_and_gradient(_x0)
+
+        # the gradient includes the quotient rule of the reflection efficiency
+        _dx = 1e-3 * np.eye(3)
+        _numeric = [
+            (
+                opt.compute_fom_and_gradient(_x0 + _dx[i])[0]
+                - opt.compute_fom_and_gradient(_x0 - _dx[i])[0]
+            )
+            / 2e-3
+            for i in range(3)
+        ]
+        assert np.allclose(_gradient, _numeric, rtol=1e-5)
+        result = opt.optimize(max_iterations=20)
+        assert result.fun > _initial
+        assert np.all(result.x >= 10) and np.all(result.x <= 300)
+        assert np.allclose(test.thickness_array[1:4], result.x * 1e-9)
+
+
+def test_evolutionary_optimizer():
+    """the batched population figure of merit should agree with the driver, and a seeded
+    run should be reproducible and never get worse"""
+    test_args = dict(
+        selective_mirror_args,
+        material_list=["Air", "TiO2", "SiO2", "TiO2", "Air"],
+        thickness_list=[0, 50e-9, 120e-9, 50e-9, 0],
+        possible_random_materials=["SiO2", "Al2O3", "TiO2"],
+        random_thickness_bounds_nm=[10, 300],
+    )
+    test = sf.spectrum_factory("Tmm", test_args)
+    opt = wptherml.EvolutionaryOptimizer(
+        test, "selective_mirror_fom", population_size=8, seed=3
+    )
+    _best = opt.optimize(number_of_generations=5)
+    assert np.all(np.diff(opt.fom_history) >= 0)
+    assert np.isclose(_best, np.max(opt.fom_population))
+
+    # the driver is left at the best individual
+    assert test.material_array[1:4] == [
+        test.possible_materials[_code] for _code in opt.best_materials_code
+    ]
+    test.set_refractive_index_array()
+    test.compute_spectrum()
+    test.compute_selective_mirror_fom()
+    assert test.reflection_efficiency > 0
+    assert np.isclose(test.selective_mirror_fom, _best, 1e-10)
+
+    # same seed, same run
+    test = sf.spectrum_factory("Tmm", test_args)
+    opt = wptherml.EvolutionaryOptimizer(
+        test, "selective_mirror_fom", population_size=8, seed=3
+    )
+    assert np.isclose(opt.optimize(number_of_generations=5), _best, 1e-12)
+
+    # three distinct donors besides the individual are needed
+    with pytest.raises(ValueError):
+        wptherml.EvolutionaryOptimizer(test, "selective_mirror_fom", population_size=3)
+
+
+def test_needle_optimizer():
+    """needle insertion should improve the figure of merit of a two layer stack"""
+    test_args = dict(
+        selective_mirror_args,
+        material_list=["Air", "TiO2", "SiO2", "Air"],
+        thickness_list=[0, 80e-9, 120e-9, 0],
+        random_thickness_bounds_nm=[1, 400],
+    )
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.compute_selective_mirror_fom()
+    _reflection_efficiency = test.reflection_efficiency
+    assert _reflection_efficiency > 0
+    opt = wptherml.NeedleOptimizer(
+        test, "selective_mirror_fom", needle_materials=["SiO2", "TiO2"]
+    )
+    _fom = opt.optimize_needles(number_of_needles=2)
+    assert len(opt.fom_history) == 3
+    assert opt.fom_history[-1] > opt.fom_history[0]
+    assert test.number_of_layers > 4
+
+    # the edited structure is consistent with its material list
+    test.set_refractive_index_array()
+    test.compute_spectrum()
+    test.compute_selective_mirror_fom()
+    assert np.isclose(test.selective_mirror_fom, _fom, 1e-10)
+    assert test.reflection_efficiency > _reflection_efficiency
@@ -242,3 +242,340 @@ def test_compute_cooling_gradient():
         _numeric_atmospheric_warming_power_gradient,
         1e-2,
     )
+
+
+def test_compute_stpv_temperature_sweep():
+    """the temperature sweep should reproduce compute_stpv at each temperature"""
+    test_args = {
+        "wavelength_list": [400e-9, 7000e-9, 500],
+        "material_list": ["Air", "SiO2", "TiN", "Air"],
+        "thickness_list": [0, 20e-9, 400e-9, 0],
+        "temperature": 1500,
+        "therml": True,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    _temperatures = np.array([800.0, 1500.0, 2200.0])
+    test.compute_stpv_temperature_sweep(_temperatures)
+
+    # blackbody spectra broadcast over temperature
+    _bb = test._compute_blackbody_spectrum(test.wavelength_array, _temperatures)
+    assert _bb.shape == (3, len(test.wavelength_array))
+    assert np.allclose(
+        _bb[1], test._compute_blackbody_spectrum(test.wavelength_array, 1500.0)
+    )
+
+    for i in range(len(_temperatures)):
+        test.temperature = _temperatures[i]
+        test.compute_stpv()
+        assert np.isclose(test.power_density_sweep[i], test.power_density)
+        assert np.isclose(test.stpv_power_density_sweep[i], test.stpv_power_density)
+        assert np.isclose(
+            test.stpv_spectral_efficiency_sweep[i], test.stpv_spectral_efficiency
+        )
+
+
+def test_compute_cooling_temperature_sweep():
+    """the cooling sweep should reproduce compute_cooling at each temperature"""
+    test_args = {
+        "wavelength_list": [300e-9, 30000e-9, 1000],
+        "material_list": ["Air", "SiO2", "Air"],
+        "thickness_list": [0, 230e-9, 0],
+        "temperature": 300,
+        "cooling": True,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    _temperatures = np.array([270.0, 300.0, 330.0])
+    test.compute_cooling_temperature_sweep(_temperatures)
+
+    test.temperature = 330.0
+    test.compute_cooling()
+    assert np.isclose(test.radiative_cooling_power_sweep[2], test.radiative_cooling_power)
+    assert np.isclose(test.net_cooling_power_sweep[2], test.net_cooling_power)
+
+
+def test_compute_self_consistent_temperature():
+    """the self-consistent temperature should balance emitted and absorbed power
+    and the analytic dB/dT should agree with finite differences"""
+    test_args = {
+        "wavelength_list": [300e-9, 20000e-9, 2000],
+        "material_list": ["Air", "W", "Air"],
+        "thickness_list": [0, 100e-9, 0],
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    _wl = test.wavelength_array
+    _dT = 1e-3
+    _numeric_dbb = (
+        test._compute_blackbody_spectrum(_wl, 600 + _dT)
+        - test._compute_blackbody_spectrum(_wl, 600 - _dT)
+    ) / (2 * _dT)
+    _analytic_dbb = test._compute_blackbody_spectrum_temperature_derivative(_wl, 600)
+    assert np.allclose(_analytic_dbb, _numeric_dbb, rtol=1e-5, atol=1e-8 * _numeric_dbb.max())
+
+    test.compute_self_consistent_temperature(tolerance=1e-8)
+    assert test.temperature > 300
+    assert test.self_consistent_temperature_iterations < 15
+
+    _bb = test._compute_blackbody_spectrum(_wl, test.temperature)
+    _emitted = (
+        np.pi
+        / 2
+        * np.trapz(
+            _bb
+            * (test._pv_stpv_front_emissivity_array + test._pv_stpv_back_emissivity_array),
+            _wl,
+        )
+    )
+    _absorbed = np.trapz(test._solar_spectrum * test._pv_stpv_front_emissivity_array, _wl)
+    assert np.isclose(_emitted, _absorbed, 1e-8)
+
+
+def test_balance_temperature_failures():
+    """the balance solver should not return unconverged temperatures silently"""
+    test_args = {
+        "wavelength_list": [300e-9, 20000e-9, 500],
+        "material_list": ["Air", "SiO2", "Air"],
+        "thickness_list": [0, 100e-9, 0],
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+    _wl = test.wavelength_array
+
+    # a non-emitting structure has no balance temperature
+    with pytest.raises(RuntimeError):
+        test._compute_balance_temperature(_wl, np.zeros_like(_wl), 1.0)
+
+    # too few iterations
+    _w = 1e-3 * test._compute_trapz_weights(_wl)
+    with pytest.raises(RuntimeError):
+        test._compute_balance_temperature(_wl, _w, 1e4, max_iterations=1)
+
+    # already balanced at the lower temperature
+    with pytest.warns(UserWarning):
+        _T, _ = test._compute_balance_temperature(_wl, _w, 0.0)
+    assert _T == 300.0
+
+
+def test_compute_equilibrium_temperature():
+    """at the equilibrium temperature the net cooling power should balance the
+    non-radiative heat loss, for single and batched solves"""
+    test_args = {
+        "wavelength_list": [300e-9, 30000e-9, 1000],
+        "material_list": ["Air", "SiO2", "Air"],
+        "thickness_list": [0, 230e-9, 0],
+        "temperature": 300,
+        "cooling": True,
+        "nonradiative coefficient": 5.0,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    test.compute_equilibrium_temperature(ambient_temperature=300.0, tolerance=1e-8)
+    _T_eq = test.equilibrium_temperature
+    assert test.equilibrium_temperature_iterations < 10
+
+    test.temperature = _T_eq
+    test.compute_cooling()
+    assert np.isclose(test.net_cooling_power, 5.0 * (300.0 - _T_eq), atol=1e-6)
+
+    # batch of two designs and three ambient temperatures
+    _ambient = np.array([290.0, 300.0, 310.0])
+    _eps_s = np.array([test.emissivity_array_s, test.emissivity_array_s])
+    _eps_p = np.array([test.emissivity_array_p, test.emissivity_array_p])
+    test.compute_equilibrium_temperature(
+        ambient_temperature=_ambient,
+        emissivity_array_s=_eps_s,
+        emissivity_array_p=_eps_p,
+        tolerance=1e-8,
+    )
+    assert test.equilibrium_temperature.shape == (2, 3)
+    assert np.isclose(test.equilibrium_temperature[1, 1], _T_eq, 1e-8)
+
+    # a per-call solar angle does not change the driver
+    _solar_angle = test.solar_angle
+    test.compute_equilibrium_temperature(ambient_temperature=300.0, solar_angle=60.0)
+    assert test.solar_angle == _solar_angle
+
+
+def test_compute_cooling_time_series():
+    """each step of the time series should agree with compute_cooling at the
+    same sun position and atmospheric temperature"""
+    test_args = {
+        "wavelength_list": [300e-9, 30000e-9, 1000],
+        "material_list": ["Air", "SiO2", "Ag", "Air"],
+        "thickness_list": [0, 230e-9, 200e-9, 0],
+        "temperature": 300,
+        "cooling": True,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    _solar_angles = np.array([30.0, 60.0, 95.0])
+    _T_atm = np.array([295.0, 300.0, 290.0])
+    _tau = np.array([test._atmospheric_transmissivity, test._atmospheric_transmissivity ** 2])
+    test.compute_cooling_time_series(
+        _solar_angles, _T_atm, atmospheric_transmissivity_profiles=_tau, profile_indices=[0, 0, 1]
+    )
+    assert test.solar_warming_power_time_series[2] == 0.0
+
+    for i in range(2):
+        test.solar_angle = _solar_angles[i] * np.pi / 180
+        test.atmospheric_temperature = _T_atm[i]
+        test.compute_cooling()
+        assert np.isclose(test.net_cooling_power, test.net_cooling_power_time_series[i])
+        assert np.isclose(
+            test.solar_warming_power, test.solar_warming_power_time_series[i]
+        )
+
+
+def test_atmospheric_emissivity_table():
+    """the cached atmospheric emissivity table should reproduce the per-angle
+    expression and be rebuilt when the angular quadrature changes"""
+    test_args = {
+        "wavelength_list": [300e-9, 30000e-9, 500],
+        "material_list": ["Air", "SiO2", "Air"],
+        "thickness_list": [0, 230e-9, 0],
+        "cooling": True,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    _table, _w_theta = test._get_atmospheric_emissivity_table(
+        test._atmospheric_transmissivity, test.theta_vals, test.theta_weights
+    )
+    assert _table.shape == (test.number_of_angles, test.number_of_wavelengths)
+    _i = 3
+    _expected = 1 - test._atmospheric_transmissivity ** (1 / np.cos(test.theta_vals[_i]))
+    assert np.allclose(_table[_i], _expected)
+
+    # a second call returns the cached table
+    _table_2, _ = test._get_atmospheric_emissivity_table(
+        test._atmospheric_transmissivity, test.theta_vals, test.theta_weights
+    )
+    assert _table_2 is _table
+
+    test.number_of_angles = 9
+    test.compute_explicit_angle_spectrum()
+    _table_3, _ = test._get_atmospheric_emissivity_table(
+        test._atmospheric_transmissivity, test.theta_vals, test.theta_weights
+    )
+    assert _table_3.shape == (9, test.number_of_wavelengths)
+
+
+def test_compute_adaptive_angle_spectrum():
+    """the adaptive Clenshaw-Curtis grid should reproduce the hemispherical
+    powers of a fine Gauss-Legendre grid to within the requested tolerance"""
+    test_args = {
+        "wavelength_list": [300e-9, 30000e-9, 500],
+        "material_list": ["Air", "SiO2", "Ag", "Air"],
+        "thickness_list": [0, 2300e-9, 200e-9, 0],
+        "number_of_angles": 40,
+        "cooling": True,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+    _P_rad = test.radiative_cooling_power
+    _P_atm = test.atmospheric_warming_power
+
+    # both rules integrate 2 pi sin cos exactly
+    for _rule, _n in [("gauss-legendre", 7), ("clenshaw-curtis", 15)]:
+        _theta, _weights = test._get_angular_quadrature(_n, rule=_rule)
+        assert np.isclose(np.sum(test._compute_angle_weights(_theta, _weights)), np.pi)
+    assert test._get_angular_quadrature(15, rule="clenshaw-curtis")[0] is _theta
+
+    test.angle_tolerance = 1e-5
+    test.compute_cooling()
+    assert test.angular_quadrature_error <= 1e-5 * test.radiative_cooling_power
+    assert test.adaptive_number_of_angles < 40
+    assert np.isclose(test.radiative_cooling_power, _P_rad, 1e-5)
+    assert np.isclose(test.atmospheric_warming_power, _P_atm, 1e-5)
+
+    # the user's grid is restored once adaptivity is switched off
+    assert test.number_of_angles == 40
+    test.angle_tolerance = None
+    test.compute_cooling()
+    assert len(test.theta_vals) == 40
+    assert np.isclose(test.radiative_cooling_power, _P_rad, 1e-12)
+
+
+def test_compute_cooling_gradient_chunked(tmp_path):
+    """accumulating the cooling gradients over wavelength chunks should agree with
+    the gradients from the full spectral Jacobians"""
+    test_args = {
+        "wavelength_list": [300e-9, 30000e-9, 100],
+        "material_list": ["Air", "SiO2", "HfO2", "Ag", "Air"],
+        "thickness_list": [0, 230e-9, 485e-9, 200e-9, 0],
+        "cooling": True,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    test.compute_cooling_gradient()
+    _expected_rad = np.copy(test.radiative_cooling_power_gradient)
+    _expected_atm = np.copy(test.atmospheric_warming_power_gradient)
+    _expected_sun = np.copy(test.solar_warming_power_gradient)
+    _expected_emissivity_gradient = np.copy(test.emissivity_gradient_array_p)
+
+    test.compute_cooling_gradient(
+        chunk_size=17, store_gradient_arrays=True, memmap_directory=str(tmp_path)
+    )
+    assert isinstance(test.emissivity_gradient_array_p, np.memmap)
+    # agreement to round-off relative to the largest entries
+    def _close(a, b):
+        return np.allclose(a, b, rtol=1e-6, atol=1e-10 * np.max(np.abs(b)))
+
+    assert _close(test.emissivity_gradient_array_p, _expected_emissivity_gradient)
+    assert _close(test.radiative_cooling_power_gradient, _expected_rad)
+    assert _close(test.atmospheric_warming_power_gradient, _expected_atm)
+    assert _close(test.solar_warming_power_gradient, _expected_sun)
+
+    # by default only the gradients of the figures of merit are kept
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.compute_cooling_gradient(chunk_size=17)
+    assert _close(test.radiative_cooling_power_gradient, _expected_rad)
+    for _name in ("reflectivity", "transmissivity", "emissivity"):
+        for _pol in ("s", "p"):
+            assert not hasattr(test, _name + "_gradient_array_" + _pol)
+
+    test.gradient_method = "adjoint"
+    with pytest.raises(ValueError):
+        test.compute_cooling_gradient(chunk_size=17, store_gradient_arrays=True)
+    with pytest.raises(ValueError):
+        test.compute_cooling_gradient(memmap_directory=str(tmp_path))
+
+
+def test_adjoint_gradients():
+    """vector-Jacobian product gradients should agree with the gradients
+    integrated from the spectral Jacobians"""
+    test_args = {
+        "wavelength_list": [300e-9, 30000e-9, 100],
+        "material_list": ["Air", "SiO2", "HfO2", "Ag", "Air"],
+        "thickness_list": [0, 230e-9, 485e-9, 200e-9, 0],
+        "temperature": 1500,
+        "cooling": True,
+    }
+    sf = wptherml.SpectrumFactory()
+    test = sf.spectrum_factory("Tmm", test_args)
+
+    def _close(a, b):
+        return np.allclose(a, b, rtol=1e-6, atol=1e-10 * np.max(np.abs(b)))
+
+    test.compute_cooling_gradient()
+    _expected_cooling = np.copy(test.net_cooling_power_gradient)
+    test.incident_angle = 0.0
+    test.compute_spectrum()
+    test.compute_stpv_gradient()
+    _expected_stpv = np.copy(test.stpv_spectral_efficiency_gradient)
+
+    test.gradient_method = "adjoint"
+    test.gradient_chunk_size = 33
+    test.compute_cooling_gradient()
+    assert _close(test.net_cooling_power_gradient, _expected_cooling)
+    test.compute_spectrum()
+    test.compute_stpv_gradient()
+    assert _close(test.stpv_spectral_efficiency_gradient, _expected_stpv)
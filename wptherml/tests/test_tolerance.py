@@ -0,0 +1,59 @@
+"""
+Unit and regression test for the wpspec package.
+"""
+
+# Import package, test suite, and other packages as needed
+import wptherml
+import numpy as np
+import pytest
+import sys
+
+sf = wptherml.SpectrumFactory()
+
+
+def test_tolerance_analysis():
+    """the Monte-Carlo spread of the figure of merit should agree with the first-order
+    estimate for small errors, and the nominal figure of merit with the Therml methods"""
+    test_args = {
+        "wavelength_list": [400e-9, 7000e-9, 200],
+        "material_list": ["Air", "SiO2", "TiN", "Air"],
+        "thickness_list": [0, 200e-9, 400e-9, 0],
+        "temperature": 1700,
+    }
+    test = sf.spectrum_factory("Tmm", test_args)
+    test.compute_stpv()
+
+    tol = wptherml.ToleranceAnalysis(
+        test,
+        "stpv_spectral_efficiency",
+        thickness_sigma_nm=2.0,
+        index_sigma=0.01,
+        seed=7,
+    )
+    tol.compute_first_order_variance()
+    tol.compute_tolerance(number_of_samples=1000, batch_size=300)
+    assert np.isclose(tol.fom_nominal, test.stpv_spectral_efficiency, 1e-10)
+    assert np.isclose(tol.fom_std, tol.first_order_fom_std, rtol=0.15)
+    assert np.sum(tol.fom_histogram) == 1000
+    assert tol.emissivity_percentiles.shape == (3, 200)
+    assert np.all(np.diff(tol.emissivity_percentiles, axis=0) >= 0)
+    # the driver is left as it was
+    assert test.gradient_type == "thickness"
+
+    # the same seed draws the same samples
+    again = wptherml.ToleranceAnalysis(
+        test,
+        "stpv_spectral_efficiency",
+        thickness_sigma_nm=2.0,
+        index_sigma=0.01,
+        seed=7,
+    )
+    again.compute_tolerance(number_of_samples=1000, batch_size=500)
+    assert np.allclose(again.fom_samples, tol.fom_samples)
+
+    # the estimate does not depend on the gradient_type the driver starts from
+    _expected_std = tol.first_order_fom_std
+    test.gradient_type = "n"
+    tol.compute_first_order_variance()
+    assert np.isclose(tol.first_order_fom_std, _expected_std, 1e-10)
+    assert test.gradient_type == "n"
@@ -1,4 +1,5 @@
 import numpy as np
+import warnings
 from scipy.interpolate import UnivariateSpline
 
 
@@ -19,6 +20,9 @@ class Therml:
     self.solar_angle : float
         angle of the incident solar spectrum in radians
 
+    self.nonradiative_coefficient : float
+        non-radiative heat loss coefficient in W / m^2 / K used in equilibrium temperature balances
+
     self.blackbody_spectrum : numpy array of floats
         Planck's blackbody spectrum for a given temperature
 
@@ -96,6 +100,12 @@ class Therml:
         else:
             self.solar_angle = 30 * np.pi / 180
 
+        if "nonradiative coefficient" in args:
+            # non-radiative (conductive + convective) heat loss coefficient in W / m^2 / K
+            self.nonradiative_coefficient = args["nonradiative coefficient"]
+        else:
+            self.nonradiative_coefficient = 0.0
+
     def _compute_therml_spectrum(self, wavelength_array, emissivity_array):
         """method to compute thermal emission spectrum of a structure
 
@@ -168,7 +178,57 @@ class Therml:
                 self.blackbody_spectrum * emissivity_gradient_array[:, i]
             )
 
+    def _compute_trapz_weights(self, wavelength_array, start_idx=0, stop_idx=None):
+        """computes the weights w such that w @ y = np.trapz(y[start_idx:stop_idx], x[start_idx:stop_idx])
+
+        Arguments
+        ---------
+        wavelength_array : numpy array of floats
+            the (possibly non-uniform) grid of abscissae
+
+        start_idx : int
+            the first index of the slice that is integrated
+
+        stop_idx : int
+            one past the last index of the slice that is integrated (default is the whole array)
+
+        Returns
+        -------
+        _w : numpy array of floats
+            the trapezoidal quadrature weights, zero outside of the slice
+        """
+        _w = np.zeros_like(wavelength_array, dtype=float)
+        _x = wavelength_array[start_idx:stop_idx]
+        if len(_x) < 2:
+            return _w
+        _dx = 0.5 * np.diff(_x)
+        _ws = np.zeros(len(_x))
+        _ws[:-1] += _dx
+        _ws[1:] += _dx
+        _w[start_idx : start_idx + len(_x)] = _ws
+        return _w
+
     def _compute_blackbody_spectrum(self, wavelength_array, T):
+        """method to compute Planck's blackbody spectrum
+
+        Arguments
+        ---------
+        wavelength_array : numpy array of floats
+            the array of wavelengths in meters
+
+        T : float or numpy array of floats
+            the temperature(s) in Kelvin; an array of nT temperatures gives
+            the spectra for all temperatures in one broadcast
+
+        Returns
+        -------
+        _bb_spectrum : numpy array of floats
+            number_of_wavelengths array for scalar T, or nT x number_of_wavelengths array for array T
+
+        References
+        ----------
+        Eq. (13) of https://github.com/FoleyLab/wptherml/blob/master/docs/Equations.pdf
+        """
         # speed of light in SI
         c = 299792458
         # plancks constant in SI
@@ -176,12 +236,221 @@ class Therml:
         # boltzmanns constant in SI
         kb = 1.38064852e-23
 
+        # add a trailing wavelength axis to an array of temperatures
+        _T = np.asarray(T, dtype=float)
+        if _T.ndim > 0:
+            _T = _T[..., np.newaxis]
+
         _bb_spectrum = 2 * h * c ** 2 / wavelength_array ** 5
-        _bb_spectrum /= (
-            np.exp(h * c / (wavelength_array * kb * T)) - 1
-        )
+        # exp overflows for hc / lambda kT >> 1, where the spectrum is correctly zero
+        with np.errstate(over="ignore"):
+            _bb_spectrum = _bb_spectrum / (
+                np.exp(h * c / (wavelength_array * kb * _T)) - 1
+            )
         return _bb_spectrum 
 
+    def _compute_blackbody_spectrum_temperature_derivative(self, wavelength_array, T):
+        """method to compute the analytic temperature derivative of Planck's blackbody spectrum,
+        dB/dT = B(lambda, T) * x * exp(x) / (exp(x) - 1) / T with x = h c / (lambda kb T)
+
+        Arguments
+        ---------
+        wavelength_array : numpy array of floats
+            the array of wavelengths in meters
+
+        T : float or numpy array of floats
+            the temperature(s) in Kelvin, broadcast as in _compute_blackbody_spectrum
+
+        Returns
+        -------
+        _dbb_spectrum : numpy array of floats
+            dB/dT with the same shape as the blackbody spectrum
+        """
+        # speed of light in SI
+        c = 299792458
+        # plancks constant in SI
+        h = 6.62607004e-34
+        # boltzmanns constant in SI
+        kb = 1.38064852e-23
+
+        _T = np.asarray(T, dtype=float)
+        if _T.ndim > 0:
+            _T = _T[..., np.newaxis]
+
+        _x = h * c / (wavelength_array * kb * _T)
+        # x exp(x) / (exp(x) - 1)^2 written to avoid overflow for large x
+        with np.errstate(over="ignore"):
+            _em = np.exp(-_x)
+            _factor = _x * _em / (1 - _em) ** 2
+        _dbb_spectrum = 2 * h * c ** 2 / wavelength_array ** 5 * _factor / _T
+        return _dbb_spectrum
+
+    def _compute_balance_temperature(
+        self,
+        wavelength_array,
+        emission_weight_array,
+        absorbed_power,
+        loss_coefficient=0.0,
+        ambient_temperature=300.0,
+        lower_temperature=300.0,
+        upper_temperature=3000.0,
+        initial_temperature=None,
+        tolerance=1e-6,
+        max_iterations=50,
+    ):
+        """method to solve for the temperature(s) T that balance emitted and absorbed power,
+
+            f(T) = sum_i w_i B(lambda_i, T) + h (T - T_amb) - P_abs = 0
+
+        with a bracketed Newton iteration using the analytic dB/dT; a Newton step that leaves
+        the bracket is replaced by bisection.  All quantities may carry leading batch axes,
+        in which case all balances are solved simultaneously.
+
+        Arguments
+        ---------
+        wavelength_array : numpy array of floats
+            the wavelengths in meters
+
+        emission_weight_array : numpy array of floats
+            ... x number_of_wavelengths array w such that the emitted power is w @ B(T),
+            i.e. quadrature weights times the (angle-integrated) emissivity
+
+        absorbed_power : float or numpy array of floats
+            the temperature-independent absorbed power P_abs
+
+        loss_coefficient : float or numpy array of floats
+            non-radiative heat loss coefficient h in W / m^2 / K
+
+        ambient_temperature : float or numpy array of floats
+            ambient temperature T_amb of the non-radiative loss in Kelvin
+
+        lower_temperature : float
+            lower end of the initial bracket; if f(lower_temperature) >= 0 the
+            lower_temperature is returned with a warning
+
+        upper_temperature : float
+            upper end of the initial bracket, doubled until it brackets the root
+
+        initial_temperature : float or numpy array of floats
+            starting guess of the iteration, default is the middle of the bracket
+
+        tolerance : float
+            convergence threshold on the temperature step in Kelvin
+
+        max_iterations : int
+            maximum number of Newton / bisection iterations
+
+        Returns
+        -------
+        _T : float or numpy array of floats
+            the balance temperature(s)
+
+        _iterations : int
+            number of iterations performed
+
+        Raises
+        ------
+        RuntimeError
+            if the structure neither emits nor loses heat, if no bracket is found or if the
+            iteration does not converge within max_iterations
+        """
+
+        def _f(T):
+            _B = self._compute_blackbody_spectrum(wavelength_array, T)
+            return (
+                np.sum(emission_weight_array * _B, axis=-1)
+                + loss_coefficient * (T - ambient_temperature)
+                - absorbed_power
+            )
+
+        def _df(T):
+            _dB = self._compute_blackbody_spectrum_temperature_derivative(
+                wavelength_array, T
+            )
+            return np.sum(emission_weight_array * _dB, axis=-1) + loss_coefficient
+
+        # batch shape of the balance equations
+        _shape = np.broadcast(
+            np.sum(emission_weight_array, axis=-1),
+            absorbed_power,
+            loss_coefficient,
+            ambient_temperature,
+        ).shape
+        # without emission or non-radiative loss nothing balances the absorbed power
+        _silent = np.broadcast_to(
+            np.all(emission_weight_array == 0, axis=-1) & (loss_coefficient == 0), _shape
+        )
+        if np.any(_silent):
+            raise RuntimeError(
+                "no balance temperature: the structure neither emits nor loses heat at entries "
+                + str(np.argwhere(_silent).tolist())
+            )
+        _T_lo = np.broadcast_to(np.asarray(lower_temperature, dtype=float), _shape).copy()
+        _T_hi = np.broadcast_to(np.asarray(upper_temperature, dtype=float), _shape).copy()
+
+        _f_lo = _f(_T_lo)
+        _f_hi = _f(_T_hi)
+        # expand the upper end of the bracket until the emitted power exceeds the absorbed power
+        for _ in range(60):
+            _expand = _f_hi < 0
+            if not np.any(_expand):
+                break
+            _T_hi = np.where(_expand, 2 * _T_hi, _T_hi)
+            _f_hi = _f(_T_hi)
+        _unbracketed = ~(_f_hi >= 0)
+        if np.any(_unbracketed):
+            raise RuntimeError(
+                "no balance temperature below "
+                + str(np.max(_T_hi))
+                + " K at entries "
+                + str(np.argwhere(_unbracketed).tolist())
+            )
+
+        # balances that are already satisfied at the lower bound stay there
+        _converged = _f_lo >= 0
+        if np.any(_converged):
+            warnings.warn(
+                "emitted power exceeds absorbed power at the lower temperature "
+                + str(lower_temperature)
+                + " K at entries "
+                + str(np.argwhere(_converged).tolist())
+                + "; the lower temperature is returned there"
+            )
+        if initial_temperature is None:
+            _T = 0.5 * (_T_lo + _T_hi)
+        else:
+            _T = np.clip(initial_temperature, _T_lo, _T_hi) * np.ones(_shape)
+        _T = np.where(_converged, _T_lo, _T)
+
+        _iterations = 0
+        while _iterations < max_iterations and not np.all(_converged):
+            _iterations += 1
+            _fT = _f(_T)
+            # shrink the bracket
+            _T_lo = np.where(_fT < 0, _T, _T_lo)
+            _T_hi = np.where(_fT >= 0, _T, _T_hi)
+
+            # Newton step, falling back to bisection if it leaves the bracket
+            with np.errstate(divide="ignore", invalid="ignore"):
+                _T_new = _T - _fT / _df(_T)
+            _bisect = ~np.isfinite(_T_new) | (_T_new < _T_lo) | (_T_new > _T_hi)
+            _T_new = np.where(_bisect, 0.5 * (_T_lo + _T_hi), _T_new)
+
+            _step = np.abs(_T_new - _T)
+            _T = np.where(_converged, _T, _T_new)
+            _converged = _converged | (_step < tolerance)
+
+        if not np.all(_converged):
+            raise RuntimeError(
+                "balance temperature not converged after "
+                + str(max_iterations)
+                + " iterations at entries "
+                + str(np.argwhere(~_converged).tolist())
+            )
+        if _T.ndim == 0:
+            _T = float(_T)
+        return _T, _iterations
+
     def _compute_pv_stpv_power_density(self, wavelength_array):
         """ method to compute the radiated power density of a PV-STPV structure specifically 
             in the 0.3 - 0.5 eV range (~2450-4150 nm range) 
@@ -607,6 +876,114 @@ class Therml:
 
         return _emitted_thermal_spectrum_gradient
 
+    def _compute_angle_weights(self, theta_vals, theta_weights):
+        """computes the weights of the hemispherical integral 2 pi int sin(theta) cos(theta) f(theta) dtheta
+
+        Arguments
+        ---------
+        theta_vals : numpy array of floats
+            the quadrature nodes in radians
+
+        theta_weights : numpy array of floats
+            the quadrature weights of the nodes
+
+        Returns
+        -------
+        _w_theta : numpy array of floats
+            2 pi sin(theta) cos(theta) times the quadrature weights
+        """
+        return 2 * np.pi * np.sin(theta_vals) * np.cos(theta_vals) * theta_weights
+
+    def _get_angular_quadrature(self, number_of_angles, rule="gauss-legendre"):
+        """returns the nodes and weights of a quadrature rule on [0, pi / 2], caching
+        each node set so it is only built once per (rule, number_of_angles)
+
+        Arguments
+        ---------
+        number_of_angles : int
+            the number of nodes; for rule = "clenshaw-curtis" it must be 2 ** L - 1
+
+        rule : str
+            "gauss-legendre", or "clenshaw-curtis" for the nested rule with the end points
+            dropped (the hemispherical integrand sin(theta) cos(theta) f(theta) vanishes there)
+
+        Returns
+        -------
+        theta_vals, theta_weights : numpy arrays of floats
+            the nodes in radians and their weights
+        """
+        _cache = self.__dict__.setdefault("_angular_quadrature_cache", {})
+        _key = (rule, number_of_angles)
+        if _key not in _cache:
+            a = 0
+            b = np.pi / 2.0
+            if rule == "gauss-legendre":
+                _x, _w = np.polynomial.legendre.leggauss(number_of_angles)
+            elif rule == "clenshaw-curtis":
+                # N + 1 Chebyshev extrema on [-1, 1], N even
+                _N = number_of_angles + 1
+                _j = np.arange(_N + 1)
+                _x = -np.cos(_j * np.pi / _N)
+                _w = np.ones(_N + 1)
+                for _k in range(1, _N // 2 + 1):
+                    _b = 1.0 if _k == _N // 2 else 2.0
+                    _w -= _b / (4 * _k ** 2 - 1) * np.cos(2 * _k * _j * np.pi / _N)
+                _w *= 2.0 / _N
+                _w[0] *= 0.5
+                _w[-1] *= 0.5
+                _x = _x[1:-1]
+                _w = _w[1:-1]
+            else:
+                raise ValueError("unknown angular quadrature rule " + str(rule))
+            _cache[_key] = (0.5 * (_x + 1) * (b - a) + a, _w * 0.5 * (b - a))
+
+        return _cache[_key]
+
+    def _get_atmospheric_emissivity_table(
+        self, atmospheric_transmissivity, theta_vals, theta_weights
+    ):
+        """returns the angle-dependent emissivity of the atmosphere 1 - tau ** (1 / cos(theta))
+        and the hemispherical angle weights, recomputing them only when the transmissivity
+        or the angular quadrature (e.g. number_of_angles) has changed
+
+        Arguments
+        ---------
+        atmospheric_transmissivity : numpy array of floats
+            the transmissivity of the atmosphere on the wavelength grid
+
+        theta_vals : numpy array of floats
+            the quadrature nodes in radians
+
+        theta_weights : numpy array of floats
+            the quadrature weights of the nodes
+
+        Attributes
+        ----------
+        atmospheric_emissivity_table : number_of_angles x number_of_wavelengths numpy array of floats
+            the emissivity of the atmosphere along each quadrature direction
+
+        atmospheric_angle_weights : number_of_angles numpy array of floats
+            the hemispherical angle weights from _compute_angle_weights
+
+        Returns
+        -------
+        atmospheric_emissivity_table, atmospheric_angle_weights
+        """
+        _key = tuple(
+            np.asarray(_x, dtype=float).tobytes()
+            for _x in (atmospheric_transmissivity, theta_vals, theta_weights)
+        )
+        if getattr(self, "_atmospheric_emissivity_key", None) != _key:
+            self.atmospheric_emissivity_table = 1.0 - np.asarray(
+                atmospheric_transmissivity
+            )[np.newaxis, :] ** (1 / np.cos(theta_vals)[:, np.newaxis])
+            self.atmospheric_angle_weights = self._compute_angle_weights(
+                theta_vals, theta_weights
+            )
+            self._atmospheric_emissivity_key = _key
+
+        return self.atmospheric_emissivity_table, self.atmospheric_angle_weights
+
     def _compute_atmospheric_radiated_power(
         self,
         atmospheric_transmissivity,
@@ -631,33 +1008,22 @@ class Therml:
         See Eq. (3) of https://www.nature.com/articles/nature13883
 
         """
-        num_angles = len(theta_vals)
-
-        # make sure we are getting the blackbody spectrum of the atmosphere
-        # store the structure temperature
-        _T_temp = self.temperature
-        # update the structure temperature, which is the attribute that
-        # is used for computing the blackbody spectrum in _compute_therml_spectrum
-        self.temperature = self.atmospheric_temperature
-        self._compute_therml_spectrum(wavelength_array, emissivity_array_s[0, :])
-        # set the structure temperature back to _T_temp in case
-        # one wants to compute the thermal emission of the structure again!
-        self.temperature = _T_temp
-        P_atm = 0.0
-        for i in range(0, num_angles):
-            # get the term that goes in the exponent of the atmospheric transmissivity
-            _o_over_cos_t = 1 / np.cos(theta_vals[i])
-            _emissivity_atm = (
-                np.ones(len(atmospheric_transmissivity))
-                - atmospheric_transmissivity ** _o_over_cos_t
-            )
-            _TE_atm = self.blackbody_spectrum * _emissivity_atm * np.cos(theta_vals[i])
-            _absorbed_TE_spectrum = (
-                _TE_atm * 0.5 * (emissivity_array_p[i, :] + emissivity_array_s[i, :])
-            )
-            _absorbed_TE = np.trapz(_absorbed_TE_spectrum, wavelength_array)
-            P_atm += _absorbed_TE * np.sin(theta_vals[i]) * theta_weights[i]
-        P_atm *= 2 * np.pi
+        _emissivity_atm, _w_theta = self._get_atmospheric_emissivity_table(
+            atmospheric_transmissivity, theta_vals, theta_weights
+        )
+        # blackbody spectrum of the atmosphere
+        _bb_atm = self._compute_blackbody_spectrum(
+            wavelength_array, self.atmospheric_temperature
+        )
+        _w = self._compute_trapz_weights(wavelength_array) * _bb_atm
+
+        P_atm = 0.5 * np.einsum(
+            "j,jk,k,jk->",
+            _w_theta,
+            _emissivity_atm,
+            _w,
+            emissivity_array_p + emissivity_array_s,
+        )
 
         return P_atm
 
@@ -680,49 +1046,22 @@ class Therml:
         -------
         _absorbed_solar_spectrum_gradient
         """
-
-        _nth = len(theta_vals)
-        _ngr = len(emissivity_gradient_array_p[0, 0, :])
-        _absorbed_atmospheric_radiation_gradient = np.zeros(_ngr)
-
-        # make sure we are getting the blackbody spectrum of the atmosphere
-        # store the structure temperature
-        _T_temp = self.temperature
-        # update the structure temperature, which is the attribute that
-        # is used for computing the blackbody spectrum in _compute_therml_spectrum
-        self.temperature = self.atmospheric_temperature
-        self._compute_therml_spectrum(
-            wavelength_array, emissivity_gradient_array_p[0, :, 0]
+        _emissivity_atm, _w_theta = self._get_atmospheric_emissivity_table(
+            atmospheric_transmissivity, theta_vals, theta_weights
+        )
+        # blackbody spectrum of the atmosphere
+        _bb_atm = self._compute_blackbody_spectrum(
+            wavelength_array, self.atmospheric_temperature
+        )
+        _w = self._compute_trapz_weights(wavelength_array) * _bb_atm
+
+        _absorbed_atmospheric_radiation_gradient = 0.5 * np.einsum(
+            "j,jk,k,jki->i",
+            _w_theta,
+            _emissivity_atm,
+            _w,
+            emissivity_gradient_array_p + emissivity_gradient_array_s,
         )
-        # set the structure temperature back to _T_temp in case
-        # one wants to compute the thermal emission of the structure again!
-        self.temperature = _T_temp
-
-        for i in range(0, _ngr):
-            P_atm_prime = 0
-            for j in range(0, _nth):
-                # get the term that goes in the exponent of the atmospheric transmissivity
-                _o_over_cos_t = 1 / np.cos(theta_vals[j])
-                _emissivity_atm = (
-                    np.ones(len(atmospheric_transmissivity))
-                    - atmospheric_transmissivity ** _o_over_cos_t
-                )
-                _TE_atm = (
-                    self.blackbody_spectrum * _emissivity_atm * np.cos(theta_vals[j])
-                )
-                _absorbed_TE_spectrum = (
-                    _TE_atm
-                    * 0.5
-                    * (
-                        emissivity_gradient_array_p[j, :, i]
-                        + emissivity_gradient_array_s[j, :, i]
-                    )
-                )
-                _absorbed_TE = np.trapz(_absorbed_TE_spectrum, wavelength_array)
-                P_atm_prime += (
-                    2 * np.pi * _absorbed_TE * np.sin(theta_vals[j]) * theta_weights[j]
-                )
-            _absorbed_atmospheric_radiation_gradient[i] = P_atm_prime
 
         return _absorbed_atmospheric_radiation_gradient
 
@@ -0,0 +1,229 @@
+import numpy as np
+from .optimizer import Optimizer
+
+
+class ToleranceAnalysis:
+    """Monte-Carlo fabrication-tolerance analysis of a TmmDriver
+
+    The thickness, refractive index and extinction coefficient of every finite layer are
+    perturbed by independent Gaussian errors drawn from a seeded generator, and each batch
+    of perturbed structures is evaluated in one batched pass through the transfer
+    matrices and the FomPlan weights.  The spectra of the samples are summarized by
+    percentile bands and the figure of merit by its statistics and a histogram.  The
+    first-order (linearized) standard deviation of the figure of merit, from its analytic
+    gradients, is a cheap pre-screen that needs no sampling.
+
+    Attributes
+    ----------
+    driver : TmmDriver
+        the nominal multilayer
+
+    figure_of_merit : str
+        one of Optimizer.figures_of_merit
+
+    layers : numpy array of ints
+        the perturbed layers, i.e. all layers except the incident and terminal media
+
+    thickness_sigma_nm, index_sigma, extinction_sigma : float or numpy array of floats
+        standard deviation of the thickness (in nm), the real part and the imaginary part of
+        the refractive index of each layer in layers
+
+    fom_nominal : float
+        figure of merit of the unperturbed structure
+
+    fom_samples : number_of_samples numpy array of floats
+        figure of merit of each sample
+
+    fom_mean, fom_std : float
+        sample mean and standard deviation of the figure of merit
+
+    fom_percentiles : len(percentiles) numpy array of floats
+        percentiles of the figure of merit
+
+    fom_histogram, fom_bin_edges : numpy arrays
+        histogram of fom_samples, as returned by np.histogram
+
+    reflectivity_percentiles, transmissivity_percentiles, emissivity_percentiles : len(percentiles) x number_of_wavelengths numpy arrays of floats
+        percentile bands of the spectra at incident_angle and polarization
+
+    first_order_fom_std : float
+        linearized standard deviation of the figure of merit
+
+    Returns
+    -------
+    None
+
+    Examples
+    --------
+    >>> tol = ToleranceAnalysis(driver, "stpv_spectral_efficiency", thickness_sigma_nm=2, seed=1)
+    >>> tol.compute_first_order_variance()
+    >>> tol.compute_tolerance(number_of_samples=10000)
+    """
+
+    def __init__(
+        self,
+        driver,
+        figure_of_merit="stpv_spectral_efficiency",
+        thickness_sigma_nm=1.0,
+        index_sigma=0.0,
+        extinction_sigma=0.0,
+        seed=None,
+    ):
+        """constructor for the ToleranceAnalysis class
+
+        Arguments
+        ---------
+        seed : int or numpy.random.Generator
+            seed of the random number generator
+        """
+        if figure_of_merit not in Optimizer.figures_of_merit:
+            raise ValueError(
+                "figure_of_merit must be one of "
+                + ", ".join(Optimizer.figures_of_merit)
+            )
+        self.driver = driver
+        self.figure_of_merit = figure_of_merit
+        self.layers = np.arange(1, driver.number_of_layers - 1)
+        self.thickness_sigma_nm = thickness_sigma_nm
+        self.index_sigma = index_sigma
+        self.extinction_sigma = extinction_sigma
+        self.rng = np.random.default_rng(seed)
+
+    def draw_perturbations(self, number_of_samples):
+        """draws the fabrication errors of number_of_samples structures
+
+        Arguments
+        ---------
+        number_of_samples : int
+
+        Returns
+        -------
+        _thickness_error : number_of_samples x len(layers) numpy array of floats
+            thickness errors in meters
+        _index_error : number_of_samples x len(layers) numpy array of complex floats
+            refractive index errors, the same at every wavelength
+        """
+        _shape = (number_of_samples, len(self.layers))
+        _thickness_error = self.rng.normal(0.0, 1.0, _shape) * self.thickness_sigma_nm
+        _index_error = self.rng.normal(0.0, 1.0, _shape) * self.index_sigma
+        _index_error = _index_error + 1j * (
+            self.rng.normal(0.0, 1.0, _shape) * self.extinction_sigma
+        )
+        return _thickness_error * 1e-9, _index_error
+
+    def _build_sample_arrays(self, thickness_error, index_error):
+        """returns the S x number_of_wavelengths x number_of_layers refractive index and
+        S x number_of_layers thickness arrays of the perturbed structures"""
+        _d = self.driver
+        _S = len(thickness_error)
+        _ri = np.repeat(_d._refractive_index_array[np.newaxis], _S, axis=0)
+        _ri[:, :, self.layers] += index_error[:, np.newaxis, :]
+        _thickness = np.repeat(_d.thickness_array[np.newaxis], _S, axis=0)
+        # layers cannot become thinner than nothing
+        _thickness[:, self.layers] = np.maximum(
+            _thickness[:, self.layers] + thickness_error, 0.0
+        )
+        return _ri, _thickness
+
+    def compute_tolerance(
+        self,
+        number_of_samples=10000,
+        batch_size=1000,
+        percentiles=(5, 50, 95),
+        number_of_bins=50,
+    ):
+        """evaluates number_of_samples perturbed structures in batches of batch_size and
+        computes the attributes fom_nominal, fom_samples, fom_mean, fom_std, fom_percentiles,
+        fom_histogram, fom_bin_edges and the spectral percentile bands; the spectra of the
+        samples are kept in single precision until the percentiles are taken
+
+        Arguments
+        ---------
+        number_of_samples : int
+            total number of perturbed structures
+        batch_size : int
+            number of structures per batched transfer-matrix pass
+        percentiles : sequence of floats
+            percentiles (between 0 and 100) of the bands
+        number_of_bins : int
+            number of bins of the figure of merit histogram
+
+        Returns
+        -------
+        None
+        """
+        _d = self.driver
+        _nwl = _d.number_of_wavelengths
+        self.fom_nominal = float(
+            _d._compute_batched_fom(
+                self.figure_of_merit,
+                _d._refractive_index_array[np.newaxis],
+                _d.thickness_array[np.newaxis],
+            )[0]
+        )
+
+        self.fom_samples = np.zeros(number_of_samples)
+        _R = np.zeros((number_of_samples, _nwl), dtype=np.float32)
+        _T = np.zeros((number_of_samples, _nwl), dtype=np.float32)
+        _E = np.zeros((number_of_samples, _nwl), dtype=np.float32)
+        # all errors are drawn up front so the samples do not depend on batch_size
+        _thickness_error, _index_error = self.draw_perturbations(number_of_samples)
+        for _start in range(0, number_of_samples, batch_size):
+            _batch = slice(_start, min(_start + batch_size, number_of_samples))
+            _ri, _thickness = self._build_sample_arrays(
+                _thickness_error[_batch], _index_error[_batch]
+            )
+            _spectra = _d._compute_batched_spectrum(
+                _d.incident_angle,
+                _d.polarization,
+                refractive_index_array=_ri,
+                thickness_array=_thickness,
+            )
+            _R[_batch], _T[_batch], _E[_batch] = _spectra
+            self.fom_samples[_batch] = _d._compute_batched_fom(
+                self.figure_of_merit, _ri, _thickness, spectra=_spectra
+            )
+
+        self.fom_mean = np.mean(self.fom_samples)
+        self.fom_std = np.std(self.fom_samples)
+        self.fom_percentiles = np.percentile(self.fom_samples, percentiles)
+        self.fom_histogram, self.fom_bin_edges = np.histogram(
+            self.fom_samples, bins=number_of_bins
+        )
+        self.reflectivity_percentiles = np.percentile(_R, percentiles, axis=0)
+        self.transmissivity_percentiles = np.percentile(_T, percentiles, axis=0)
+        self.emissivity_percentiles = np.percentile(_E, percentiles, axis=0)
+
+    def compute_first_order_variance(self):
+        """computes first_order_fom_std, the standard deviation of the figure of merit to first
+        order in the errors, sigma_F^2 = sum_l (dF / ds_l)^2 sigma_s^2 + (dF / dn_l)^2 sigma_n^2
+        + (dF / dk_l)^2 sigma_k^2, from the analytic thickness and index gradients
+
+        Returns
+        -------
+        None
+        """
+        _d = self.driver
+        _gradient_type = _d.gradient_type
+        _gradient_list = _d.gradient_list
+        _d.gradient_list = self.layers
+        _variance = 0.0
+        try:
+            # the Optimizer only accepts thickness gradients, the index types are set below
+            _d.gradient_type = "thickness"
+            _optimizer = Optimizer(_d, self.figure_of_merit)
+            for _type, _sigma in (
+                ("thickness", self.thickness_sigma_nm),
+                ("n", self.index_sigma),
+                ("k", self.extinction_sigma),
+            ):
+                if np.all(np.asarray(_sigma) == 0):
+                    continue
+                _d.gradient_type = _type
+                # the thickness derivatives are per nm
+                _, _gradient = _optimizer._evaluate_fom()
+                _variance = _variance + np.sum((_gradient * _sigma) ** 2)
+        finally:
+            _d.gradient_type = _gradient_type
+            _d.gradient_list = _gradient_list
+        self.first_order_fom_std = float(np.sqrt(_variance))